@@ -76,16 +76,19 @@ class Player(models.Model):
             return self.user.email
         return self.user.db_phone_number or str(self.user.id)
 
-    def deduct_coins(self, amount):
-        if self.coins >= amount:
-            self.coins -= amount
-            self.save()
-            return True
-        return False
+    def deduct_coins(self, amount, transaction_type='debit'):
+        from GameApp.services_file import wallet
+        try:
+            wallet.debit(self.pk, amount, transaction_type)
+        except wallet.InsufficientFunds:
+            return False
+        self.refresh_from_db(fields=['coins'])
+        return True
 
-    def add_coins(self, amount):
-        self.coins += amount
-        self.save()
+    def add_coins(self, amount, transaction_type='credit'):
+        from GameApp.services_file import wallet
+        wallet.credit(self.pk, amount, transaction_type)
+        self.refresh_from_db(fields=['coins'])
         
     @receiver(post_save, sender=db_Profile)
     def create_player(sender, instance, created, **kwargs):
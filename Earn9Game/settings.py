@@ -86,20 +86,117 @@ TEMPLATES = [
 # WSGI_APPLICATION = 'Earn9Game.wsgi.application'
 
 ASGI_APPLICATION = 'Earn9Game.asgi.application'
-CHANNEL_LAYERS = {
-    'default': {
+# memory: one process only. local: same, but with Redis-style serialized messages and batched group sends.
+# redis: shared by every worker (needs channels_redis and REDIS_URL).
+CHANNEL_LAYER = config('CHANNEL_LAYER', default='memory')
+CHANNEL_LAYER_BACKENDS = {
+    'memory': {
         'BACKEND': 'channels.layers.InMemoryChannelLayer',
-         
+    },
+    'local': {
+        'BACKEND': 'GameApp.services_file.channel_layers.LocalChannelLayer',
+        'CONFIG': {'capacity': 1500, 'expiry': 10},
+    },
+    'redis': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [config('REDIS_URL', default='redis://127.0.0.1:6379/0')],
+            'capacity': 1500,
+            'expiry': 10,
+        },
+    },
+}
+CHANNEL_LAYERS = {
+    'default': CHANNEL_LAYER_BACKENDS[CHANNEL_LAYER],
+}
 
+# local: one cache per process, so balances are read from the database every time.
+# redis / memcached: shared by every worker, balances are served from it (redis needs the redis package).
+CACHE = config('CACHE', default='local')
+CACHE_BACKENDS = {
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_CACHE_URL', default='redis://127.0.0.1:6379/1'),
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': config('MEMCACHED_LOCATION', default='127.0.0.1:11211'),
     },
 }
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE],
+}
+
+# Set to False on web workers when `manage.py run_round_scheduler` drives the live tables.
+ROUND_SCHEDULER_AUTOSTART = config('ROUND_SCHEDULER_AUTOSTART', default=True, cast=bool)
+# Flight frames per second pushed to rocket clients; the curve itself does not depend on it.
+ROCKET_KEYFRAME_RATE = config('ROCKET_KEYFRAME_RATE', default=10, cast=int)
+# Timer, bid-total and flight snapshots are merged per group over this window; 0 sends every one.
+BROADCAST_WINDOW_MS = config('BROADCAST_WINDOW_MS', default=75, cast=int)
+# Threads per ORM pool: bid writes, round lifecycle/settlement and read-only lookups each get their own.
+DB_EXECUTORS = {
+    'bids': config('DB_EXECUTOR_BIDS', default=4, cast=int),
+    'settlement': config('DB_EXECUTOR_SETTLEMENT', default=4, cast=int),
+    'reads': config('DB_EXECUTOR_READS', default=4, cast=int),
+}
+# Per-action latency, query and message-size metrics for the websocket consumers (served at /Earn/api/metrics/).
+CONSUMER_METRICS = config('CONSUMER_METRICS', default=True, cast=bool)
+# Staff sessions may read them; scrapers send `Authorization: Bearer <METRICS_TOKEN>` (empty: staff only).
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# Outcome streams: outcomes precomputed per refill, outcomes per seed before it is revealed, idle hours before an unused seed is revealed.
+OUTCOME_BATCH = config('OUTCOME_BATCH', default=256, cast=int)
+OUTCOME_SEED_ROUNDS = config('OUTCOME_SEED_ROUNDS', default=10000, cast=int)
+OUTCOME_SEED_IDLE_HOURS = config('OUTCOME_SEED_IDLE_HOURS', default=24, cast=int)
+# Football / connect-dots matchmaking: largest stake difference that still pairs (0 = equal stakes), seconds a game may wait.
+MATCH_AMOUNT_TOLERANCE = config('MATCH_AMOUNT_TOLERANCE', default=300, cast=int)
+MATCH_MAX_WAIT_SECONDS = config('MATCH_MAX_WAIT_SECONDS', default=180, cast=int)
  
 
-DATABASES = {
-    'default': {
+# sqlite: WAL journal, busy timeout, IMMEDIATE write transactions and persistent connections.
+# sqlite_plain: Django's stock SQLite settings. postgres: pooled connections (needs psycopg 3 and psycopg_pool).
+DB_PROFILE = config('DB_PROFILE', default='sqlite')
+DB_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': None,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA cache_size=-20000;'
+            ),
+        },
+    },
+    'sqlite_plain': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('POSTGRES_DB', default='earn9game'),
+        'USER': config('POSTGRES_USER', default='postgres'),
+        'PASSWORD': config('POSTGRES_PASSWORD', default=''),
+        'HOST': config('POSTGRES_HOST', default='127.0.0.1'),
+        'PORT': config('POSTGRES_PORT', default='5432'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': config('DB_POOL_MIN', default=4, cast=int),
+                'max_size': config('DB_POOL_MAX', default=20, cast=int),
+                'timeout': 10,
+            },
+        },
+    },
+}
+DATABASES = {
+    'default': DB_PROFILES[DB_PROFILE],
 }
  
 
@@ -1,12 +1,12 @@
 from django.contrib import admin
 from .models import (PlayerBid , Game, GameRound, PlayerResult,  
                      FootballGame, FootballRound, FootBallResult,
-                      ConnectDotGame, ConnectDotRound, ConnectDotResult, 
+                      ConnectDotGame, ConnectDotRound, ConnectDotMove, ConnectDotResult, 
                       GuessNumberGame,
                        Dice_Game, Dice_GameRound, Dice_PlayerBid, Dice_PlayerResult,
                         ColorGame, ColorGameRound, ColorPlayerBid, ColorPlayerResult,
                         RocketGame , RocketGameRound , RocketPlayerBid , RocketPlayerResult , 
-                        SpinWheelRound ) 
+                        SpinWheelRound, SchedulerLease ) 
   
 admin.site.register(Game) 
 admin.site.register(GameRound)
@@ -19,6 +19,7 @@ admin.site.register(FootBallResult)
 
 admin.site.register(ConnectDotGame) 
 admin.site.register(ConnectDotRound) 
+admin.site.register(ConnectDotMove) 
 admin.site.register(ConnectDotResult) 
 
 admin.site.register(GuessNumberGame) 
@@ -39,4 +40,6 @@ admin.site.register(RocketGame)
 admin.site.register(RocketGameRound) 
 admin.site.register(RocketPlayerBid)
 admin.site.register(RocketPlayerResult)
-  
\ No newline at end of file
+  
+
+admin.site.register(SchedulerLease)
@@ -1,20 +1,25 @@
 #consumers.py  
 from channels.db import database_sync_to_async  
-from GameApp.models import ConnectDotResult, ConnectDotRound, ConnectDotGame 
+from GameApp.models import ConnectDotResult, ConnectDotRound, ConnectDotGame, ConnectDotMove, seconds_until 
 from AccountApp.models import db_Profile ,Player, Transaction
 import asyncio, json, time, datetime , logging 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.db import  IntegrityError  
 from datetime import timedelta 
-from django.db.models import Q  
+from django.db.models import F, Q  
 from django.utils import timezone as django_timezone
 from datetime import datetime as dt, timezone 
 from django.utils import timezone  
 from datetime import datetime, timedelta, timezone as dt_timezone 
 from django.db import transaction
+from GameApp.services_file import balances, wallet
+from GameApp.services_file.deadlines import DeadlineScheduler
+from GameApp.services_file.dots_board import DotsBoard
+from GameApp.services_file.round_scheduler import round_scheduler
+from GameApp.services_file.instrumentation import InstrumentedConsumer
 logger = logging.getLogger(__name__)  
 
-class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):  
+class ConnectDotBitConsumer(InstrumentedConsumer, AsyncJsonWebsocketConsumer):  
     room_name = "bid_room"
     
     async def connect(self):
@@ -27,6 +32,8 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
                 self.room_name, 
                 self.channel_name
             )
+            await balances.subscribe(self.channel_layer, self.player.id, self.channel_name)
+            await round_scheduler.ensure_started()
 
         except Exception as e:
             await self.handle_connection_error(e)
@@ -76,64 +83,26 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
 
     async def handle_confirm_bet(self, content):
         amount = content['amount']
-        if not await self.check_balance(amount):
+        if not await self.deduct_balance(amount):
             return
-
-        await self.deduct_balance(amount)
-        
-        existing_game = await self.find_existing_game(amount)
-        if existing_game:
-            await self.pair_players(existing_game, amount)
-        else:
-            game = await self.create_new_game(amount)
-            asyncio.create_task(
-                self.check_game_expiration(game.id, amount)
-            ) 
-            await self.channel_layer.group_add(
-                f"game_{game.id}",
-                self.channel_name
-            )
-            await self.send_json({
-                'type': 'waiting', 
-                'game_id': game.id
-            })
-              
-    async def check_game_expiration(self, game_id, amount): 
-        await asyncio.sleep(180)  # 3 minutes
         
-        expired = await self.handle_expired_game_safe(game_id, amount)
-        if expired:
-            await self.notify_game_expired(game_id)
-
-    async def handle_expired_game_safe(self, game_id, amount): 
-        return await self._handle_expired_game(game_id, amount)
-    
-    @database_sync_to_async
-    def _handle_expired_game(self, game_id, amount): 
-        try:
-            game = ConnectDotGame.objects.get(id=game_id) 
-            if game.status == 'waiting' and not game.player_b:  
-                self.player.coins += amount
-                self.player.save()
-                game.delete()
-                return True
-            return False
-        except ConnectDotGame.DoesNotExist:
-            return False
-
-    async def notify_game_expired(self, game_id): 
-        await self.channel_layer.group_send(
-            f"game_{game_id}",
-            {
-                'type': 'game.expired',
-                'message': 'Game expired. Amount refunded.'
-            }
-        ) 
-        await self.channel_layer.group_discard(
-            f"game_{game_id}",
+        # The waiting row holds the stake; the leader's matchmaker pairs it or answers `match.waiting`,
+        # and refunds it with `game.expired` if nobody joins in time.
+        game = await self.create_new_game(amount)
+        await self.channel_layer.group_add(
+            f"game_{game.id}",
             self.channel_name
-        ) 
+        )
+        await round_scheduler.request_match(
+            self.channel_layer, 'dots', game.id, self.db_profile.id, amount, self.channel_name
+        )
 
+    async def match_waiting(self, event):
+        await self.send_json({
+            'type': 'waiting', 
+            'game_id': event['game_id']
+        })
+              
     async def game_expired(self, event): 
         await self.send_json({
             'type': 'game_expired',
@@ -144,9 +113,7 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
 
     @database_sync_to_async
     def refund_player(self, player_id, amount): 
-        player = Player.objects.get(id=player_id)
-        player.coins += amount
-        player.save()
+        wallet.credit(player_id, amount, 'dots_refund')
 
     @database_sync_to_async
     def get_game_by_id(self, game_id): 
@@ -165,7 +132,8 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
         if game:
             # Check expiration first
             if game.created_at < timezone.now() - timedelta(minutes=3):
-                await self.refund_expired_game_safe(game.id)
+                if await self.refund_expired_game_safe(game.id):
+                    await round_scheduler.cancel_match(self.channel_layer, 'dots', game.id)
                 await self.send_json({
                     'type': 'session_expired',
                     'message': 'Game expired. Amount refunded.'
@@ -198,27 +166,24 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
         try:
             game = ConnectDotGame.objects.get(id=game_id)
             if game.status == 'waiting' and not game.player_b: 
-                self.player.coins += game.player_a_bet_amount
-                self.player.save()
+                wallet.credit(self.player.id, game.player_a_bet_amount, 'dots_refund')
                 game.delete()
                 return True
             return False
         except ConnectDotGame.DoesNotExist:
             return False
 
-    @database_sync_to_async
-    def check_balance(self, amount):
-        return self.player.coins >= amount
-
     @database_sync_to_async
     def deduct_balance(self, amount):
-        self.player.coins -= amount
-        self.player.save()
+        try:
+            wallet.debit(self.player.id, amount, 'dots_bet')
+            return True
+        except ValueError:
+            return False
     
     @database_sync_to_async
     def refund_balance(self, amount):
-        self.player.coins += amount
-        self.player.save()
+        wallet.credit(self.player.id, amount, 'dots_refund')
 
     @database_sync_to_async
     def cleanup_expired_games(self, amount):
@@ -230,44 +195,6 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
             player_b__isnull=True
         ).delete()
  
-    @database_sync_to_async
-    def find_existing_game(self, amount):
-        min_amount = max(0, amount - 300)  # Prevent negative amounts
-        max_amount = amount + 300
-        
-        return ConnectDotGame.objects.filter(
-            player_a_bet_amount__range=(min_amount, max_amount),  # Range filter
-            player_b__isnull=True,
-            created_at__gte=timezone.now()-timedelta(minutes=3)
-        ).exclude(player_a=self.db_profile).order_by('created_at').first()
- 
-    async def pair_players(self, game, amount): 
-        await self.update_game_details(game, amount)
-        await self.channel_layer.group_add(
-            f"game_{game.id}",
-            game.player_a_channel
-        )
-        await self.channel_layer.group_add(
-            f"game_{game.id}",
-            self.channel_name
-        )
-        await self.channel_layer.group_send(
-            f"game_{game.id}",
-            {'type': 'game.start', 'game_id': str(game.id), 'redirect': True}
-        )
-
-    @database_sync_to_async
-    def update_game_details(self, game, amount):
-        """Sync method for database operations"""
-        game.player_b = self.db_profile
-        game.player_b_bet_amount = amount
-        game.player_b_channel = self.channel_name
-        game.status = 'active'
-        game.save(update_fields=[
-            'player_b', 'player_b_bet_amount',
-            'player_b_channel', 'status'
-        ])
- 
     @database_sync_to_async
     def get_player_channel(self, player):
         return ConnectDotGame.objects.filter(
@@ -314,15 +241,29 @@ class ConnectDotBitConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name
         )
 
+    async def balance_update(self, event):
+        await self.send_json({
+            'type': 'balance_update',
+            'balance': event['balance']
+        })
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        if getattr(self, 'player', None):
+            await balances.unsubscribe(self.channel_layer, self.player.id, self.channel_name)
+
 
-class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):    
+class ConnectDotPlayConsumer(InstrumentedConsumer, AsyncJsonWebsocketConsumer):    
     GAME_DURATION = 120 
     TURN_DURATION = 5  
     
     result_duration = 5  
     game_group = "connectDot_session" 
     timer_task = None
-    timer_tasks = {} 
+    board = None
+    turn_clock = None
+    clock_owners = {}   # game_id -> the consumer running that game's clock in this process
+    game_sockets = {}   # game_id -> this process's play sockets for that game
     _timer_lock = asyncio.Lock() 
 
     async def connect(self):
@@ -372,10 +313,29 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
             await self.close(code=4005)
             return
         
+        self.board = DotsBoard.from_round(self.current_round)
         await self.send_initial_state() 
-        if self.game_id not in ConnectDotPlayConsumer.timer_tasks:
-            task = asyncio.create_task(self.game_timer())
-            ConnectDotPlayConsumer.timer_tasks[self.game_id] = task
+        ConnectDotPlayConsumer.game_sockets.setdefault(self.game_id, []).append(self)
+        if self.game_id not in ConnectDotPlayConsumer.clock_owners and not await self.has_result(self.current_round):
+            if self.current_round.timer_remaining > 0:
+                self.start_clock(self.current_round)
+            else:
+                # Time ran out while no worker held the clock (a restart, or nobody connected); settle it now.
+                await self.end_game()
+
+    async def disconnect(self, close_code):
+        sockets = ConnectDotPlayConsumer.game_sockets.get(getattr(self, 'game_id', None))
+        if sockets is None or self not in sockets:
+            return
+        await self.channel_layer.group_discard(self.game_group, self.channel_name)
+        sockets.remove(self)
+        if not sockets:
+            del ConnectDotPlayConsumer.game_sockets[self.game_id]
+        if ConnectDotPlayConsumer.clock_owners.get(self.game_id) is self:
+            self.stop_clock()
+            if sockets:
+                # Another socket of this game stays here; it keeps the same deadlines.
+                sockets[0].start_clock(self)
      
     async def player_assignment(self, event):
         await self.send_json({
@@ -384,36 +344,70 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         })
 
         
-    async def game_timer(self):
-        try:
-            while True:
-                current_round = await self.get_current_round()
-                if not current_round or current_round.timer_remaining <= 0:
-                    break
-                    
-                await asyncio.sleep(1)
-                
-                async with self._timer_lock:
-                    current_round = await self.get_current_round()
-                    if not current_round:
-                        break
-                    
-                    await self.update_timers(current_round)
-                    await self.broadcast_timer_update(current_round)
-                    
-                    if current_round.turn_time_remaining <= 0:
-                        await self.handle_turn_timeout(current_round)
-                    
-                    if current_round.timer_remaining <= 0:
-                        await self.end_game()
-                        break
-        finally:
-            if self.game_id in ConnectDotPlayConsumer.timer_tasks:
-                del ConnectDotPlayConsumer.timer_tasks[self.game_id]
-
-    async def handle_turn_timeout(self, current_round): 
-        await self.shift_turn(current_round)
-        await self.broadcast_turn_shifted()
+    # A game's clock is the two deadlines on its round, written once per game and once per turn.
+    # One scheduler per process wakes each game it owns every second to broadcast the time left
+    # (worked out from the deadlines, so a late wake-up never drifts) and right at the deadlines.
+    @classmethod
+    def clock(cls):
+        if cls.timer_task is None or cls.timer_task.done():
+            cls.turn_clock = DeadlineScheduler(cls.clocks_due, 'connect-dots clocks')
+            cls.timer_task = asyncio.create_task(cls.turn_clock.run())
+        return cls.turn_clock
+
+    @classmethod
+    async def clocks_due(cls, game_ids):
+        for game_id in game_ids:
+            owner = cls.clock_owners.get(game_id)
+            if owner is None:
+                continue
+            try:
+                await owner.clock_tick()
+            except Exception as e:
+                logger.exception(f"Connect-dots clock failed for game {game_id}: {e}")
+                owner.schedule_clock()
+
+    def start_clock(self, current_round):
+        ConnectDotPlayConsumer.clock_owners[self.game_id] = self
+        self.ends_at = current_round.ends_at
+        self.turn_ends_at = current_round.turn_ends_at
+        self.schedule_clock()
+
+    def schedule_clock(self):
+        now = timezone.now()
+        wake = now + timedelta(seconds=1)
+        for deadline in (self.turn_ends_at, self.ends_at):
+            if now < deadline < wake:
+                wake = deadline
+        self.clock().schedule(self.game_id, wake)
+
+    def stop_clock(self):
+        if ConnectDotPlayConsumer.clock_owners.get(self.game_id) is self:
+            del ConnectDotPlayConsumer.clock_owners[self.game_id]
+            self.clock().cancel(self.game_id)
+
+    async def clock_tick(self):
+        now = timezone.now()
+        if now >= self.ends_at:
+            await self.broadcast_timer_update()
+            self.stop_clock()
+            await self.end_game()
+            return
+        if now >= self.turn_ends_at:
+            await self.handle_turn_timeout()
+        await self.broadcast_timer_update()
+        self.schedule_clock()
+
+    async def handle_turn_timeout(self): 
+        async with self._timer_lock:
+            current_round = await self.get_current_round()
+            if not current_round:
+                return
+            if current_round.turn_ends_at > timezone.now():
+                # A move shifted the turn; its turn_shifted broadcast may not have reached us yet.
+                self.turn_ends_at = current_round.turn_ends_at
+            elif await self.shift_turn(current_round):
+                self.turn_ends_at = current_round.turn_ends_at
+                await self.broadcast_turn_shifted()
 
 
     async def handle_connection_error(self, error):  
@@ -483,8 +477,7 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
                 'started_at': timezone.now().strftime("%d/%m/%YT%H:%M:%S"),
                 'ended_at': '',
                 'score': 0,
-                'is_turn_done': False,
-                'btn_clicked': []
+                'is_turn_done': False
             }
             
             player_b_detail = {
@@ -492,8 +485,7 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
                 'started_at': timezone.now().strftime("%d/%m/%YT%H:%M:%S"),
                 'ended_at': '',
                 'score': 0,
-                'is_turn_done': False,
-                'btn_clicked': []
+                'is_turn_done': False
             }
             
             current_round = ConnectDotRound.objects.create(
@@ -502,8 +494,8 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
                 player_a_detail=player_a_detail,
                 player_b_detail=player_b_detail,
                 current_player=self.game.player_a,
-                timer_remaining=self.GAME_DURATION,
-                turn_time_remaining=self.TURN_DURATION
+                ends_at=timezone.now() + timedelta(seconds=self.GAME_DURATION),
+                turn_ends_at=timezone.now() + timedelta(seconds=self.TURN_DURATION)
             )
             return current_round
 
@@ -512,7 +504,7 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         
         await self.send_json({
             'type': 'game_state',
-            'grid_state': await self.get_grid_state(),
+            'grid_state': self.get_grid_state(),
             'current_player': str(self.current_round.current_player.auth_token),
             'timer': self.current_round.timer_remaining,
             'turn_timer': self.current_round.turn_time_remaining,
@@ -522,21 +514,14 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
             'player_b_id': str(self.game.player_b.auth_token)
         })
    
-    async def get_grid_state(self):
-        grid = [0] * 49  # Changed from 42 to 49 (7x7)
-        for btn in self.current_round.player_a_detail['btn_clicked']:
-            if 0 < btn <= 49:  # Updated to 49
-                grid[btn-1] = 1
-        for btn in self.current_round.player_b_detail['btn_clicked']:
-            if 0 < btn <= 49:  # Updated to 49
-                grid[btn-1] = 2
-        return grid
+    def get_grid_state(self):
+        return self.board.grid()
  
-    async def broadcast_timer_update(self, current_round):
+    async def broadcast_timer_update(self):
         await self.channel_layer.group_send(self.game_group, {
             'type': 'timer_update',
-            'timer': current_round.timer_remaining,
-            'turn_timer': current_round.turn_time_remaining
+            'timer': seconds_until(self.ends_at),
+            'turn_timer': seconds_until(self.turn_ends_at)
         })
 
     async def timer_update(self, event):
@@ -553,33 +538,9 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         except ConnectDotRound.DoesNotExist:
             return None
 
-    @database_sync_to_async
-    def update_timers_sync(self, current_round): 
-        current_round.timer_remaining = max(0, current_round.timer_remaining - 1)
-        current_round.turn_time_remaining = max(0, current_round.turn_time_remaining - 1)
-        current_round.save()
-
-    async def update_timers(self, round):
-        await self.update_timers_sync(round)
-
-    async def shift_turn_sync(self, current_round):
-        if current_round.round_status == 'PLAYER_A_TURN':
-            current_round.round_status = 'PLAYER_B_TURN'
-            current_round.current_player = self.game.player_b
-            current_round.player_a_detail['is_turn_done'] = True
-            current_round.player_b_detail['is_turn_done'] = False
-        else:
-            current_round.round_status = 'PLAYER_A_TURN'
-            current_round.current_player = self.game.player_a
-            current_round.player_b_detail['is_turn_done'] = True
-            current_round.player_a_detail['is_turn_done'] = False
-            
-        current_round.turn_time_remaining = self.TURN_DURATION
-        current_round.save()
-        await self.broadcast_turn_shifted()
- 
     @database_sync_to_async
     def shift_turn(self, current_round):
+        deadline = current_round.turn_ends_at
         if current_round.round_status == 'PLAYER_A_TURN':
             current_round.round_status = 'PLAYER_B_TURN'
             current_round.current_player = self.game.player_b
@@ -592,8 +553,15 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
             current_round.player_b_detail['is_turn_done'] = True
         
         # Reset turn timer to full duration
-        current_round.turn_time_remaining = self.TURN_DURATION
-        current_round.save()
+        current_round.turn_ends_at = timezone.now() + timedelta(seconds=self.TURN_DURATION)
+        # A move and a clock (maybe another worker's) can both try to end this turn; the first one shifts it.
+        return bool(ConnectDotRound.objects.filter(id=current_round.id, turn_ends_at=deadline).update(
+            round_status=current_round.round_status,
+            current_player=current_round.current_player,
+            player_a_detail=current_round.player_a_detail,
+            player_b_detail=current_round.player_b_detail,
+            turn_ends_at=current_round.turn_ends_at
+        ))
 
     async def end_game(self):
         current_round = await self.get_current_round()
@@ -614,10 +582,23 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
 
     
     @database_sync_to_async
-    def create_result(self, current_round): 
-        if ConnectDotResult.objects.filter(round=current_round).exists():
+    def has_result(self, current_round):
+        return ConnectDotResult.objects.filter(round=current_round).exists()
+
+    @database_sync_to_async
+    def create_result(self, current_round):
+        # Both players' sockets and a clock on another worker may end the game together; the round row lock
+        # lets one of them pay it, and the (round, player) constraint stops any that get past it (SQLite has no row locks).
+        try:
+            with transaction.atomic():
+                current_round = ConnectDotRound.objects.select_for_update().get(pk=current_round.pk)
+                if ConnectDotResult.objects.filter(round=current_round).exists():
+                    return {'result_type': {}, 'scores': {}, 'bits': {}}
+                return self.settle_round(current_round)
+        except IntegrityError:
             return {'result_type': {}, 'scores': {}, 'bits': {}}
-         
+
+    def settle_round(self, current_round):
         total_a = current_round.player_a_detail.get('score', 0)
         total_b = current_round.player_b_detail.get('score', 0)
         amount_A = self.game.player_a_bet_amount
@@ -700,8 +681,7 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
             result_type=result_type
         )
         # Update player coins
-        player.coins += amount
-        player.save()
+        wallet.credit(player.id, amount, f'dots_{result_type}')
 
     def amount_A_Winner_Calculate(self, amount_A, amount_B):
         if amount_A > amount_B:
@@ -724,6 +704,7 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         self.game.save()
 
     async def game_result(self, event):
+        self.stop_clock()
         await self.send_json({
             'type': 'game.result',
             'result': event['result']
@@ -742,13 +723,15 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         self.current_round = await self.get_current_round()
         if not self.current_round:
             return
+        self.board.sync(self.current_round)
             
-        if not await self.validate_move(button):
+        if not self.validate_move(button):
             return
             
-        await self.save_move(button)
+        if not await self.save_move(button):
+            return
         
-        if not await self.check_win_condition():
+        if not await self.check_win_condition(button):
             async with self._timer_lock: 
                 self.current_round = await self.get_current_round()
                 if self.current_round:
@@ -762,20 +745,33 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
     def save_move(self, button): 
         user_token = str(self.user.auth_token)
         player_a_token = str(self.game.player_a.auth_token)
+        board = 'player_a_board' if user_token == player_a_token else 'player_b_board'
         
-        if user_token == player_a_token:
-            self.current_round.player_a_detail['btn_clicked'].append(button)
-        else:
-            self.current_round.player_b_detail['btn_clicked'].append(button)
-        self.current_round.save()
+        # One log row and one in-place update of the round, whatever the move number. The log's
+        # unique (round, button) and (round, move_number) turn away a taken dot or a second move this turn.
+        try:
+            with transaction.atomic():
+                ConnectDotMove.objects.create(
+                    round_id=self.current_round.id,
+                    player=self.db_profile,
+                    button=button,
+                    move_number=self.current_round.move_count + 1
+                )
+                ConnectDotRound.objects.filter(id=self.current_round.id).update(
+                    move_count=F('move_count') + 1,
+                    **{board: F(board).bitor(1 << (button - 1))}
+                )
+        except IntegrityError:
+            return False
+        return True
 
-    async def check_win_condition(self):
-        grid = await self.get_grid_state()
+    async def check_win_condition(self, button):
         user_token = str(self.user.auth_token)
         player_a_token = str(self.game.player_a.auth_token)
-        player_mark = 1 if user_token == player_a_token else 2
+        is_player_a = user_token == player_a_token
+        self.board.place(button, is_player_a)
         
-        if await self.check_win(grid, player_mark):
+        if self.board.wins(button, is_player_a):
             await self.update_score(self.user)
             await self.declare_winner(self.user)
             return True
@@ -787,43 +783,8 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
             self.current_round.player_a_detail['score'] += 1
         else:
             self.current_round.player_b_detail['score'] += 1
-        self.current_round.save()
-
-    async def check_win(self, grid, player): 
-        grid_2d = [grid[i*7:(i+1)*7] for i in range(7)]  # Changed from 6 to 7 rows
-        return (await self.check_horizontal(grid_2d, player) or
-            (await self.check_vertical(grid_2d, player)) or
-            (await self.check_diagonal(grid_2d, player)))
-
-    async def check_horizontal(self, grid, player):
-        for row in range(7):  # Updated to 7 rows
-            for col in range(3):  # 7-5+1 = 3
-                if all(grid[row][col+i] == player for i in range(5)):  # Changed from 4 to 5
-                    return True
-        return False
+        self.current_round.save(update_fields=['player_a_detail', 'player_b_detail'])
 
-    async def check_vertical(self, grid, player):
-        for row in range(3):  # 7-5+1 = 3
-            for col in range(7):
-                if all(grid[row+i][col] == player for i in range(5)):  # Changed from 4 to 5
-                    return True
-        return False
-
-    async def check_diagonal(self, grid, player):  
-        # Check diagonals (top-left to bottom-right)
-        for row in range(3):  # 7-5+1 = 3
-            for col in range(3):  # 7-5+1 = 3
-                if all(grid[row+i][col+i] == player for i in range(5)):  # Changed from 4 to 5
-                    return True
-                    
-        # Check diagonals (top-right to bottom-left)
-        for row in range(3):  # 7-5+1 = 3
-            for col in range(4, 7):  # Start from column 4 to 6
-                if all(grid[row+i][col-i] == player for i in range(5)):  # Changed from 4 to 5
-                    return True
-        return False
- 
-    @database_sync_to_async
     def validate_move(self, button):  
         current_player_token = str(self.current_round.current_player.auth_token)
         user_token = str(self.user.auth_token)
@@ -834,20 +795,21 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         
         if not (1 <= button <= 49):  # Updated to 49
             return False
+        if self.current_round.turn_time_remaining <= 0:
+            return False
         # if not (1 <= button <= 42):
         #     return False
             
-        all_moves = (
-            self.current_round.player_a_detail['btn_clicked'] + 
-            self.current_round.player_b_detail['btn_clicked']
-        )
-        return button not in all_moves
+        return not self.board.occupied(button)
 
         
     async def declare_winner(self, winner): 
         await self.end_game()
     
     async def turn_shifted(self, event): 
+        if ConnectDotPlayConsumer.clock_owners.get(self.game_id) is self:
+            self.turn_ends_at = datetime.fromisoformat(event['turn_ends_at'])
+            self.schedule_clock()
         await self.send_json({
             'type': 'turn_shifted',
             'new_turn': event['new_turn'],
@@ -862,34 +824,10 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
         await self.channel_layer.group_send(self.game_group, {
             'type': 'turn_shifted',
             'new_turn': str(current_round.current_player.auth_token),
-            'turn_timer': current_round.turn_time_remaining  # Current value, not initial duration
+            'turn_timer': current_round.turn_time_remaining,  # Current value, not initial duration
+            'turn_ends_at': current_round.turn_ends_at.isoformat()
         })
 
-    @database_sync_to_async
-    def shift_turn_after_move(self): 
-        self.current_round = ConnectDotRound.objects.get(id=self.current_round.id)
-        
-        if self.current_round.round_status == 'PLAYER_A_TURN':
-            self.current_round.round_status = 'PLAYER_B_TURN'
-            self.current_round.current_player = self.game.player_b
-        else:
-            self.current_round.round_status = 'PLAYER_A_TURN'
-            self.current_round.current_player = self.game.player_a
-        
-        # Reset turn timer
-        self.current_round.turn_time_remaining = self.TURN_DURATION
-        
-        # Update player status
-        if self.current_round.round_status == 'PLAYER_A_TURN':
-            self.current_round.player_a_detail['is_turn_done'] = False
-            self.current_round.player_b_detail['is_turn_done'] = True
-        else:
-            self.current_round.player_a_detail['is_turn_done'] = True
-            self.current_round.player_b_detail['is_turn_done'] = False
-            
-        self.current_round.save()
-
-     
     async def broadcast_move(self, button): 
         is_player_a = self.user.id == self.game.player_a.id
         await self.channel_layer.group_send(self.game_group, {
@@ -903,6 +841,8 @@ class ConnectDotPlayConsumer(AsyncJsonWebsocketConsumer):
 
 
     async def move_made(self, event):
+        if self.board is not None:
+            self.board.place(event['button'], event['is_player_a'])
         await self.send_json({
             'type': 'move_made',
             'player_id': event['player_id'],  # Changed from 'player'
@@ -6,6 +6,9 @@ from asgiref.sync import sync_to_async
 import asyncio, json, time, datetime , logging 
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.db import  IntegrityError  
+from GameApp.services_file import balances, wallet
+from GameApp.services_file.round_scheduler import round_scheduler
+from GameApp.services_file.instrumentation import InstrumentedConsumer
 from datetime import timedelta 
 from django.db.models import Q  
 from django.utils import timezone as django_timezone
@@ -15,7 +18,7 @@ from datetime import datetime, timedelta, timezone as dt_timezone
 logger = logging.getLogger(__name__)  
 
 
-class FootBallBitConsumer(AsyncJsonWebsocketConsumer):   
+class FootBallBitConsumer(InstrumentedConsumer, AsyncJsonWebsocketConsumer):   
     room_name = "bid_room"
     
     async def connect(self):
@@ -28,6 +31,8 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
                 self.room_name, 
                 self.channel_name
             )
+            await balances.subscribe(self.channel_layer, self.player.id, self.channel_name)
+            await round_scheduler.ensure_started()
 
         except Exception as e:
             await self.handle_connection_error(e)
@@ -77,64 +82,26 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
 
     async def handle_confirm_bet(self, content):
         amount = content['amount']
-        if not await self.check_balance(amount):
+        if not await self.deduct_balance(amount):
             return
-
-        await self.deduct_balance(amount)
-        
-        existing_game = await self.find_existing_game(amount)
-        if existing_game:
-            await self.pair_players(existing_game, amount)
-        else:
-            game = await self.create_new_game(amount)
-            asyncio.create_task(
-                self.check_game_expiration(game.id, amount)
-            ) 
-            await self.channel_layer.group_add(
-                f"game_{game.id}",
-                self.channel_name
-            )
-            await self.send_json({
-                'type': 'waiting', 
-                'game_id': game.id
-            })
-              
-    async def check_game_expiration(self, game_id, amount): 
-        await asyncio.sleep(180)  # 3 minutes
         
-        expired = await self.handle_expired_game_safe(game_id, amount)
-        if expired:
-            await self.notify_game_expired(game_id)
-
-    async def handle_expired_game_safe(self, game_id, amount): 
-        return await self._handle_expired_game(game_id, amount)
-    
-    @database_sync_to_async
-    def _handle_expired_game(self, game_id, amount): 
-        try:
-            game = FootballGame.objects.get(id=game_id) 
-            if game.status == 'waiting' and not game.player_b:  
-                self.player.coins += amount
-                self.player.save()
-                game.delete()
-                return True
-            return False
-        except FootballGame.DoesNotExist:
-            return False
-
-    async def notify_game_expired(self, game_id): 
-        await self.channel_layer.group_send(
-            f"game_{game_id}",
-            {
-                'type': 'game.expired',
-                'message': 'Game expired. Amount refunded.'
-            }
-        ) 
-        await self.channel_layer.group_discard(
-            f"game_{game_id}",
+        # The waiting row holds the stake; the leader's matchmaker pairs it or answers `match.waiting`,
+        # and refunds it with `game.expired` if nobody joins in time.
+        game = await self.create_new_game(amount)
+        await self.channel_layer.group_add(
+            f"game_{game.id}",
             self.channel_name
-        ) 
+        )
+        await round_scheduler.request_match(
+            self.channel_layer, 'football', game.id, self.db_profile.id, amount, self.channel_name
+        )
 
+    async def match_waiting(self, event):
+        await self.send_json({
+            'type': 'waiting', 
+            'game_id': event['game_id']
+        })
+              
     async def game_expired(self, event): 
         await self.send_json({
             'type': 'game_expired',
@@ -145,9 +112,7 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
 
     @database_sync_to_async
     def refund_player(self, player_id, amount): 
-        player = Player.objects.get(id=player_id)
-        player.coins += amount
-        player.save()
+        wallet.credit(player_id, amount, 'football_refund')
 
     @database_sync_to_async
     def get_game_by_id(self, game_id): 
@@ -166,7 +131,8 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
         if game:
             # Check expiration first
             if game.created_at < timezone.now() - timedelta(minutes=3):
-                await self.refund_expired_game_safe(game.id)
+                if await self.refund_expired_game_safe(game.id):
+                    await round_scheduler.cancel_match(self.channel_layer, 'football', game.id)
                 await self.send_json({
                     'type': 'session_expired',
                     'message': 'Game expired. Amount refunded.'
@@ -199,27 +165,24 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
         try:
             game = FootballGame.objects.get(id=game_id)
             if game.status == 'waiting' and not game.player_b: 
-                self.player.coins += game.player_a_bet_amount
-                self.player.save()
+                wallet.credit(self.player.id, game.player_a_bet_amount, 'football_refund')
                 game.delete()
                 return True
             return False
         except FootballGame.DoesNotExist:
             return False
 
-    @database_sync_to_async
-    def check_balance(self, amount):
-        return self.player.coins >= amount
-
     @database_sync_to_async
     def deduct_balance(self, amount):
-        self.player.coins -= amount
-        self.player.save()
+        try:
+            wallet.debit(self.player.id, amount, 'football_bet')
+            return True
+        except ValueError:
+            return False
     
     @database_sync_to_async
     def refund_balance(self, amount):
-        self.player.coins += amount
-        self.player.save()
+        wallet.credit(self.player.id, amount, 'football_refund')
 
     @database_sync_to_async
     def cleanup_expired_games(self, amount):
@@ -232,43 +195,6 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
         ).delete()
 
 
-    @database_sync_to_async
-    def find_existing_game(self, amount):
-        min_amount = max(0, amount - 300)  # Prevent negative amounts
-        max_amount = amount + 300
-        
-        return FootballGame.objects.filter(
-            player_a_bet_amount__range=(min_amount, max_amount),  # Range filter
-            player_b__isnull=True,
-            created_at__gte=timezone.now()-timedelta(minutes=3)
-        ).exclude(player_a=self.db_profile).order_by('created_at').first()
- 
-    async def pair_players(self, game, amount): 
-        await self.update_game_details(game, amount)
-        await self.channel_layer.group_add(
-            f"game_{game.id}",
-            game.player_a_channel
-        )
-        await self.channel_layer.group_add(
-            f"game_{game.id}",
-            self.channel_name
-        )
-        await self.channel_layer.group_send(
-            f"game_{game.id}",
-            {'type': 'game.start', 'game_id': str(game.id), 'redirect': True}
-        )
-
-    @database_sync_to_async
-    def update_game_details(self, game, amount): 
-        game.player_b = self.db_profile
-        game.player_b_bet_amount = amount
-        game.player_b_channel = self.channel_name
-        game.status = 'active'
-        game.save(update_fields=[
-            'player_b', 'player_b_bet_amount',
-            'player_b_channel', 'status'
-        ])
- 
     @database_sync_to_async
     def get_player_channel(self, player):
         return FootballGame.objects.filter(
@@ -315,8 +241,19 @@ class FootBallBitConsumer(AsyncJsonWebsocketConsumer):
             self.channel_name
         )
 
+    async def balance_update(self, event):
+        await self.send_json({
+            'type': 'balance_update',
+            'balance': event['balance']
+        })
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        if getattr(self, 'player', None):
+            await balances.unsubscribe(self.channel_layer, self.player.id, self.channel_name)
+
 
-class FootBallPlayLandConsumer(AsyncJsonWebsocketConsumer): 
+class FootBallPlayLandConsumer(InstrumentedConsumer, AsyncJsonWebsocketConsumer): 
     round_duration = 25
     result_duration = 5  
     game_group = "football_session"
@@ -1039,8 +976,7 @@ class FootBallPlayLandConsumer(AsyncJsonWebsocketConsumer):
                 player=loser_b, round=current_round,
                 amount_won_loss = self.game.player_b_bet_amount, result_type='loss'
             )
-            winner_a.coins += total_amount
-            winner_a.save() 
+            wallet.credit(winner_a.id, total_amount, 'football_win')
         elif winner_b:
             FootBallResult.objects.create(
                 player=winner_b, round=current_round,
@@ -1050,8 +986,7 @@ class FootBallPlayLandConsumer(AsyncJsonWebsocketConsumer):
                 player=loser_a, round=current_round,
                 amount_won_loss = amount_A, result_type='loss'
             )
-            winner_b.coins +=  total_amount
-            winner_b.save()
+            wallet.credit(winner_b.id, total_amount, 'football_win')
         elif winner_draw_a and winner_draw_b:
             FootBallResult.objects.create(
                 player=winner_draw_a, round=current_round,
@@ -1062,10 +997,7 @@ class FootBallPlayLandConsumer(AsyncJsonWebsocketConsumer):
                 player=winner_draw_b, round=current_round,
                 amount_won_loss = amount_B, result_type='win_draw'
             )
-            winner_draw_a.coins += amount_A
-            winner_draw_b.coins += amount_B
-            winner_draw_a.save()
-            winner_draw_b.save()
+            wallet.credit_many({winner_draw_a.id: amount_A, winner_draw_b.id: amount_B}, 'football_draw')
         else:
             FootBallResult.objects.create(
                 player=loss_draw_a, round=current_round,
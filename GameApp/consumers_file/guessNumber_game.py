@@ -8,9 +8,11 @@ from asgiref.sync import sync_to_async
 import asyncio, json, random 
 from channels.generic.websocket import AsyncWebsocketConsumer  
 from django.views.decorators.csrf import csrf_exempt 
+from GameApp.services_file import balances, outcomes, wallet
+from GameApp.services_file.instrumentation import InstrumentedConsumer
 
 
-def default_player_detail_guess(player_token=None):
+def default_player_detail_guess(player_token=None, target_number=None):
     return {
         "player_id": player_token if player_token else None,
         'status': 'bedding',
@@ -21,11 +23,11 @@ def default_player_detail_guess(player_token=None):
         'ended_at': '',
         'time_remaings': 100,
         'attempt_remaining': 10,
-        'target_number': random.randint(0, 1000),
+        'target_number': target_number,
         'your_guesses': []  
     }
 
-class GuessNumberConsumer(AsyncWebsocketConsumer):
+class GuessNumberConsumer(InstrumentedConsumer, AsyncWebsocketConsumer):
     round_duration = 100
     result_duration = 3
     current_phase = 'bedding'
@@ -46,6 +48,7 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
                 self.user_group, 
                 self.channel_name
             )
+            await balances.subscribe(self.channel_layer, self.player.id, self.channel_name)
              
             self.game = await self.get_or_create_game()
             await self.send_initial_state()
@@ -68,11 +71,14 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
             return active_game
              
         profile = self.player.user
-        return GuessNumberGame.objects.create(
+        outcome = outcomes.draw('guess')
+        game = GuessNumberGame.objects.create(
             player_auth=profile,
-            player_game_detail=default_player_detail_guess(player_token = profile.auth_token ),
+            player_game_detail=default_player_detail_guess(player_token = profile.auth_token, target_number=outcome.value),
             player_channel=self.channel_name
         )
+        outcome.commit(game.id)
+        return game
 
     async def send_initial_state(self):
         state = self.game.player_game_detail
@@ -87,7 +93,8 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
                 'target_number': state['target_number'] if state['status'] != 'active' else None, 
                 'game_result': state.get('game_result'),
                 'winning_amount': state.get('winning_amount')
-            }
+            },
+            'fairness': await database_sync_to_async(outcomes.proof)('guess', self.game.id)
         }))
 
     async def handle_connection_error(self, error): 
@@ -163,11 +170,11 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def deduct_balance(self, amount):
-        if self.player.coins < amount:
+        try:
+            wallet.debit(self.player.id, amount, 'guess_bet')
+            return True
+        except ValueError:
             return False
-        self.player.coins -= amount
-        self.player.save()
-        return True
 
     async def start_timer(self, initial_time):
         async with self._timer_lock:
@@ -307,8 +314,7 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def add_winnings(self, amount):
-        self.player.coins += amount
-        self.player.save()
+        wallet.credit(self.player.id, amount, 'guess_win')
 
     @database_sync_to_async
     def save_game_state(self, state):
@@ -330,6 +336,12 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
     async def game_result(self, event):
         await self.send(json.dumps(event))
 
+    async def balance_update(self, event):
+        await self.send(json.dumps({
+            'type': 'balance_update',
+            'balance': event['balance']
+        }))
+
     async def send_error(self, message):
         await self.send(json.dumps({
             'type': 'error',
@@ -344,6 +356,8 @@ class GuessNumberConsumer(AsyncWebsocketConsumer):
             self.user_group,
             self.channel_name
         )
+        if hasattr(self, 'player'):
+            await balances.unsubscribe(self.channel_layer, self.player.id, self.channel_name)
 
     @database_sync_to_async
     def finalize_game(self):
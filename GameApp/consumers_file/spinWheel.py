@@ -1,67 +1,21 @@
 # consumers.py
-import json, random, asyncio
+import json, asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
 from GameApp.models import SpinWheelRound
 from AccountApp.models import db_Profile, Player, Transaction
+from GameApp.services_file import balances, outcomes, wallet
+from GameApp.services_file.instrumentation import InstrumentedConsumer
 
-class SpinWheelConsumer(AsyncWebsocketConsumer):
+class SpinWheelConsumer(InstrumentedConsumer, AsyncWebsocketConsumer):
     ACTIVE_ROUND = None
     TIMER_TASK = None
     ROUND_DURATION = 10 
+    SPIN_COST = 100
+    SPIN_OUTCOME = None
+    SPIN_PROOF = None
 
-    @staticmethod
-    def weighted_choice(choices):
-        values, weights = zip(*choices)
-        return random.choices(values, weights=weights, k=1)[0]
-
-    BOX_PRIZES = {
-        "Gold": lambda: SpinWheelConsumer.weighted_choice([
-            (random.randint(250, 275), 60),
-            (random.randint(276, 300), 22),
-            (random.randint(301, 350), 10),
-            (random.randint(351, 400), 5),
-            (random.randint(401, 450), 2),
-            (random.randint(451, 500), 1),
-        ]),
-
-        "Platinum": lambda: SpinWheelConsumer.weighted_choice([
-            (random.randint(400, 425), 60),
-            (random.randint(426, 450), 22),
-            (random.randint(451, 500), 11),
-            (random.randint(501, 525), 6),
-            (random.randint(536, 550), 2),
-            (random.randint(551, 600), 1),
-        ]),
-
-        "Diamond": lambda: SpinWheelConsumer.weighted_choice([
-            (random.randint(600, 625), 75),
-            (random.randint(626, 650), 13),
-            (random.randint(651, 700), 6),
-            (random.randint(701, 725), 3),
-            (random.randint(736, 750), 2),
-            (random.randint(751, 800), 1),
-        ]),
-
-        "Mystery": lambda: SpinWheelConsumer.weighted_choice([
-            (0, 25),
-            (1, 25),
-            (10, 12),
-            (20, 8),
-            (50, 7),
-            (70, 6),
-            (100, 5),
-            (150, 4),
-            (200, 3),
-            (300, 2),
-            (500, 1),
-            (750, 1),
-            (850, 0.5),
-            (1000, 0.5),
-        ])
-    }
-    
     async def connect(self):
         await self.accept()
         self.user = self.scope["user"]
@@ -73,6 +27,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
         if not self.player:
             await self.close(code=4002)
             return
+        await balances.subscribe(self.channel_layer, self.player.id, self.channel_name)
 
         # Check for existing active round
         self.ACTIVE_ROUND = await self.get_active_round()
@@ -94,21 +49,6 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
     #     values, weights = zip(*choices)
     #     return random.choices(values, weights=weights, k=1)[0]
 
-    @staticmethod
-    def weighted_prize_choice():
-        choices = [
-            ("0", 50),
-            ("50", 25),
-            ("100", 13),
-            ("250", 6),
-            ("Gold", 3),
-            ("Platinum", 1),
-            ("Diamond", 0.5),
-            ("Mystery", 1.5),
-        ]
-        values, weights = zip(*choices)
-        return random.choices(values, weights=weights, k=1)[0]
-
     @database_sync_to_async
     def get_active_round(self):
         try:
@@ -132,7 +72,8 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
                 'type': 'round_update',
                 'status': self.ACTIVE_ROUND.status,
                 'timer': self.ACTIVE_ROUND.timer,
-                'prize': self.ACTIVE_ROUND.game_randomly_prize
+                'prize': self.ACTIVE_ROUND.game_randomly_prize,
+                'fairness': await database_sync_to_async(outcomes.proof)('spin', self.ACTIVE_ROUND.id)
             }))
             
             # If we're in the middle of a round, restart the timer
@@ -156,7 +97,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
                 # await self.send_error("Round already active")
                 return
 
-            if not await self.deduct_coins(100):
+            if not await self.deduct_coins(self.SPIN_COST):
                 await self.send_error("Insufficient balance")
                 return
 
@@ -167,7 +108,8 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
                 'type': 'round_update',
                 'status': "SPIN",  # Send SPIN status immediately
                 'timer': self.ROUND_DURATION,
-                'prize': ''
+                'prize': '',
+                'fairness': self.SPIN_PROOF
             }))
             await self.start_round_timer()
  
@@ -179,21 +121,32 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
  
     @database_sync_to_async
     def deduct_coins(self, amount):
-        if self.player.coins < amount:
+        try:
+            wallet.debit(self.player.id, amount, 'spin_cost')
+            return True
+        except ValueError:
             return False
-        self.player.coins -= amount
-        self.player.save()
-        return True
 
     @database_sync_to_async
     def create_round(self):
-        return SpinWheelRound.objects.create(
+        outcome = outcomes.draw('spin')
+        round_obj = SpinWheelRound.objects.create(
             player=self.player,
             status="ACTIVE",
-            amount_bet=100,
+            amount_bet=self.SPIN_COST,
             timer=self.ROUND_DURATION,
             game_randomly_prize=''
         )
+        outcome.commit(round_obj.id)
+        self.SPIN_OUTCOME = outcome.value
+        self.SPIN_PROOF = outcome.proof()
+        return round_obj
+
+    async def spin_outcome(self):
+        # A round resumed after a reconnect reads the outcome committed when it was created.
+        if self.SPIN_OUTCOME is None:
+            self.SPIN_OUTCOME = await database_sync_to_async(outcomes.committed)('spin', self.ACTIVE_ROUND.id)
+        return self.SPIN_OUTCOME
  
     async def start_round_timer(self):
         if self.TIMER_TASK and not self.TIMER_TASK.done():
@@ -252,7 +205,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
         if not self.ACTIVE_ROUND:
             return
             
-        prize = self.weighted_prize_choice()  # Use weighted selection
+        prize = (await self.spin_outcome())['prize']
 
         await self.update_round_prize(prize) 
         if prize in ["0", "50", "100", "250"]:
@@ -306,7 +259,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
     async def finalize_round(self):
         if self.ACTIVE_ROUND and self.ACTIVE_ROUND.status == "RESULT":
             box_type = self.ACTIVE_ROUND.game_randomly_prize
-            prize_coins = self.BOX_PRIZES[box_type]()
+            prize_coins = (await self.spin_outcome())['boxes'][box_type]
             await self.award_coins(prize_coins)
             await self.complete_round(prize_coins, box_type)
             await self.send_box_opened(box_type, prize_coins)
@@ -314,8 +267,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def award_coins(self, amount):
         if self.player:
-            self.player.coins += amount
-            self.player.save()
+            wallet.credit(self.player.id, amount, 'spin_prize')
  
     @database_sync_to_async
     def complete_round(self, prize_coins, is_box):
@@ -329,6 +281,7 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
                 
             self.ACTIVE_ROUND.save()
             self.ACTIVE_ROUND = None
+            self.SPIN_OUTCOME = None
 
     async def send_prize_result(self, prize, coins):
         await self.send(json.dumps({
@@ -356,7 +309,15 @@ class SpinWheelConsumer(AsyncWebsocketConsumer):
             'message': message
         }))
 
+    async def balance_update(self, event):
+        await self.send(json.dumps({
+            'type': 'balance_update',
+            'balance': event['balance']
+        }))
+
     async def disconnect(self, close_code):
+        if getattr(self, 'player', None):
+            await balances.unsubscribe(self.channel_layer, self.player.id, self.channel_name)
         if self.TIMER_TASK:
             self.TIMER_TASK.cancel()
             try:
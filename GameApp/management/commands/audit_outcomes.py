@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from GameApp.models import OutcomeSeed
+from GameApp.services_file import outcomes
+import hashlib
+
+
+class Command(BaseCommand):
+    help = (
+        "Check revealed outcome seeds: the seed must match its published hash and every "
+        "recorded round outcome must replay from (seed, nonce)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--game', choices=sorted(outcomes.GENERATORS))
+
+    def handle(self, *args, **options):
+        seeds = OutcomeSeed.objects.filter(revealed_at__isnull=False).order_by('created_at')
+        if options['game']:
+            seeds = seeds.filter(game=options['game'])
+
+        failed = 0
+        for seed in seeds:
+            if hashlib.sha256(seed.server_seed.encode()).hexdigest() != seed.seed_hash:
+                failed += 1
+                self.stdout.write(f"{seed.game} {seed.seed_hash}: seed does not match its hash")
+                continue
+            mismatched = outcomes.verify(seed)
+            if mismatched:
+                failed += 1
+                self.stdout.write(f"{seed.game} {seed.seed_hash}: nonces {mismatched[:20]} do not replay")
+        self.stdout.write(f"{seeds.count()} revealed seeds checked, {failed} failed")
@@ -0,0 +1,57 @@
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+import asyncio, statistics, time
+
+
+class Command(BaseCommand):
+    help = "Measure group broadcast latency with N subscribed sockets on the configured (or given) channel layer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=10000)
+        parser.add_argument('--messages', type=int, default=20)
+        parser.add_argument('--backend', help="Dotted path of a layer class to use instead of CHANNEL_LAYERS['default'].")
+
+    def handle(self, *args, **options):
+        if options['backend']:
+            layer = import_string(options['backend'])(capacity=options['messages'] + 10)
+        else:
+            layer = get_channel_layer()
+        asyncio.run(self.run(layer, options['sockets'], options['messages']))
+
+    async def run(self, layer, sockets, messages):
+        group = "bench_broadcast"
+        channels = [await layer.new_channel() for _ in range(sockets)]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        latencies = []
+
+        async def socket(channel):
+            for _ in range(messages):
+                message = await layer.receive(channel)
+                latencies.append(time.perf_counter() - message['sent_at'])
+
+        receivers = [asyncio.create_task(socket(channel)) for channel in channels]
+        await asyncio.sleep(0)
+
+        fanout = []
+        for i in range(messages):
+            sent_at = time.perf_counter()
+            await layer.group_send(group, {'type': 'timer_update', 'timer': i, 'phase': 'bidding', 'sent_at': sent_at})
+            fanout.append(time.perf_counter() - sent_at)
+            # Wait until every socket has this message before sending the next one.
+            while len(latencies) < (i + 1) * sockets:
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*receivers)
+        for channel in channels:
+            await layer.group_discard(group, channel)
+
+        latencies.sort()
+        self.stdout.write(
+            f"{type(layer).__name__}: {sockets} sockets x {messages} broadcasts\n"
+            f"  group_send   p50 {statistics.median(fanout) * 1000:.1f} ms  max {max(fanout) * 1000:.1f} ms\n"
+            f"  delivery     p50 {latencies[len(latencies) // 2] * 1000:.1f} ms  "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms  max {latencies[-1] * 1000:.1f} ms"
+        )
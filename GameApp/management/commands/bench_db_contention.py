@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from AccountApp.models import Player, db_Profile
+from GameApp.models import Dice_Game, Dice_GameRound, Dice_PlayerBid
+from GameApp.services_file import wallet
+from GameApp.services_file.settlement import settle_dice_round
+import random, statistics, threading, time
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent dice bids and settlements against the configured database (DB_PROFILE). "
+        "Run it once per profile to compare; the bench players and rounds are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=16, help="Threads placing bids at the same time.")
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--bids', type=int, default=400, help="Bids per round.")
+
+    def handle(self, *args, **options):
+        self.lock = threading.Lock()
+        self.bid_times, self.settle_times, self.errors = [], [], []
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        game, player_ids = self.build(stamp, options['players'])
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['workers']) as bidders, ThreadPoolExecutor(1) as settler:
+                settling = []
+                for _ in range(options['rounds']):
+                    round_obj = self.new_round(game)
+                    list(bidders.map(lambda player_id: self.timed(self.bid_times, self.place_bid, round_obj.id, player_id),
+                                     [random.choice(player_ids) for _ in range(options['bids'])]))
+                    # The next round's bids run while this one settles, as they do on the live tables.
+                    settling.append(settler.submit(self.timed, self.settle_times, self.settle, round_obj.id))
+                for future in settling:
+                    future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            self.cleanup(stamp, game)
+
+        self.report(options, elapsed)
+
+    def build(self, stamp, count):
+        users = db_Profile.objects.bulk_create([
+            db_Profile(email=f"contention-{stamp}-{i}@example.com", username=f"contention-{stamp}-{i}",
+                       db_fullname=f"Contention {i}", auth_token=f"contention-{stamp}-{i}")
+            for i in range(count)
+        ])
+        if users[0].pk is None:
+            users = list(db_Profile.objects.filter(email__startswith=f"contention-{stamp}-"))
+        # The post_save signal does not fire for bulk_create, so the players are made here.
+        Player.objects.bulk_create([Player(user=user, coins=10 ** 6) for user in users])
+        player_ids = list(Player.objects.filter(user__in=users).values_list('id', flat=True))
+        return Dice_Game.objects.create(name=f"contention-{stamp}"), player_ids
+
+    def new_round(self, game):
+        return Dice_GameRound.objects.create(
+            game=game, status=Dice_GameRound.RoundStatus_dice.ACTIVE, dice1=3, dice2=4, total=7,
+            multiplyer_number={'number1': 5, 'number2': 10},
+            exact_number_on_multiplyer={'number1': 11, 'number2': 12}
+        )
+
+    def place_bid(self, round_id, player_id):
+        # Same writes as DiceRollGameConsumer.create_bid.
+        with transaction.atomic():
+            round_obj = Dice_GameRound.objects.select_for_update().get(id=round_id)
+            wallet.debit(player_id, 20, 'dice_bid')
+            bid, created = Dice_PlayerBid.objects.select_for_update().get_or_create(
+                player_id=player_id, round=round_obj,
+                defaults={'side': random.choice(['DOWN', 'MIDDLE', 'UP']), 'amount_bet_side': 10,
+                          'exact_number': random.randint(2, 12), 'amount_bet_exact': 10}
+            )
+            if not created:
+                bid.amount_bet_side += 10
+                bid.amount_bet_exact += 10
+                bid.save()
+
+    def settle(self, round_id):
+        round_obj = Dice_GameRound.objects.get(id=round_id)
+        settle_dice_round(round_obj, round_obj.total, 'MIDDLE')
+
+    def timed(self, times, func, *args):
+        started = time.perf_counter()
+        try:
+            func(*args)
+        except OperationalError as e:
+            with self.lock:
+                self.errors.append(str(e))
+            return
+        finally:
+            # Every pool thread holds its own connection; hand it back like database_sync_to_async does.
+            connection.close_if_unusable_or_obsolete()
+        with self.lock:
+            times.append(time.perf_counter() - started)
+
+    def cleanup(self, stamp, game):
+        Dice_GameRound.objects.filter(game=game).delete()
+        game.delete()
+        db_Profile.objects.filter(email__startswith=f"contention-{stamp}-").delete()
+
+    def report(self, options, elapsed):
+        db = settings.DATABASES['default']
+        self.stdout.write(f"profile {getattr(settings, 'DB_PROFILE', '-')} ({connection.vendor})"
+                          f"{self.sqlite_mode()}, {options['workers']} workers")
+        self.stdout.write(f"  CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)} OPTIONS={sorted(db.get('OPTIONS', {}))}")
+        self.stdout.write(f"  bids:        {self.summary(self.bid_times, elapsed)}")
+        self.stdout.write(f"  settlements: {self.summary(self.settle_times, elapsed)}")
+        self.stdout.write(f"  lock errors: {len(self.errors)}" + (f" (first: {self.errors[0]})" if self.errors else ""))
+
+    def sqlite_mode(self):
+        if connection.vendor != 'sqlite':
+            return ""
+        with connection.cursor() as cursor:
+            journal = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+        return f" journal_mode={journal} synchronous={synchronous}"
+
+    def summary(self, times, elapsed):
+        if not times:
+            return "none completed"
+        times = sorted(times)
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+        return (f"{len(times)} in {elapsed:.2f}s ({len(times) / elapsed:.0f}/s), "
+                f"p50 {statistics.median(times) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from AccountApp.models import Player, db_Profile
+from GameApp.models import Dice_Game, Dice_GameRound, Dice_PlayerBid, Dice_PlayerResult
+from GameApp.services_file.settlement import settle_dice_round
+import random, time
+
+MAX_STAKE = 500
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time dice round settlement against a throwaway round with N bids (everything is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bids', type=int, default=5000)
+        parser.add_argument('--legacy', action='store_true', help="Settle with the old per-bid loop for comparison.")
+        parser.add_argument('--stake', type=int, default=None,
+                            help="Give every bid this stake; by default stakes are drawn from 1..MAX_STAKE like real bets.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                round_obj = self.build_round(options['bids'], options['stake'])
+                settle = self.settle_legacy if options['legacy'] else settle_dice_round
+
+                queries = []
+                # Time it as production runs it: DEBUG's query log formats every statement and its parameters.
+                with override_settings(DEBUG=False), \
+                        connection.execute_wrapper(lambda execute, sql, *a: queries.append(sql) or execute(sql, *a)):
+                    started = time.perf_counter()
+                    settle(round_obj, round_obj.total, 'DOWN')
+                    elapsed = time.perf_counter() - started
+
+                # Payouts follow the stakes, so this is how varied the credits were.
+                payouts = Dice_PlayerResult.objects.filter(round=round_obj).exclude(result_type='lose')
+                self.stdout.write(
+                    f"{'legacy' if options['legacy'] else 'bulk'}: {options['bids']} bids settled in "
+                    f"{elapsed * 1000:.1f} ms with {len(queries)} queries "
+                    f"({payouts.count()} winners, {payouts.values('amount_won_loss').distinct().count()} distinct payouts)"
+                )
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def build_round(self, count, stake):
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        users = db_Profile.objects.bulk_create([
+            db_Profile(email=f"bench-{stamp}-{i}@example.com", username=f"bench-{stamp}-{i}",
+                       db_fullname=f"Bench {i}", auth_token=f"bench-{i}")
+            for i in range(count)
+        ])
+        if users[0].pk is None:
+            users = list(db_Profile.objects.filter(email__startswith=f"bench-{stamp}-"))
+        players = Player.objects.bulk_create([Player(user=user, coins=1000) for user in users])
+        if players[0].pk is None:
+            players = list(Player.objects.filter(user__in=users))
+
+        game = Dice_Game.objects.create(name="bench")
+        round_obj = Dice_GameRound.objects.create(
+            game=game, status=Dice_GameRound.RoundStatus_dice.ACTIVE, dice1=1, dice2=3, total=4,
+            multiplyer_number={'number1': 5, 'number2': 10},
+            exact_number_on_multiplyer={'number1': 11, 'number2': 12}
+        )
+        def draw_stake():
+            return stake or random.randint(1, MAX_STAKE)
+
+        Dice_PlayerBid.objects.bulk_create([
+            Dice_PlayerBid(player=player, round=round_obj,
+                           side=random.choice(['DOWN', 'MIDDLE', 'UP']), amount_bet_side=draw_stake(),
+                           exact_number=random.randint(2, 12), amount_bet_exact=draw_stake())
+            for player in players
+        ])
+        return round_obj
+
+    def settle_legacy(self, round_obj, total, winning_side):
+        # The per-bid loop settle_dice_round replaced: one result insert and one player save per bid.
+        bids = Dice_PlayerBid.objects.filter(round=round_obj)
+        for bid in bids:
+            total_return, won = 0, False
+            if bid.side == winning_side:
+                total_return += bid.amount_bet_side * 0.90
+                won = True
+            if bid.exact_number in round_obj.exact_number_on_multiplyer.values() or bid.exact_number == total:
+                total_return += bid.amount_bet_exact * 0.90
+                won = True
+            total_bet = bid.amount_bet_side + bid.amount_bet_exact
+            player = bid.player
+            Dice_PlayerResult.objects.create(
+                player=player, round=round_obj,
+                amount_bet_side=bid.amount_bet_side, amount_bet_exact=bid.amount_bet_exact,
+                amount_won_loss=total_return + total_bet if won else total_bet,
+                result_type='win' if won else 'lose'
+            )
+            if won:
+                player.coins += total_return + total_bet
+                player.save()
+            player.user.db_fullname
@@ -0,0 +1,374 @@
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from AccountApp.models import Player, db_Profile
+from GameApp import routing
+from GameApp.services_file import instrumentation
+from GameApp.services_file.round_scheduler import round_scheduler
+import asyncio, json, random, statistics, threading, time
+
+ROUTES = ['card', 'dice', 'color', 'rocket', 'guess', 'spin', 'football', 'dots']
+PATHS = {
+    'card': '/ws/card_game/loadtest/',
+    'dice': '/ws/dice_game/loadtest/',
+    'color': '/ws/colorTrade_game/loadtest/',
+    'rocket': '/ws/crashRocket_game/loadtest/',
+    'guess': '/ws/guess_number_game/loadtest/',
+    'spin': '/ws/spinWheel_game/loadtest/',
+}
+
+
+class QueryCounter:
+    """execute_wrapper installed on every connection, including the ones the DB pool threads open later."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class LoadTestUsers:
+    """ASGI middleware standing in for AuthMiddlewareStack: the user comes from an x-loadtest-user header."""
+
+    def __init__(self, inner, users):
+        self.inner = inner
+        self.users = users
+
+    async def __call__(self, scope, receive, send):
+        user_id = int(dict(scope['headers'])[b'x-loadtest-user'])
+        return await self.inner(dict(scope, user=self.users[user_id]), receive, send)
+
+
+class RouteStats:
+    def __init__(self, route):
+        self.route = route
+        self.latencies = []
+        self.actions = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.failures = 0
+        self.messages = 0
+        self.bytes = 0
+        self.queries = 0
+        self.elapsed = 0
+
+
+class Client:
+    """One websocket session. A reader task counts every frame and wakes whoever waits for a message type."""
+
+    def __init__(self, application, path, user, stats):
+        self.user = user
+        self.stats = stats
+        self.round_id = None
+        self.communicator = WebsocketCommunicator(application, path, headers=[(b'x-loadtest-user', str(user.id).encode())])
+        self.waiters = []
+        self.inbox = []
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect(timeout=10)
+        if not connected:
+            raise RuntimeError("connection refused")
+        self.reader = asyncio.create_task(self.read())
+
+    async def read(self):
+        while True:
+            try:
+                frame = await self.communicator.receive_output(timeout=3600)
+            except Exception:
+                return
+            if frame.get('type') != 'websocket.send' or not frame.get('text'):
+                if frame.get('type') == 'websocket.close':
+                    return
+                continue
+            self.stats.messages += 1
+            self.stats.bytes += len(frame['text'])
+            message = json.loads(frame['text'])
+            self.round_id = message.get('round_id', self.round_id)
+            if message.get('type') == 'error':
+                self.stats.rejected += 1
+            self.inbox.append(message)
+            for types, future in list(self.waiters):
+                if message.get('type') in types and not future.done():
+                    future.set_result(message)
+
+    async def wait_for(self, *types, timeout=5):
+        future = asyncio.get_running_loop().create_future()
+        entry = (set(types), future)
+        self.waiters.append(entry)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiters.remove(entry)
+
+    async def act(self, payload, *reply_types, timeout=5):
+        """Send an action and time it until the first matching message (usually a broadcast) comes back."""
+        self.stats.actions += 1
+        started = time.perf_counter()
+        waiter = asyncio.create_task(self.wait_for(*reply_types, timeout=timeout))
+        await asyncio.sleep(0)
+        await self.communicator.send_to(text_data=json.dumps(payload))
+        message = await waiter
+        if message is None:
+            self.stats.timeouts += 1
+        else:
+            self.stats.latencies.append(time.perf_counter() - started)
+        return message
+
+    async def close(self):
+        self.reader.cancel()
+        try:
+            await self.communicator.disconnect(timeout=5)
+        except Exception:
+            pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive scripted websocket sessions against every game route in-process and report "
+        "p50/p99 action-to-broadcast latency, messages per second and DB queries per action."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help="Concurrent sessions per route.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds per route.")
+        parser.add_argument('--routes', default=','.join(ROUTES), help=f"Comma separated subset of {','.join(ROUTES)}.")
+        parser.add_argument('--think', type=float, default=1.0, help="Mean pause between a session's actions.")
+        parser.add_argument('--keep-users', action='store_true')
+        parser.add_argument('--consumer-metrics', action='store_true', help="Also print the server side per-action metrics.")
+
+    def handle(self, *args, **options):
+        routes = [route for route in options['routes'].split(',') if route]
+        unknown = set(routes) - set(ROUTES)
+        if unknown:
+            self.stderr.write(f"Unknown routes: {', '.join(sorted(unknown))}")
+            return
+
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        users = self.build_users(stamp, options['clients'])
+        self.counter = QueryCounter()
+        self.counter.install()
+        connection_created.connect(self.counter.install)
+        try:
+            results = asyncio.run(self.run(routes, users, options))
+        finally:
+            connection_created.disconnect(self.counter.install)
+            if not options['keep_users']:
+                db_Profile.objects.filter(email__startswith=f"loadtest-{stamp}-").delete()
+
+        for stats in results:
+            self.report(stats)
+        if options['consumer_metrics']:
+            self.stdout.write(instrumentation.dump())
+
+    def build_users(self, stamp, count):
+        db_Profile.objects.bulk_create([
+            db_Profile(email=f"loadtest-{stamp}-{i}@example.com", username=f"loadtest-{stamp}-{i}",
+                       db_fullname=f"Load {i}", auth_token=f"loadtest-{stamp}-{i}")
+            for i in range(count)
+        ])
+        users = list(db_Profile.objects.filter(email__startswith=f"loadtest-{stamp}-").order_by('id'))
+        Player.objects.bulk_create([Player(user=user, coins=10 ** 7) for user in users])
+        return users
+
+    async def run(self, routes, users, options):
+        application = LoadTestUsers(URLRouter(routing.websocket_urlpatterns), {user.id: user for user in users})
+        self.think = options['think']
+        results = []
+        try:
+            for route in routes:
+                stats = RouteStats(route)
+                session = getattr(self, f"session_{route}")
+                deadline = time.perf_counter() + options['duration']
+                queries_before = self.counter.count
+                started = time.perf_counter()
+                if route in ('football', 'dots'):
+                    pairs = [users[i:i + 2] for i in range(0, len(users) - 1, 2)]
+                    outcomes = await asyncio.gather(*[session(application, pair, stats, deadline, index)
+                                                      for index, pair in enumerate(pairs)], return_exceptions=True)
+                    stats.failures += sum(isinstance(outcome, Exception) for outcome in outcomes)
+                else:
+                    await asyncio.gather(*[self.guarded(route, session, application, user, stats, deadline)
+                                           for user in users])
+                stats.elapsed = time.perf_counter() - started
+                stats.queries = self.counter.count - queries_before
+                results.append(stats)
+        finally:
+            await round_scheduler.stop()
+        return results
+
+    async def guarded(self, route, session, application, user, stats, deadline):
+        client = None
+        try:
+            client = await self.open(application, PATHS[route], user, stats)
+            await session(client, deadline)
+        except Exception:
+            stats.failures += 1
+        finally:
+            if client:
+                await client.close()
+
+    async def open(self, application, path, user, stats):
+        client = Client(application, path, user, stats)
+        await client.connect()
+        # Spread the first actions out instead of firing every session at once.
+        await asyncio.sleep(random.uniform(0, self.think))
+        return client
+
+    async def pause(self):
+        await asyncio.sleep(random.expovariate(1 / self.think) if self.think > 0 else 0)
+
+    # ******************************   Sessions **************************
+
+    async def session_card(self, client, deadline):
+        await client.wait_for('initial_state', 'round.start', timeout=10)
+        while time.perf_counter() < deadline:
+            if client.round_id:
+                await client.act({'action': 'place_bid', 'amount': random.randint(1, 50),
+                                  'side': random.choice(['number', 'picture']), 'round_id': client.round_id},
+                                 'participants_delta', 'bids_update', 'error')
+            await self.pause()
+
+    async def session_dice(self, client, deadline):
+        while time.perf_counter() < deadline:
+            exact = random.random() < 0.3
+            await client.act({'action': 'place_bid', 'amount': random.randint(1, 50),
+                              'side': None if exact else random.choice(['DOWN', 'MIDDLE', 'UP']),
+                              'exact_number': random.randint(2, 12) if exact else None},
+                             'participants_delta', 'bid_update', 'error')
+            await self.pause()
+
+    async def session_color(self, client, deadline):
+        selections = {'COLOR': ['Green', 'Red', 'Violet'], 'SIZE': ['Big', 'Small'], 'EXACT': list(range(10))}
+        while time.perf_counter() < deadline:
+            bet_type = random.choice(list(selections))
+            await client.act({'action': 'place_bet', 'bet_type': bet_type, 'selection': random.choice(selections[bet_type]),
+                              'amount': random.randint(1, 50), 'multiplier': 1},
+                             'bid_update', 'bet_success', 'error')
+            await self.pause()
+
+    async def session_rocket(self, client, deadline):
+        while time.perf_counter() < deadline:
+            guess = round(random.uniform(1.2, 5), 2)
+            placed = await client.act({'action': 'place_bet', 'amount': random.randint(1, 50), 'guess': guess},
+                                      'bids_update', 'participants_delta', 'bet.confirmed', 'error')
+            if placed and placed.get('type') != 'error':
+                # Cash out early once the flight is underway.
+                if await client.wait_for('game.update', timeout=30):
+                    await client.act({'action': 'change_guess', 'MindChangeGuess': 1.0},
+                                     'guess.updated', 'participants_delta', 'error')
+                await client.wait_for('round.start', timeout=30)
+            await self.pause()
+
+    async def session_guess(self, client, deadline):
+        while time.perf_counter() < deadline:
+            reply = await client.act({'action': 'place_bid', 'amount': random.randint(1, 50)}, 'game_update', 'error')
+            if reply and reply.get('type') == 'game_update':
+                for _ in range(5):
+                    reply = await client.act({'action': 'submit_guess', 'guess': random.randint(1, 100)},
+                                             'guess_result', 'game_result', 'error')
+                    if not reply or reply.get('type') != 'guess_result':
+                        break
+                    await self.pause()
+            await self.pause()
+
+    async def session_spin(self, client, deadline):
+        while time.perf_counter() < deadline:
+            reply = await client.act({'action': 'spin'}, 'round_update', 'error')
+            if reply and reply.get('type') == 'round_update':
+                await client.wait_for('prize_result', 'box_opened', timeout=30)
+            await self.pause()
+
+    async def session_football(self, application, pair, stats, deadline, index):
+        await self.two_player_session(application, pair, stats, deadline, index, '/ws/football_bitLand/loadtest/',
+                                      '/ws/football_playLand/loadtest/{}/', self.football_turn)
+
+    async def session_dots(self, application, pair, stats, deadline, index):
+        await self.two_player_session(application, pair, stats, deadline, index, '/ws/connect_dots_bit/loadtest/',
+                                      '/ws/connect_dots_play/loadtest/{}/', self.dots_turn)
+
+    async def two_player_session(self, application, pair, stats, deadline, index, bit_path, play_path, turn):
+        """Both players confirm the same (pair-unique) bet, follow the redirect and take turns until the deadline."""
+        lobby = [await self.open(application, bit_path, user, stats) for user in pair]
+        try:
+            game_id = None
+            for client in lobby:
+                reply = await client.act({'action': 'confirm_bet', 'amount': 1000 + index}, 'waiting', 'redirect', timeout=10)
+                if reply and reply.get('type') == 'redirect':
+                    game_id = reply['game_id']
+            if not game_id:
+                reply = await lobby[0].wait_for('redirect', timeout=10)
+                game_id = reply and reply['game_id']
+        finally:
+            for client in lobby:
+                await client.close()
+        if not game_id:
+            stats.failures += 1
+            return
+
+        players = [await self.open(application, play_path.format(game_id), user, stats) for user in pair]
+        try:
+            moves = set()
+            while time.perf_counter() < deadline:
+                if not await turn(players, moves):
+                    break
+                await self.pause()
+        finally:
+            for client in players:
+                await client.close()
+
+    def current_turn(self, players):
+        for message in reversed(players[0].inbox):
+            turn = message.get('current_turn') or message.get('new_turn') or message.get('current_player')
+            if turn:
+                return str(turn)
+        return None
+
+    async def football_turn(self, players, moves):
+        turn = self.current_turn(players)
+        kicker = next((client for client in players if client.user.auth_token == turn), None)
+        if not kicker:
+            return await players[0].wait_for('game.update', 'initial_state', timeout=10) is not None
+        reply = await kicker.act({'action': 'kick', 'vertical': random.random(), 'horizontal': random.random(),
+                                  'power': random.uniform(0.3, 1), 'goalMe': False},
+                                 'game.update', 'game.result', 'error', timeout=10)
+        return bool(reply) and reply.get('type') != 'game.result'
+
+    async def dots_turn(self, players, moves):
+        turn = self.current_turn(players)
+        mover = next((client for client in players if client.user.auth_token == turn), None)
+        if not mover:
+            return await players[0].wait_for('game_state', 'turn_shifted', 'move_made', timeout=10) is not None
+        button = random.choice([b for b in range(1, 50) if b not in moves] or [1])
+        moves.add(button)
+        reply = await mover.act({'action': 'make_move', 'button': button},
+                                'move_made', 'turn_shifted', 'game.result', 'error', timeout=10)
+        return bool(reply) and reply.get('type') != 'game.result'
+
+    # ******************************   Report **************************
+
+    def report(self, stats):
+        latencies = sorted(stats.latencies)
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            latency = f"p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms"
+        else:
+            latency = "no replies"
+        elapsed = stats.elapsed or 1
+        self.stdout.write(
+            f"{stats.route:9} actions {stats.actions:6} ({stats.timeouts} timed out, {stats.rejected} rejected, {stats.failures} sessions failed) | {latency} | "
+            f"{stats.messages / elapsed:8.0f} msgs/s, {stats.bytes / elapsed / 1024:7.1f} KiB/s | "
+            f"{stats.queries / max(stats.actions, 1):6.1f} queries/action"
+        )
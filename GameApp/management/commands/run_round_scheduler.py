@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from GameApp.services_file.round_scheduler import round_scheduler
+import asyncio
+
+
+class Command(BaseCommand):
+    help = "Run the live table round scheduler (card, dice, color, rocket) in this process."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Round scheduler starting as {round_scheduler.holder}")
+        try:
+            asyncio.run(round_scheduler.run())
+        except KeyboardInterrupt:
+            self.stdout.write("Round scheduler stopped")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+GAMES = ['card', 'dice', 'color', 'rocket', 'spin']
+
+
+class Command(BaseCommand):
+    help = (
+        "Monte Carlo of every game's payout rules (NumPy): RTP, house edge, spread and tail "
+        "payout per bet type, all per unit stake. Needs numpy; touches no tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', default=','.join(GAMES), help=f"Comma separated subset of {','.join(GAMES)}.")
+        parser.add_argument('--rounds', type=int, default=10_000_000, help="Rounds per game.")
+        parser.add_argument('--seed', type=int, default=None, help="Fix the RNG to repeat a run.")
+        parser.add_argument('--card-players', type=int, default=20, help="Bettors per simulated card round.")
+
+    def handle(self, *args, **options):
+        try:
+            from GameApp.services_file import house_edge
+        except ImportError as e:
+            raise CommandError(f"The simulator needs numpy ({e}).")
+
+        games = [game for game in options['games'].split(',') if game]
+        unknown = set(games) - set(GAMES)
+        if unknown:
+            raise CommandError(f"Unknown games: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f"{'game':<8}{'bet':<16}{'rounds':>12}{'RTP %':>9}{'edge %':>9}{'std':>9}"
+                          f"{'hit %':>8}{'p99':>9}{'p99.9':>9}{'max':>9}")
+        for game in games:
+            extra = {'players': options['card_players']} if game == 'card' else {}
+            started = time.perf_counter()
+            report = house_edge.simulate(game, options['rounds'], seed=options['seed'], **extra)
+            for bet, row in report.items():
+                self.stdout.write(
+                    f"{game:<8}{bet:<16}{row['rounds']:>12}{row['rtp'] * 100:>9.2f}{row['house_edge'] * 100:>9.2f}"
+                    f"{row['std']:>9.3f}{row['hit_rate'] * 100:>8.2f}{row['p99']:>9.2f}{row['p999']:>9.2f}{row['max']:>9.2f}"
+                )
+            self.stdout.write(f"{game:<8}{'':<16}{time.perf_counter() - started:>11.1f}s")
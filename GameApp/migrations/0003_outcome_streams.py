@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameApp', '0002_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutcomeSeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('game', models.CharField(max_length=20)),
+                ('seed_hash', models.CharField(max_length=64, unique=True)),
+                ('server_seed', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('revealed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoundOutcome',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nonce', models.PositiveIntegerField()),
+                ('game', models.CharField(max_length=20)),
+                ('round_ref', models.CharField(max_length=64)),
+                ('value', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('seed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outcomes', to='GameApp.outcomeseed')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['game', 'round_ref'], name='GameApp_rou_game_b16cb6_idx')],
+                'unique_together': {('seed', 'nonce')},
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_boards(apps, schema_editor):
+    # Rounds still in play carry their dots only in the btn_clicked lists.
+    ConnectDotRound = apps.get_model('GameApp', 'ConnectDotRound')
+    for round_obj in ConnectDotRound.objects.all().iterator():
+        buttons_a = [b for b in round_obj.player_a_detail.get('btn_clicked', []) if 1 <= b <= 49]
+        buttons_b = [b for b in round_obj.player_b_detail.get('btn_clicked', []) if 1 <= b <= 49]
+        if not buttons_a and not buttons_b:
+            continue
+        round_obj.player_a_board = sum(1 << (b - 1) for b in set(buttons_a))
+        round_obj.player_b_board = sum(1 << (b - 1) for b in set(buttons_b))
+        round_obj.move_count = len(set(buttons_a)) + len(set(buttons_b))
+        round_obj.save(update_fields=['player_a_board', 'player_b_board', 'move_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameApp', '0003_outcome_streams'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connectdotround',
+            name='move_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='connectdotround',
+            name='player_a_board',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='connectdotround',
+            name='player_b_board',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ConnectDotMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('button', models.PositiveSmallIntegerField()),
+                ('move_number', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='GameApp.connectdotround')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('round', 'button'), name='unique_round_button_dot'), models.UniqueConstraint(fields=('round', 'move_number'), name='unique_round_move_dot')],
+            },
+        ),
+        migrations.RunPython(fill_boards, migrations.RunPython.noop),
+    ]
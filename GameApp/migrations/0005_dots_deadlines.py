@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_deadlines(apps, schema_editor):
+    # Rounds still in play keep the time they had left when the counters stop.
+    ConnectDotRound = apps.get_model('GameApp', 'ConnectDotRound')
+    now = timezone.now()
+    for round_obj in ConnectDotRound.objects.all().iterator():
+        round_obj.ends_at = now + timedelta(seconds=round_obj.timer_remaining)
+        round_obj.turn_ends_at = now + timedelta(seconds=round_obj.turn_time_remaining)
+        round_obj.save(update_fields=['ends_at', 'turn_ends_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GameApp', '0004_dots_board'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='connectdotround',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='connectdotround',
+            name='turn_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_deadlines, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='connectdotround',
+            name='timer_remaining',
+        ),
+        migrations.RemoveField(
+            model_name='connectdotround',
+            name='turn_time_remaining',
+        ),
+    ]
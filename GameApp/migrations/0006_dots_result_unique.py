@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+from django.db import migrations, models
+
+
+def drop_duplicate_results(apps, schema_editor):
+    # A game settled twice left two results per player; keep the first so the constraint can be added.
+    ConnectDotResult = apps.get_model('GameApp', 'ConnectDotResult')
+    seen = set()
+    duplicates = []
+    for result_id, round_id, player_id in ConnectDotResult.objects.order_by('id').values_list('id', 'round_id', 'player_id'):
+        if (round_id, player_id) in seen:
+            duplicates.append(result_id)
+        seen.add((round_id, player_id))
+    ConnectDotResult.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AccountApp', '0001_initial'),
+        ('GameApp', '0005_dots_deadlines'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_results, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='connectdotresult',
+            constraint=models.UniqueConstraint(fields=('round', 'player'), name='unique_round_player_dot_result'),
+        ),
+    ]
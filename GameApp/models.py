@@ -1,5 +1,5 @@
 # models.py 
-import datetime, random
+import datetime, math, random
 from django.utils import timezone  
 from django.db import models
 from django.conf import settings
@@ -166,6 +166,12 @@ class FootBallResult(models.Model):
         return (self.player.user.db_phone_number or str(self.player.id)) 
 
 # ******************************   Dots Connect  **************************
+def seconds_until(deadline):
+    """Whole seconds left before `deadline`, as the clocks show them."""
+    if deadline is None:
+        return 0
+    return max(0, math.ceil((deadline - timezone.now()).total_seconds()))
+
 def default_player_detail_dot(player_token=None):
     return {
         "player_id": player_token if player_token else None,
@@ -173,7 +179,6 @@ def default_player_detail_dot(player_token=None):
         'ended_at': '',
         'score': 0,
         'is_turn_done': False, 
-        'btn_clicked': [] # there will come which button are clicked [1,42,14,25 , so on..]
     }
 
 class ConnectDotGame(models.Model):
@@ -206,14 +211,49 @@ class ConnectDotRound(models.Model):
 
     player_a_detail = JSONField(max_length=100000, default=default_player_detail_dot)
     player_b_detail = JSONField(max_length=100000, default=default_player_detail_dot)  
-    timer_remaining = models.PositiveIntegerField(default=150) # 150 seconds 
-    turn_time_remaining = models.PositiveIntegerField(default=5)
+    # Dots taken by each player, bit (button - 1) of a 49-bit board; the moves themselves are in ConnectDotMove.
+    player_a_board = models.BigIntegerField(default=0)
+    player_b_board = models.BigIntegerField(default=0)
+    move_count = models.PositiveSmallIntegerField(default=0)
+    # Set once per game and once per turn; the time left is worked out when read.
+    ends_at = models.DateTimeField(null=True, blank=True)
+    turn_ends_at = models.DateTimeField(null=True, blank=True)
     current_player = models.ForeignKey(db_Profile, on_delete=models.CASCADE)  
     created_at = models.DateTimeField(auto_now_add=True) 
 
+    @property
+    def timer_remaining(self):
+        return seconds_until(self.ends_at)
+
+    @property
+    def turn_time_remaining(self):
+        return seconds_until(self.turn_ends_at)
+
     def __str__(self):
         return  str(self.id)  
      
+class ConnectDotMove(models.Model):
+    round = models.ForeignKey(ConnectDotRound, on_delete=models.CASCADE, related_name='moves')
+    player = models.ForeignKey(db_Profile, on_delete=models.CASCADE)
+    button = models.PositiveSmallIntegerField() # 1..49
+    move_number = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['round', 'button'],
+                name='unique_round_button_dot'
+            ),
+            models.UniqueConstraint(
+                fields=['round', 'move_number'],
+                name='unique_round_move_dot'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.round_id}:{self.move_number}"
+
 class ConnectDotResult(models.Model):
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     round = models.ForeignKey(ConnectDotRound, on_delete=models.CASCADE) 
@@ -221,6 +261,14 @@ class ConnectDotResult(models.Model):
     result_type = models.CharField(max_length=20) # type win/lose/draw_(winner/loss) , draw_winner both player score = {1, 1} w, draw_loss both player with score = {0, 0}
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['round', 'player'],
+                name='unique_round_player_dot_result'
+            )
+        ]
+
     def __str__(self):
         if self.player.user.email:
             return self.player.user.email 
@@ -559,4 +607,42 @@ class SpinWheelRound(models.Model):
         if self.player.user.email:
             return self.player.user.email
         return self.player.user.db_phone_number or str(self.player.user.id)
- 
\ No newline at end of file
+ 
+# ******************************   Round Scheduler ****************************** 
+
+class SchedulerLease(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=150)
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name + " | " + self.holder
+
+# ******************************   Outcome Streams ****************************** 
+
+class OutcomeSeed(models.Model):
+    game = models.CharField(max_length=20)
+    # sha256 of server_seed, public from creation; server_seed is only shown once revealed_at is set.
+    seed_hash = models.CharField(max_length=64, unique=True)
+    server_seed = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revealed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.game + " | " + self.seed_hash
+
+class RoundOutcome(models.Model):
+    seed = models.ForeignKey(OutcomeSeed, on_delete=models.CASCADE, related_name='outcomes')
+    nonce = models.PositiveIntegerField()
+    game = models.CharField(max_length=20)
+    round_ref = models.CharField(max_length=64)
+    value = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('seed', 'nonce')
+        indexes = [models.Index(fields=['game', 'round_ref'])]
+
+    def __str__(self):
+        return f"{self.game} | {self.round_ref} | {self.nonce}"
@@ -0,0 +1,103 @@
+#balances.py
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from AccountApp.models import Player
+import logging
+logger = logging.getLogger(__name__)
+
+# Writes keep the cache current, the TTL only bounds how long a value written
+# outside the wallet (admin, shell) can be served.
+BALANCE_TTL = 300
+
+# A per-process cache can't see what the other workers write, so balances are
+# only cached when the cache is shared; otherwise every read is a database read.
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+SHARED_CACHE = settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES
+
+
+def balance_key(player_id):
+    return f"balance:{player_id}"
+
+
+def player_key(user_id):
+    return f"balance_player:{user_id}"
+
+
+def balance_group(player_id):
+    return f"balance_{player_id}"
+
+
+def stored(player_id):
+    return Player.objects.filter(pk=player_id).values_list('coins', flat=True).first() or 0
+
+
+def get(player_id):
+    if not SHARED_CACHE:
+        return stored(player_id)
+    coins = cache.get(balance_key(player_id))
+    if coins is None:
+        coins = stored(player_id)
+        cache.set(balance_key(player_id), coins, BALANCE_TTL)
+    return coins
+
+
+async def aget(player_id):
+    coins = await cache.aget(balance_key(player_id)) if SHARED_CACHE else None
+    if coins is None:
+        coins = await database_sync_to_async(get)(player_id)
+    return coins
+
+
+def player_id_for_user(user_id):
+    # A user's player row never changes, so the mapping is cached without expiry, even per process.
+    player_id = cache.get(player_key(user_id))
+    if player_id is None:
+        player_id = Player.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+        if player_id is not None:
+            cache.set(player_key(user_id), player_id, None)
+    return player_id
+
+
+def get_for_user(user_id):
+    """Balance of a user's player, or None if the user has no player."""
+    player_id = player_id_for_user(user_id)
+    return None if player_id is None else get(player_id)
+
+
+def publish(balances):
+    """
+    Store freshly written balances ({player_id: coins}) in the shared cache
+    and push a `balance_update` to every socket the player has open. The
+    wallet calls this from `transaction.on_commit`, so rolled back writes are
+    never seen.
+    """
+    if not balances:
+        return
+    if SHARED_CACHE:
+        cache.set_many({balance_key(player_id): coins for player_id, coins in balances.items()}, BALANCE_TTL)
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(push)(channel_layer, balances)
+    except Exception as e:
+        logger.exception(f"Balance push failed: {e}")
+
+
+async def push(channel_layer, balances):
+    for player_id, coins in balances.items():
+        await channel_layer.group_send(balance_group(player_id), {
+            'type': 'balance.update',
+            'balance': coins
+        })
+
+
+async def subscribe(channel_layer, player_id, channel_name):
+    await channel_layer.group_add(balance_group(player_id), channel_name)
+
+
+async def unsubscribe(channel_layer, player_id, channel_name):
+    await channel_layer.group_discard(balance_group(player_id), channel_name)
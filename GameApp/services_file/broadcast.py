@@ -0,0 +1,82 @@
+#broadcast.py
+from django.conf import settings
+import asyncio, logging
+logger = logging.getLogger(__name__)
+
+# Snapshots where only the newest one matters: whole message types, and (type, event) pairs of types that
+# also carry events. Everything else (results, cashouts, round starts, the rocket's crash) is an event.
+STATE_TYPES = {'timer_update', 'timer.update', 'bids.update', 'bid_update'}
+STATE_EVENTS = {('game.update', 'flight')}
+
+
+def state_key(message):
+    """The key a state message is merged under, or None for an event."""
+    kind = message.get('type')
+    if kind in STATE_TYPES:
+        return kind
+    if (kind, message.get('event')) in STATE_EVENTS:
+        return kind, message['event']
+    return None
+
+
+class BroadcastCoalescer:
+    """
+    Sits between the game code and `channel_layer.group_send`. State messages
+    are held per group for `window` seconds and only the latest one per key is
+    sent, so a bid storm costs one broadcast per window instead of one per bid.
+    Events go out immediately, right after whatever state is pending for the
+    group, so clients still see everything in order.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._pending = {}   # group -> {key: (channel_layer, message or async factory)}
+        self._flushers = {}  # group -> flush task
+
+    async def send(self, channel_layer, group, message):
+        key = state_key(message)
+        if key is not None:
+            await self.send_state(channel_layer, group, key, message)
+        else:
+            await self.send_event(channel_layer, group, message)
+
+    async def send_state(self, channel_layer, group, key, message):
+        """
+        `message` is a dict or an async callable building one; a callable only
+        runs if it is still the latest at flush, and may return None to skip.
+        """
+        if self.window <= 0:
+            message = await message() if callable(message) else message
+            if message:
+                await channel_layer.group_send(group, message)
+            return
+        self._pending.setdefault(group, {})[key] = (channel_layer, message)
+        if group not in self._flushers:
+            self._flushers[group] = asyncio.create_task(self.flush_later(group))
+
+    async def send_event(self, channel_layer, group, message):
+        await self.flush(group)
+        await channel_layer.group_send(group, message)
+
+    async def flush_later(self, group):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._flushers.pop(group, None)
+        await self.flush(group)
+
+    async def flush(self, group):
+        pending = self._pending.pop(group, None)
+        if not pending:
+            return
+        for key, (channel_layer, message) in pending.items():
+            try:
+                if callable(message):
+                    message = await message()
+                if message:
+                    await channel_layer.group_send(group, message)
+            except Exception as e:
+                logger.exception(f"Broadcast {key} to {group} failed: {e}")
+
+
+broadcaster = BroadcastCoalescer(getattr(settings, 'BROADCAST_WINDOW_MS', 75) / 1000)
@@ -0,0 +1,98 @@
+#bulk_rows.py
+from django.db import connection, models
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+
+def insert_rows(model, fields, rows):
+    """
+    INSERT plain tuples (values for `fields`, in order) as multi-row VALUES
+    statements, as many rows per statement as the backend takes parameters.
+    bulk_create builds a model instance and prepares every value through its
+    field; for the thousands of result and ledger rows of one settlement that
+    is most of the time (bench_settlement: about 550 ms against 90 ms for
+    5000 bids), so here values go to the driver as given.
+
+    That is only right for fields whose Python value is already the column
+    value, so `fields` may only name integer fields, char/text fields and
+    foreign keys to an integer primary key, given ints and strs (no floats,
+    no None). Every other concrete field must be the auto primary key or an
+    auto_now_add DateTimeField, which gets one shared timestamp prepared the
+    way the ORM prepares it. Anything else raises TypeError: use bulk_create.
+    """
+    if not rows:
+        return
+    opts = model._meta
+    listed = [opts.get_field(name) for name in fields]
+    for field in listed:
+        if not plain_field(field):
+            raise TypeError(f"insert_rows can't write {opts.label}.{field.name} ({type(field).__name__}); use bulk_create")
+    stamped = []
+    for field in opts.concrete_fields:
+        if field in listed or field.primary_key:
+            continue
+        if not (isinstance(field, models.DateTimeField) and field.auto_now_add):
+            raise TypeError(f"insert_rows would leave {opts.label}.{field.name} unset; use bulk_create")
+        stamped.append(field)
+    columns = [field.column for field in listed] + [field.column for field in stamped]
+    if stamped:
+        now = timezone.now()
+        stamp = tuple(field.get_db_prep_save(now, connection) for field in stamped)
+        rows = [row + stamp for row in rows]
+    quote = connection.ops.quote_name
+    sql = f"INSERT INTO {quote(opts.db_table)} ({', '.join(quote(column) for column in columns)}) VALUES "
+    placeholder = f"({', '.join(['%s'] * len(columns))})"
+    batch = max(1, connection.ops.bulk_batch_size(columns, rows))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch):
+            chunk = rows[start:start + batch]
+            cursor.execute(sql + ', '.join([placeholder] * len(chunk)), [value for row in chunk for value in row])
+
+
+def plain_field(field):
+    """Whether an int or str is already this field's column value."""
+    if isinstance(field, models.ForeignKey):
+        return isinstance(field.target_field, models.IntegerField)
+    return isinstance(field, (models.IntegerField, models.CharField, models.TextField))
+
+
+def add_to_rows(model, field_name, amounts, batch_size=1000):
+    """
+    `field += amount` for many rows at once, given {pk: amount}. The number of
+    statements depends only on the number of rows (one per batch), never on
+    how many different amounts there are: PostgreSQL and SQLite 3.33+ join
+    the table to the batch as a VALUES list, which they apply in one pass;
+    other backends get a CASE over the batch's primary keys.
+    """
+    items = list(amounts.items())
+    if not items:
+        return
+    field = model._meta.get_field(field_name)
+    batch = max(1, min(batch_size, connection.ops.bulk_batch_size(['pk', field_name], items)))
+    if not update_from_supported():
+        for start in range(0, len(items), batch):
+            chunk = items[start:start + batch]
+            model.objects.filter(pk__in=[pk for pk, _ in chunk]).update(**{field_name: F(field_name) + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in chunk], output_field=field
+            )})
+        return
+    quote = connection.ops.quote_name
+    table, column, pk_column = quote(model._meta.db_table), quote(field.column), quote(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), batch):
+            chunk = items[start:start + batch]
+            cursor.execute(
+                f"WITH delta (row_id, amount) AS (VALUES {', '.join(['(%s, %s)'] * len(chunk))}) "
+                f"UPDATE {table} SET {column} = {table}.{column} + delta.amount "
+                f"FROM delta WHERE {table}.{pk_column} = delta.row_id",
+                [value for row in chunk for value in row]
+            )
+
+
+def update_from_supported():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        from sqlite3 import sqlite_version_info
+        return sqlite_version_info >= (3, 33)
+    return False
@@ -0,0 +1,43 @@
+#cashout_index.py
+from bisect import bisect_left, bisect_right, insort
+import math
+
+
+class CashoutIndex:
+    """
+    Pending rocket cash-out targets for one round, kept sorted by target so each
+    flight frame only touches the bids it actually crossed.
+    """
+
+    def __init__(self, round_id):
+        self.round_id = round_id
+        self._entries = []   # sorted (target, bid_id)
+        self._targets = {}   # bid_id -> target
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, bid_id, target):
+        self.discard(bid_id)
+        target = round(float(target), 2)
+        insort(self._entries, (target, bid_id))
+        self._targets[bid_id] = target
+
+    def discard(self, bid_id):
+        target = self._targets.pop(bid_id, None)
+        if target is None:
+            return
+        i = bisect_left(self._entries, (target, bid_id))
+        if i < len(self._entries) and self._entries[i] == (target, bid_id):
+            del self._entries[i]
+
+    def pop_crossed(self, multiplier):
+        """Remove and return the ids of every bid whose target is <= multiplier."""
+        i = bisect_right(self._entries, (round(float(multiplier), 2), math.inf))
+        if not i:
+            return []
+        crossed = self._entries[:i]
+        del self._entries[:i]
+        for _, bid_id in crossed:
+            del self._targets[bid_id]
+        return [bid_id for _, bid_id in crossed]
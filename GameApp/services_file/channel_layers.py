@@ -0,0 +1,70 @@
+#channel_layers.py
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+import asyncio, msgpack, time
+
+
+class LocalChannelLayer(InMemoryChannelLayer):
+    """
+    Single-process stand-in for the Redis layer. Messages are packed with
+    msgpack exactly like channels_redis does, so a payload that would not
+    survive the trip to Redis (datetimes, Decimals, model objects) fails here
+    too. Group sends encode the message once and fan it out to the member
+    queues in batches instead of one task and one deepcopy per socket, and the
+    expiry sweep over every queue runs on an interval rather than on each receive.
+    """
+    extensions = ["groups", "flush"]
+
+    def __init__(self, group_send_batch=1000, clean_interval=1, **kwargs):
+        super().__init__(**kwargs)
+        self.group_send_batch = group_send_batch
+        self.clean_interval = clean_interval
+        self._next_clean = 0
+
+    def _clean_expired(self):
+        now = time.time()
+        if now < self._next_clean:
+            return
+        self._next_clean = now + self.clean_interval
+        super()._clean_expired()
+
+    def serialize(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def deserialize(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+    def queue_for(self, channel):
+        return self.channels.setdefault(channel, asyncio.Queue(maxsize=self.get_capacity(channel)))
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        assert "__asgi_channel__" not in message
+        try:
+            self.queue_for(channel).put_nowait((time.time() + self.expiry, self.serialize(message)))
+        except asyncio.QueueFull:
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        return self.deserialize(await super().receive(channel))
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        self._clean_expired()
+
+        channels = list(self.groups.get(group, {}))
+        if not channels:
+            return
+        expires_at = time.time() + self.expiry
+        data = self.serialize(message)
+
+        for start in range(0, len(channels), self.group_send_batch):
+            for channel in channels[start:start + self.group_send_batch]:
+                try:
+                    self.queue_for(channel).put_nowait((expires_at, data))
+                except asyncio.QueueFull:
+                    pass
+            # Let the receivers run between batches so a big group does not stall the loop.
+            await asyncio.sleep(0)
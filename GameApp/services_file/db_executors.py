@@ -0,0 +1,106 @@
+#db_executors.py
+from asgiref.sync import SyncToAsync
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+import asyncio, contextvars, functools, logging, os, threading, time
+logger = logging.getLogger(__name__)
+
+
+class DBExecutor:
+    """
+    A named thread pool for ORM work. `database_sync_to_async` runs every call
+    on the one thread-sensitive thread, so a long settlement holds up bids on
+    every table; each DBExecutor has its own threads (and, through Django's
+    per-thread connections, its own database connections), so the kinds of
+    work only compete inside the database. Connections are checked before and
+    after each call the way channels does it, which keeps CONN_MAX_AGE working.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"db-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.busy_total = 0.0
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            queued = self.queued
+        if queued > self.workers * 4:
+            logger.warning(f"DB pool {self.name}: {queued} calls queued for {self.workers} threads")
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context, as sync_to_async does, so context vars (action metrics) carry over.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.pool, context.run, self.call, loop, time.perf_counter(), func, args, kwargs)
+
+    def call(self, loop, submitted, func, args, kwargs):
+        started = time.perf_counter()
+        # Lets async_to_sync inside func (e.g. the wallet's balance push) run on the caller's loop.
+        SyncToAsync.threadlocal.main_event_loop = loop
+        SyncToAsync.threadlocal.main_event_loop_pid = os.getpid()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += started - submitted
+        close_old_connections()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            close_old_connections()
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.busy_total += time.perf_counter() - started
+        return result
+
+    def metrics(self):
+        with self._lock:
+            done = self.completed or 1
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'running': self.running,
+                'max_queued': self.max_queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_wait_ms': round(self.wait_total / done * 1000, 2),
+                'avg_run_ms': round(self.busy_total / done * 1000, 2),
+            }
+
+
+executors = {
+    name: DBExecutor(name, workers)
+    for name, workers in getattr(settings, 'DB_EXECUTORS', {'bids': 4, 'settlement': 4, 'reads': 4}).items()
+}
+
+
+def on_pool(name):
+    """Drop-in for `@database_sync_to_async` that runs the function on the named pool."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await executors[name].run(func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+bid_db = on_pool('bids')
+settlement_db = on_pool('settlement')
+read_db = on_pool('reads')
+
+
+def metrics():
+    return {name: executor.metrics() for name, executor in executors.items()}
@@ -0,0 +1,83 @@
+#deadlines.py
+from datetime import timedelta
+from django.utils import timezone
+import asyncio, heapq, itertools, logging
+logger = logging.getLogger(__name__)
+
+# A batch whose callback failed is retried after this long.
+RETRY_DELAY = timedelta(seconds=5)
+
+
+class DeadlineScheduler:
+    """
+    Keyed deadlines in one heap, served by a single task that sleeps until
+    the earliest one and hands every key then due to `callback(keys)` as one
+    batch. Rescheduling or cancelling a key only replaces its entry in
+    `deadlines`; the stale heap entry is skipped when it surfaces. Thousands
+    of pending deadlines cost one sleeping task instead of one each.
+    """
+
+    def __init__(self, callback, name='deadlines'):
+        self.callback = callback    # async callback([key, ...])
+        self.name = name
+        self.deadlines = {}
+        self._heap = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def schedule(self, key, deadline):
+        self.deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._order), key))
+        if self._heap[0][2] == key:
+            self._changed.set()
+
+    def cancel(self, key):
+        return self.deadlines.pop(key, None)
+
+    def clear(self):
+        self.deadlines.clear()
+        self._heap.clear()
+
+    def next_deadline(self):
+        while self._heap and self.deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        now = now or timezone.now()
+        due = []
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                return due
+            key = heapq.heappop(self._heap)[2]
+            del self.deadlines[key]
+            due.append(key)
+
+    async def run(self):
+        while True:
+            self._changed.clear()
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max(0, (deadline - timezone.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            due = self.pop_due()
+            if due:
+                try:
+                    await self.callback(due)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception(f"{self.name} callback failed for {len(due)} keys: {e}")
+                    retry_at = timezone.now() + RETRY_DELAY
+                    for key in due:
+                        if key not in self.deadlines:
+                            self.schedule(key, retry_at)
@@ -0,0 +1,69 @@
+#dots_board.py
+
+# The connect-dots grid: buttons 1..49 row by row, and the run of dots that wins.
+SIZE = 7
+CELLS = SIZE * SIZE
+LINE = 5
+
+
+def _line_masks():
+    masks = []
+    for row in range(SIZE):
+        for col in range(SIZE):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row, end_col = row + d_row * (LINE - 1), col + d_col * (LINE - 1)
+                if 0 <= end_row < SIZE and 0 <= end_col < SIZE:
+                    masks.append(sum(1 << ((row + d_row * i) * SIZE + col + d_col * i) for i in range(LINE)))
+    return tuple(masks)
+
+
+# Every five-in-a-row on the grid, and for each cell the ones passing through it.
+WIN_MASKS = _line_masks()
+LINES_THROUGH = tuple(tuple(mask for mask in WIN_MASKS if mask >> cell & 1) for cell in range(CELLS))
+
+
+class DotsBoard:
+    """
+    A connect-dots grid as one 49-bit integer per player, bit `button - 1`
+    set for each dot taken. A move is an OR, occupancy an AND, and a win is
+    decided by comparing the mover's bits against the few precomputed lines
+    through the dot just placed rather than rescanning the grid.
+    """
+    __slots__ = ('a', 'b', 'moves')
+
+    def __init__(self, a=0, b=0):
+        self.a = a
+        self.b = b
+        self.moves = bin(a).count('1') + bin(b).count('1')
+
+    @classmethod
+    def from_round(cls, round_obj):
+        return cls(round_obj.player_a_board, round_obj.player_b_board)
+
+    def sync(self, round_obj):
+        """Reload from the round when it holds moves this board never saw (another socket of the same player)."""
+        if self.moves != round_obj.move_count:
+            self.a, self.b, self.moves = round_obj.player_a_board, round_obj.player_b_board, round_obj.move_count
+
+    def occupied(self, button):
+        return bool((self.a | self.b) >> (button - 1) & 1)
+
+    def place(self, button, is_player_a):
+        if not 1 <= button <= CELLS or self.occupied(button):
+            return False
+        bit = 1 << (button - 1)
+        if is_player_a:
+            self.a |= bit
+        else:
+            self.b |= bit
+        self.moves += 1
+        return True
+
+    def wins(self, button, is_player_a):
+        """Whether the dot at `button` completes a line for its player."""
+        bits = self.a if is_player_a else self.b
+        return any(bits & mask == mask for mask in LINES_THROUGH[button - 1])
+
+    def grid(self):
+        """The 49-cell list the client draws: 0 empty, 1 player A, 2 player B."""
+        return [1 if self.a >> cell & 1 else 2 if self.b >> cell & 1 else 0 for cell in range(CELLS)]
@@ -0,0 +1,74 @@
+#flight_engine.py
+from django.utils import timezone
+from datetime import datetime, timedelta
+import math
+
+
+class FlightEngine:
+    """
+    The rocket curve as a pure function of time since launch. Every process
+    that knows the launch time and the crash point computes the same multiplier,
+    so nothing has to be written while the rocket is in the air.
+    """
+    START_MULTIPLIER = 0.01
+    STEP = 0.01             # one multiplier step ...
+    STEP_SECONDS = 0.1      # ... every 100 ms, the pace the old tick loop flew at
+    POSITION_PER_STEP = 0.8
+
+    def __init__(self, crash_point, started_at):
+        self.crash_point = float(crash_point)
+        self.started_at = started_at
+
+    @classmethod
+    def for_round(cls, round_obj):
+        state = round_obj.state_Rocket or {}
+        started_at = parse_time(state.get('flight_started_at'))
+        if started_at is None:
+            # Rounds launched before the launch time was recorded: rewind from the last saved multiplier.
+            multiplier = float(state.get('current_multiplier') or cls.START_MULTIPLIER)
+            started_at = timezone.now() - timedelta(seconds=cls.seconds_to_reach(multiplier))
+        return cls(round_obj.random_number_flee, started_at)
+
+    @classmethod
+    def seconds_to_reach(cls, multiplier):
+        steps = max(0, round((multiplier - cls.START_MULTIPLIER) / cls.STEP))
+        return steps * cls.STEP_SECONDS
+
+    def steps_at(self, when):
+        elapsed = (when - self.started_at).total_seconds()
+        return max(0, math.floor(elapsed / self.STEP_SECONDS + 1e-9))
+
+    def multiplier_at(self, when):
+        multiplier = round(self.START_MULTIPLIER + self.steps_at(when) * self.STEP, 2)
+        return min(multiplier, self.crash_point)
+
+    def crash_time(self):
+        return self.started_at + timedelta(seconds=self.seconds_to_reach(self.crash_point))
+
+    def has_crashed(self, when):
+        return when >= self.crash_time()
+
+    def position_for(self, multiplier):
+        steps = max(0, round((multiplier - self.START_MULTIPLIER) / self.STEP))
+        progress = round(self.START_MULTIPLIER + steps * self.POSITION_PER_STEP, 2)
+        return {"x": progress, "y": progress}
+
+    def keyframe(self, when):
+        multiplier = self.multiplier_at(when)
+        return {"multiplier": multiplier, "position": self.position_for(multiplier)}
+
+    def state(self, multiplier):
+        return {
+            "current_multiplier": multiplier,
+            "position_coordinate": self.position_for(multiplier),
+            "flight_started_at": self.started_at.isoformat(),
+        }
+
+
+def parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
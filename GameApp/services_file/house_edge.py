@@ -0,0 +1,211 @@
+#house_edge.py
+from GameApp.consumers_file.spinWheel import SpinWheelConsumer
+from GameApp.services_file import outcomes
+from GameApp.services_file.live_tables import DiceTable, RocketTable
+from GameApp.services_file.settlement import (CARD_DEVELOPER_FEE, CARD_MAX_MULTIPLIER, COLOR_BY_NUMBER, COLOR_FEE,
+                                             DICE_DEVELOPER_FEE, EXACT_FEE, PICTURE_CARDS, SIZE_FEE,
+                                             color_payout, size_for_number)
+from GameApp.views import get_deck
+import numpy as np
+
+# Offline Monte Carlo of the payout rules. Each simulator draws `n` rounds with NumPy,
+# from the same distributions the outcome streams use, and returns the payout per unit
+# stake of every bet type it covers. Guess, football and connect-dots pay on play, not
+# on a draw, so they are not simulated.
+
+# Color stake multipliers the table offers (the X1 ... X100 buttons).
+COLOR_MULTIPLIERS = (1, 5, 10, 20, 50, 100)
+ROCKET_TARGETS = (1.1, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0, 50.0)
+
+
+def weighted(rng, choices, n):
+    """Indices into [(value, weight), ...], like Draws.weighted."""
+    weights = np.array([weight for _, weight in choices], dtype=float)
+    return rng.choice(len(choices), size=n, p=weights / weights.sum())
+
+
+def pick_two(rng, low, high, n):
+    """Two distinct values from range(low, high) per round, like Draws.sample(range(low, high), 2)."""
+    first = rng.integers(0, high - low, size=n)
+    second = rng.integers(0, high - low - 1, size=n)
+    second += second >= first
+    return first + low, second + low
+
+
+# ******************************   Card Battle **************************
+
+def simulate_card(rng, n, players=20, min_stake=10, max_stake=500):
+    # Pari-mutuel: winners get up to CARD_MAX_MULTIPLIER, scaled down together when
+    # the pool after the developer fee can't cover it, plus their stake back.
+    deck = get_deck()
+    is_picture = np.array([card.split('_')[0].lower() in PICTURE_CARDS for card in deck])
+    picture_wins = is_picture[rng.integers(0, len(deck), size=n)]
+
+    stakes = rng.integers(min_stake, max_stake + 1, size=(n, players)).astype(float)
+    on_picture = rng.random((n, players)) < 0.5
+    picture_pool = (stakes * on_picture).sum(axis=1)
+    number_pool = stakes.sum(axis=1) - picture_pool
+    winning_pool = np.where(picture_wins, picture_pool, number_pool)
+    total_pool = picture_pool + number_pool
+
+    prize_pool = total_pool * (1 - CARD_DEVELOPER_FEE)
+    desired = winning_pool * CARD_MAX_MULTIPLIER
+    scale = np.minimum(1.0, np.divide(prize_pool, desired, out=np.ones(n), where=desired > 0))
+    win_return = 1 + CARD_MAX_MULTIPLIER * scale
+    return {
+        'PIC': np.where(picture_wins, win_return, 0.0),
+        'NUM': np.where(picture_wins, 0.0, win_return),
+        'table': winning_pool * win_return / total_pool,
+    }
+
+
+# ******************************   Dice Roll **************************
+
+def simulate_dice(rng, n):
+    totals = rng.integers(1, 7, size=n) + rng.integers(1, 7, size=n)
+    sides = np.array([DiceTable.get_winning_side(None, total, True) or '' for total in range(13)])
+    winning_side = sides[totals]
+    # The jackpot draw: two exact numbers, each paying one of two multipliers.
+    jackpot1, jackpot2 = pick_two(rng, 2, 13, n)
+    multiplier1, multiplier2 = pick_two(rng, 2, 13, n)
+    exact_pick = rng.integers(2, 13, size=n)
+
+    side_win = 1 + DICE_DEVELOPER_FEE
+    results = {f'side {side}': np.where(winning_side == side, side_win, 0.0) for side in ('DOWN', 'MIDDLE', 'UP')}
+
+    # settle_dice_round: a jackpot number wins its multiplier whatever the total, otherwise the total must match.
+    jackpot_multiplier = np.where(exact_pick == jackpot1, multiplier1, np.where(exact_pick == jackpot2, multiplier2, 0))
+    exact_return = np.where(jackpot_multiplier > 0, jackpot_multiplier * DICE_DEVELOPER_FEE,
+                            np.where(exact_pick == totals, DICE_DEVELOPER_FEE, 0.0))
+    exact_won = (jackpot_multiplier > 0) | (exact_pick == totals)
+    results['exact'] = np.where(exact_won, exact_return + 1, 0.0)
+
+    # One unit on a random side and one on the exact number: any win returns both stakes.
+    side_pick = np.array(['DOWN', 'MIDDLE', 'UP'])[rng.integers(0, 3, size=n)]
+    side_won = side_pick == winning_side
+    combined = np.where(side_won, DICE_DEVELOPER_FEE, 0.0) + np.where(exact_won, exact_return, 0.0)
+    results['side+exact'] = np.where(side_won | exact_won, (combined + 2) / 2, 0.0)
+    return results
+
+
+# ******************************   Color Trading **************************
+
+def simulate_color(rng, n, multipliers=COLOR_MULTIPLIERS):
+    numbers = rng.integers(0, 10, size=n)
+    colors = np.array([COLOR_BY_NUMBER[number] for number in range(10)])[numbers]
+    sizes = np.array([size_for_number(number) for number in range(10)])[numbers]
+    color_pick = np.array(sorted(set(COLOR_BY_NUMBER.values())))[rng.integers(0, 3, size=n)]
+    size_pick = np.array(['Small', 'Big'])[rng.integers(0, 2, size=n)]
+    exact_pick = rng.integers(0, 10, size=n)
+
+    results = {}
+    for multiplier in multipliers:
+        # The stake is amount * multiplier; color_payout is in stake units, so the unit return is payout / stake.
+        for bet, won, fee in (('color', colors == color_pick, COLOR_FEE),
+                              ('size', sizes == size_pick, SIZE_FEE),
+                              ('exact', numbers == exact_pick, EXACT_FEE)):
+            results[f'{bet} x{multiplier}'] = np.where(won, color_payout(1.0, multiplier, fee), 0.0)
+    return results
+
+
+# ******************************   Rocket Crash **************************
+
+def simulate_rocket(rng, n, targets=ROCKET_TARGETS):
+    ranges = outcomes.ROCKET_RANGES
+    tier = weighted(rng, ranges, n)
+    low = np.array([low for (low, _), _ in ranges])[tier]
+    high = np.array([high for (_, high), _ in ranges])[tier]
+    crash = np.round(low + (high - low) * rng.random(n), 2)
+    # A bid loses when its target is above the crash point.
+    return {f'cashout {target}x': np.where(crash >= target, 1 + target * RocketTable.CASHOUT_FEE, 0.0)
+            for target in targets}
+
+
+# ******************************   Spin Wheel **************************
+
+def simulate_spin(rng, n):
+    prizes = outcomes.SPIN_PRIZES
+    prize = np.array([name for name, _ in prizes])[weighted(rng, prizes, n)]
+    coins = np.zeros(n)
+    for name, _ in prizes:
+        hit = prize == name
+        if name in outcomes.SPIN_BOXES:
+            tiers = outcomes.SPIN_BOXES[name]
+            tier = weighted(rng, tiers, int(hit.sum()))
+            low = np.array([low for (low, _), _ in tiers])[tier]
+            high = np.array([high for (_, high), _ in tiers])[tier]
+            coins[hit] = rng.integers(low, high + 1)
+        else:
+            coins[hit] = int(name)
+    return {'spin': coins / SpinWheelConsumer.SPIN_COST}
+
+
+SIMULATORS = {
+    'card': simulate_card,
+    'dice': simulate_dice,
+    'color': simulate_color,
+    'rocket': simulate_rocket,
+    'spin': simulate_spin,
+}
+
+
+class Tally:
+    """
+    Running totals of one bet type's payouts per unit stake. Sums are exact;
+    the tail comes from counts of payouts rounded to 0.001, which keeps the
+    memory flat however many rounds are run.
+    """
+
+    def __init__(self):
+        self.rounds = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.hits = 0
+        self.counts = {}
+
+    def add(self, returns):
+        self.rounds += len(returns)
+        self.total += returns.sum(dtype=np.float64)
+        self.squares += np.square(returns, dtype=np.float64).sum()
+        self.hits += np.count_nonzero(returns)
+        values, counts = np.unique(np.round(returns, 3), return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def quantile(self, q):
+        rank = q * self.rounds
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= rank:
+                return value
+        return max(self.counts)
+
+    def summary(self):
+        rtp = self.total / self.rounds
+        return {
+            'rounds': self.rounds,
+            'rtp': rtp,
+            'house_edge': 1 - rtp,
+            'std': max(self.squares / self.rounds - rtp * rtp, 0) ** 0.5,
+            'hit_rate': self.hits / self.rounds,
+            'p99': self.quantile(0.99),
+            'p999': self.quantile(0.999),
+            'max': max(self.counts),
+        }
+
+
+def simulate(game, rounds, seed=None, chunk=250_000, **options):
+    """
+    Run `rounds` rounds of a game in chunks and summarize every bet type.
+    Returns {bet: summary}; the same seed gives the same report.
+    """
+    rng = np.random.default_rng(seed)
+    tallies = {}
+    done = 0
+    while done < rounds:
+        n = min(chunk, rounds - done)
+        for bet, returns in SIMULATORS[game](rng, n, **options).items():
+            tallies.setdefault(bet, Tally()).add(returns)
+        done += n
+    return {bet: tally.summary() for bet, tally in tallies.items()}
@@ -0,0 +1,246 @@
+#instrumentation.py
+from channels.exceptions import StopConsumer
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+import bisect, logging, re, threading, time
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'CONSUMER_METRICS', True)
+# Handler latency buckets (ms) and outgoing frame size buckets (bytes); the last bucket is everything above.
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536)
+# Client payloads pick the label, so unknown actions beyond this many per consumer share one.
+MAX_ACTIONS_PER_CONSUMER = 40
+
+ACTION_RE = re.compile(r'"action"\s*:\s*"([A-Za-z0-9_.-]{1,40})"')
+
+current = ContextVar('consumer_action', default=None)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the max for the open bucket)."""
+        if not self.total:
+            return 0
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[i], round(self.max, 2)) if i < len(self.bounds) else round(self.max, 2)
+        return self.max
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            'count': self.total,
+            'avg': round(self.sum / self.total, 2) if self.total else 0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 2),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class Call:
+    """One handler run; the DB execute wrapper adds to it from whichever thread runs the query."""
+    __slots__ = ('action', 'queries', 'query_time', 'open')
+
+    def __init__(self, action):
+        self.action = action
+        self.queries = 0
+        self.query_time = 0.0
+        self.open = True
+
+
+class ActionStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = 0
+        self.query_ms = 0.0
+        self.max_queries = 0
+        self.messages = 0
+        self.sizes = Histogram(SIZE_BUCKETS)
+
+    def add(self, call, elapsed_ms, failed):
+        self.calls += 1
+        self.errors += failed
+        self.latency.observe(elapsed_ms)
+        self.queries += call.queries
+        self.query_ms += call.query_time * 1000
+        self.max_queries = max(self.max_queries, call.queries)
+
+    def as_dict(self):
+        calls = self.calls or 1
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_ms': self.latency.as_dict(),
+            'queries': self.queries,
+            'queries_per_call': round(self.queries / calls, 2),
+            'max_queries': self.max_queries,
+            'query_ms_per_call': round(self.query_ms / calls, 2),
+            'messages_sent': self.messages,
+            'message_bytes': self.sizes.as_dict(),
+        }
+
+
+_lock = threading.Lock()
+_stats = {}
+started_at = time.time()
+
+
+def _action_stats(consumer, action):
+    actions = _stats.setdefault(consumer, {})
+    if action not in actions and len(actions) >= MAX_ACTIONS_PER_CONSUMER:
+        action = 'other'
+    if action not in actions:
+        actions[action] = ActionStats()
+    return actions[action]
+
+
+def record(consumer, action, call, elapsed_ms, failed=False):
+    with _lock:
+        _action_stats(consumer, action).add(call, elapsed_ms, failed)
+
+
+def record_send(consumer, action, size):
+    with _lock:
+        stats = _action_stats(consumer, action)
+        stats.messages += 1
+        stats.sizes.observe(size)
+
+
+def time_queries(execute, sql, params, many, context):
+    call = current.get()
+    if call is None or not call.open:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        call.queries += 1
+        call.query_time += time.perf_counter() - started
+
+
+def install(connection, **kwargs):
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+def snapshot():
+    from GameApp.services_file import db_executors
+    with _lock:
+        consumers = {
+            consumer: {action: stats.as_dict() for action, stats in sorted(actions.items())}
+            for consumer, actions in sorted(_stats.items())
+        }
+    return {
+        'enabled': ENABLED,
+        'uptime_s': round(time.time() - started_at),
+        'consumers': consumers,
+        'db_pools': db_executors.metrics(),
+    }
+
+
+def dump():
+    """The snapshot as a fixed-width table, one line per consumer action."""
+    data = snapshot()
+    lines = [
+        f"consumer metrics, uptime {data['uptime_s']}s" + ("" if data['enabled'] else " (disabled)"),
+        f"{'consumer':<26}{'action':<26}{'calls':>8}{'err':>6}{'p50ms':>8}{'p99ms':>8}{'maxms':>9}"
+        f"{'q/call':>8}{'qms/call':>10}{'sent':>8}{'p50B':>8}{'maxB':>9}",
+    ]
+    for consumer, actions in data['consumers'].items():
+        for action, stats in actions.items():
+            latency, sizes = stats['latency_ms'], stats['message_bytes']
+            lines.append(
+                f"{consumer:<26}{action:<26}{stats['calls']:>8}{stats['errors']:>6}"
+                f"{latency['p50']:>8}{latency['p99']:>8}{latency['max']:>9}"
+                f"{stats['queries_per_call']:>8}{stats['query_ms_per_call']:>10}"
+                f"{stats['messages_sent']:>8}{sizes['p50']:>8}{sizes['max']:>9}"
+            )
+    lines.append("db pools:")
+    for name, pool in data['db_pools'].items():
+        lines.append(f"  {name:<12}" + " ".join(f"{key}={value}" for key, value in pool.items()))
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    global started_at
+    with _lock:
+        _stats.clear()
+        started_at = time.time()
+
+
+class InstrumentedConsumer:
+    """
+    Mixin for the websocket consumers, listed before the channels base class.
+    Every message goes through `dispatch`, so timing it covers `receive` /
+    `receive_json` (labelled by the payload's "action") and each group_send
+    handler (labelled by its message type). Queries run while the handler is
+    awaited are counted through the execute wrapper, including those on
+    database_sync_to_async and DB pool threads, which inherit the context.
+    """
+
+    async def dispatch(self, message):
+        if not ENABLED:
+            return await super().dispatch(message)
+        action = self.metrics_action(message)
+        call = Call(action)
+        token = current.set(call)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await super().dispatch(message)
+        except StopConsumer:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            call.open = False
+            current.reset(token)
+            record(type(self).__name__, action, call, (time.perf_counter() - started) * 1000, failed)
+
+    def metrics_action(self, message):
+        kind = message['type']
+        if kind != 'websocket.receive':
+            return kind.replace('.', '_')
+        text = message.get('text')
+        match = ACTION_RE.search(text[:512]) if text else None
+        return f"receive:{match.group(1)}" if match else 'receive'
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if ENABLED and (text_data or bytes_data):
+            # Tasks started by a handler inherit its call, so their frames count towards that action.
+            call = current.get()
+            action = call.action if call is not None else 'background'
+            record_send(type(self).__name__, action, len(text_data) if text_data else len(bytes_data))
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
+
+    async def send_json(self, content, close=False):
+        # AsyncJsonWebsocketConsumer.send_json calls its own super().send, which would skip the mixin.
+        await self.send(text_data=await self.encode_json(content), close=close)
+
+
+if ENABLED:
+    connection_created.connect(install, dispatch_uid='consumer_metrics')
+    install(connection)
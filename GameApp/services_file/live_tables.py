@@ -0,0 +1,1046 @@
+#live_tables.py
+from GameApp.services_file.db_executors import settlement_db
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from django.db import transaction
+from GameApp.models import (Game, GameRound, PlayerBid,
+                            Dice_Game, Dice_GameRound, Dice_PlayerBid,
+                            ColorGame, ColorGameRound, ColorPlayerBid,
+                            RocketGame, RocketGameRound, RocketPlayerBid, RocketPlayerResult)
+from GameApp.services_file.round_state import RoundState
+from GameApp.services_file.broadcast import broadcaster
+from GameApp.services_file import outcomes
+from GameApp.services_file.participants import display_name
+from GameApp.services_file.result_history import ResultHistory
+from GameApp.services_file.snapshots import Snapshot, SnapshotCache
+from GameApp.services_file.wallet import credit_many
+from GameApp.services_file.flight_engine import FlightEngine
+from GameApp.services_file.cashout_index import CashoutIndex
+from GameApp.services_file.settlement import (COLOR_BY_NUMBER, PICTURE_CARDS, settle_card_round, settle_color_round,
+                                             settle_dice_round, size_for_number)
+import asyncio, logging
+logger = logging.getLogger(__name__)
+
+
+class LiveTable:
+    """
+    One shared live table (card, dice, color, rocket). The round scheduler calls
+    `tick()` every TICK_INTERVAL seconds on the leader only; consumers just listen
+    to GAME_GROUP for the events a tick publishes.
+
+    While a round is live `self.state` is the source of truth, so a tick touches
+    no tables. The round row is written at phase changes and settlement, and
+    `recover()` rebuilds the state from it (plus the round's bids) whenever a
+    process becomes leader or a tick fails half way.
+    """
+    name = None
+    GAME_GROUP = None
+    TICK_INTERVAL = 1
+
+    channel_layer = None
+    game = None
+    state = None
+    drawn = None
+
+    def __init__(self):
+        self.history = ResultHistory(self.name, self.load_history)
+        self.snapshot = SnapshotCache(self.name, self.load_snapshot)
+
+    def load_history(self, limit):
+        """Recent settled results as [(round_id, entry), ...], newest first."""
+        return []
+
+    def load_snapshot(self):
+        """The initial state every socket shares, read from the database (any process may build it)."""
+        return Snapshot('waiting', {})
+
+    async def run(self, channel_layer):
+        self.channel_layer = channel_layer
+        self.state = None
+        while True:
+            try:
+                if self.state is None:
+                    await self.recover()
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"{self.name} table tick error: {e}")
+                self.state = None
+            await asyncio.sleep(self.TICK_INTERVAL)
+
+    async def recover(self):
+        raise NotImplementedError
+
+    async def tick(self):
+        raise NotImplementedError
+
+    async def stop(self):
+        self.state = None
+
+    async def on_control(self, message):
+        if message.get('type') == 'bid.placed':
+            await self.on_bid_placed(message)
+        elif message.get('type') == 'participants.request':
+            if self.state:
+                await self.channel_layer.send(message['reply_channel'], self.state.roster.snapshot())
+
+    async def on_bid_placed(self, message):
+        if self.state and message.get('round_id') == self.state.round_id:
+            self.state.record_bid(message['player_id'], message['key'], message['amount'])
+            if message.get('participant'):
+                self.update_participant(message['key'], message['amount'], message['participant'])
+                await self.publish_participants()
+
+    def update_participant(self, key, amount, participant):
+        pass
+
+    async def publish_participants(self):
+        # Changed entries go out as one numbered delta per broadcast window.
+        await broadcaster.send_state(self.channel_layer, self.GAME_GROUP, 'participants.delta', self.participants_delta)
+
+    async def participants_delta(self):
+        return self.state.roster.take_delta() if self.state else None
+
+    async def group_send(self, message):
+        await broadcaster.send(self.channel_layer, self.GAME_GROUP, message)
+
+    async def round_outcome(self, round_id):
+        # The round this process created holds its drawn outcome; others read the committed one.
+        if self.drawn and self.drawn[0] == round_id:
+            return self.drawn[1].value
+        return await settlement_db(outcomes.committed)(self.name, round_id)
+
+    async def round_proof(self, round_id):
+        # Seed hash and nonce of the round's outcome, published when it starts so the reveal can be checked.
+        if self.drawn and self.drawn[0] == round_id:
+            return self.drawn[1].proof()
+        return await settlement_db(outcomes.proof)(self.name, round_id)
+
+
+# ******************************  Card Game **************************
+
+class CardTable(LiveTable):
+    name = 'card'
+    GAME_GROUP = "live_card_game"
+    ROUND_DURATION = 30
+    RESULT_DURATION = 3
+
+    @settlement_db
+    def get_or_create_game(self):
+        return Game.objects.get_or_create(name="Live Card Game")[0]
+
+    @settlement_db
+    def get_latest_round(self, game):
+        return GameRound.objects.filter(game=game).order_by('-start_time').first()
+
+    @settlement_db
+    def create_new_round(self, game):
+        outcome = outcomes.draw('card')
+        with transaction.atomic():
+            GameRound.objects.filter(
+                game=game,
+                status__in=[GameRound.RoundStatus.ACTIVE, GameRound.RoundStatus.RESULTS]
+            ).update(status=GameRound.RoundStatus.COMPLETED, end_time=timezone.now())
+
+            new_round = GameRound.objects.create(
+                game=game,
+                card=outcome.value,
+                status=GameRound.RoundStatus.ACTIVE,
+                start_time=timezone.now()
+            )
+            outcome.commit(new_round.id)
+            self.drawn = (new_round.id, outcome)
+            game.current_round = new_round
+            game.current_bid = {'NUM': 0, 'PIC': 0}
+            game.save()
+            return new_round
+
+    @settlement_db
+    def get_round(self, round_id):
+        return GameRound.objects.get(pk=round_id)
+
+    @settlement_db
+    def load_bids(self, state):
+        bids = PlayerBid.objects.filter(round_id=state.round_id).values(
+            'player_id', 'side', 'player__user_id', 'player__user__username',
+            'player__user__db_phone_number', 'player__user__email'
+        ).annotate(total=Sum('amount'))
+        for bid in bids:
+            state.record_bid(bid['player_id'], bid['side'], bid['total'])
+            user = display_name(bid['player__user__username'], bid['player__user__db_phone_number'],
+                                bid['player__user__email'], bid['player__user_id'])
+            side = 'Number' if bid['side'] == 'NUM' else 'Picture'
+            state.roster.load(f"{user}-{side}", bid['total'], user=user, side=side)
+
+    def update_participant(self, key, amount, participant):
+        side = 'Number' if key == 'NUM' else 'Picture'
+        self.state.roster.update(f"{participant['user']}-{side}", amount, user=participant['user'], side=side)
+
+    async def recover(self):
+        self.game = await self.get_or_create_game()
+        round_obj = await self.get_latest_round(self.game)
+
+        if not round_obj or round_obj.status in [GameRound.RoundStatus.WAITING, GameRound.RoundStatus.COMPLETED]:
+            await self.start_new_round()
+            return
+
+        if round_obj.status == GameRound.RoundStatus.ACTIVE:
+            state = RoundState.starting(round_obj.id, 'bidding', round_obj.start_time, self.ROUND_DURATION)
+        else:
+            state = RoundState.starting(round_obj.id, 'results', round_obj.end_time, self.RESULT_DURATION)
+        await self.load_bids(state)
+        self.state = state
+
+    async def tick(self):
+        remaining = self.state.remaining()
+
+        if self.state.phase == 'bidding':
+            if remaining <= 0:
+                await self.start_results_phase()
+            else:
+                await self.broadcast_timer(remaining, 'bidding')
+
+        elif self.state.phase == 'results':
+            await self.broadcast_timer(remaining, 'results')
+            if remaining <= 0:
+                await self.start_new_round()
+
+    async def start_new_round(self):
+        new_round = await self.create_new_round(self.game)
+        self.state = RoundState.starting(new_round.id, 'bidding', new_round.start_time, self.ROUND_DURATION)
+        await self.group_send({
+            'type': 'round.start',
+            'round_id': new_round.id,
+            'start_time': new_round.start_time.isoformat(),
+            'fairness': await self.round_proof(new_round.id)
+        })
+
+    def load_history(self, limit):
+        rounds = GameRound.objects.filter(
+            status__in=[GameRound.RoundStatus.RESULTS, GameRound.RoundStatus.COMPLETED]
+        ).order_by('-start_time').values_list('id', 'card')[:limit]
+        return [(round_id, self.history_entry(round_id, card)) for round_id, card in rounds]
+
+    def history_entry(self, round_id, card):
+        side = 'Picture' if card.split('_')[0].lower() in PICTURE_CARDS else 'Number'
+        return {'round_id': round_id, 'card': card, 'winning_side': side}
+
+    def load_snapshot(self):
+        game = Game.objects.get_or_create(name="Live Card Game")[0]
+        round_obj = GameRound.objects.filter(game=game).order_by('-start_time').first()
+        if not round_obj:
+            return Snapshot('waiting', {}, game=game)
+
+        participants = {}
+        if round_obj.status == GameRound.RoundStatus.ACTIVE:
+            bids = PlayerBid.objects.filter(round=round_obj).values(
+                'side', 'player__user_id', 'player__user__username',
+                'player__user__db_phone_number', 'player__user__email'
+            ).annotate(total=Sum('amount'))
+            for bid in bids:
+                user = display_name(bid['player__user__username'], bid['player__user__db_phone_number'],
+                                    bid['player__user__email'], bid['player__user_id'])
+                side = 'Number' if bid['side'] == 'NUM' else 'Picture'
+                entry = participants.setdefault(f"{user}-{side}", {'user': user, 'side': side, 'amount': 0})
+                entry['amount'] += bid['total']
+
+        phase = {
+            GameRound.RoundStatus.ACTIVE: 'bidding',
+            GameRound.RoundStatus.RESULTS: 'results',
+        }.get(round_obj.status, 'countdown')
+        return Snapshot(phase, {
+            'round_id': round_obj.id,
+            'totals': {'Number': game.current_bid.get('NUM', 0), 'Picture': game.current_bid.get('PIC', 0)},
+            'participants': list(participants.values()),
+            'fairness': outcomes.proof(self.name, round_obj.id)
+        }, game=game, round=round_obj)
+
+    async def start_results_phase(self):
+        round_obj = await self.get_round(self.state.round_id)
+        results, win_side = await settlement_db(settle_card_round)(round_obj)
+        self.history.append(round_obj.id, self.history_entry(round_obj.id, round_obj.card))
+
+        round_obj.status = GameRound.RoundStatus.RESULTS
+        round_obj.end_time = timezone.now()
+        await settlement_db(round_obj.save)()
+        self.state.advance('results', self.RESULT_DURATION, round_obj.end_time)
+
+        await self.group_send({
+            'type': 'results',
+            'round_id': round_obj.id,
+            'results': results,
+            'winning_side': win_side,
+            'card': round_obj.card
+        })
+        await self.broadcast_timer(self.RESULT_DURATION, 'results')
+
+    async def broadcast_timer(self, remaining, phase):
+        await self.group_send({
+            'type': 'timer.update',
+            'remaining': remaining,
+            'phase': phase
+        })
+
+
+# ******************************   Dice Roll **************************
+
+class DiceTable(LiveTable):
+    name = 'dice'
+    GAME_GROUP = "live_dice_game"
+    ROUND_DURATION = 20
+    RESULT_DURATION = 8
+
+    @settlement_db
+    def get_or_create_game(self):
+        return Dice_Game.objects.get_or_create(name="Live Dice Battle")[0]
+
+    @settlement_db
+    def get_active_round(self, game):
+        return Dice_GameRound.objects.filter(
+            game=game,
+            status__in=[
+                Dice_GameRound.RoundStatus_dice.ACTIVE,
+                Dice_GameRound.RoundStatus_dice.RESULTS
+            ]
+        ).first()
+
+    @settlement_db
+    def create_new_round(self, game):
+        outcome = outcomes.draw('dice')
+        with transaction.atomic():
+            Dice_GameRound.objects.filter(
+                game=game,
+                status__in=[
+                    Dice_GameRound.RoundStatus_dice.ACTIVE,
+                    Dice_GameRound.RoundStatus_dice.RESULTS
+                ]
+            ).update(status=Dice_GameRound.RoundStatus_dice.COMPLETED, end_time=timezone.now())
+
+            jackpot_numbers = outcome.value['multiplyer_number']
+            exact_jackpot_numbers = outcome.value['exact_number_on_multiplyer']
+            new_round = Dice_GameRound.objects.create(
+                game=game,
+                status=Dice_GameRound.RoundStatus_dice.ACTIVE,
+                start_time=timezone.now(),
+                result_start=None,
+                multiplyer_number={"number1": jackpot_numbers[0], "number2": jackpot_numbers[1]},
+                exact_number_on_multiplyer={"number1": exact_jackpot_numbers[0], "number2": exact_jackpot_numbers[1]}
+            )
+            outcome.commit(new_round.id)
+            self.drawn = (new_round.id, outcome)
+
+            game.current_round = new_round
+            game.current_bid = {"DOWN": 0, "MIDDLE": 0, "UP": 0, "EXACT": {}}
+            game.save()
+            return new_round
+
+    @settlement_db
+    def get_round(self, round_id):
+        return Dice_GameRound.objects.get(pk=round_id)
+
+    @settlement_db
+    def load_bids(self, state):
+        bids = Dice_PlayerBid.objects.filter(round_id=state.round_id).values(
+            'player_id', 'side', 'amount_bet_side', 'exact_number', 'amount_bet_exact',
+            'player__user__auth_token', 'player__user__db_fullname'
+        )
+        for bid in bids:
+            participant = {'auth_token': bid['player__user__auth_token'], 'fullname': bid['player__user__db_fullname']}
+            placed = []
+            if bid['side'] and bid['amount_bet_side']:
+                placed.append((bid['side'], bid['amount_bet_side']))
+            if bid['exact_number'] and bid['amount_bet_exact']:
+                placed.append((f"EXACT:{bid['exact_number']}", bid['amount_bet_exact']))
+            for key, amount in placed:
+                state.record_bid(bid['player_id'], key, amount)
+                entry_key, fields = self.participant_entry(key, participant)
+                state.roster.load(entry_key, amount, **fields)
+
+    def participant_entry(self, key, participant):
+        # One entry for the player's side bet and one for the exact number, as the old full list had.
+        if key.startswith('EXACT:'):
+            return f"{participant['auth_token']}-exact", {**participant, 'type': 'exact', 'position': int(key.split(':')[1])}
+        return f"{participant['auth_token']}-side", {**participant, 'type': 'side', 'position': key}
+
+    def update_participant(self, key, amount, participant):
+        entry_key, fields = self.participant_entry(key, participant)
+        self.state.roster.update(entry_key, amount, **fields)
+
+    def round_state(self, round_obj, phase, started_at, duration):
+        return RoundState.starting(round_obj.id, phase, started_at, duration, details=self.multiplier_info(round_obj))
+
+    async def recover(self):
+        self.game = await self.get_or_create_game()
+        round_obj = await self.get_active_round(self.game)
+
+        if not round_obj:
+            await self.start_new_round()
+            return
+
+        if round_obj.status == Dice_GameRound.RoundStatus_dice.ACTIVE:
+            state = self.round_state(round_obj, 'bidding', round_obj.start_time, self.ROUND_DURATION)
+        else:
+            state = self.round_state(round_obj, 'results', round_obj.result_start, self.RESULT_DURATION)
+        await self.load_bids(state)
+        self.state = state
+
+    async def tick(self):
+        remaining = self.state.remaining()
+
+        if self.state.phase == 'bidding':
+            await self.broadcast_timer(remaining, 'bidding')
+            if remaining <= 0:
+                await self.process_bidding_end()
+
+        elif self.state.phase == 'results':
+            await self.broadcast_timer(remaining, 'results')
+            if remaining < 1:
+                await self.start_new_round()
+
+    async def start_new_round(self):
+        new_round = await self.create_new_round(self.game)
+        self.state = self.round_state(new_round, 'bidding', new_round.start_time, self.ROUND_DURATION)
+        await self.group_send({'type': 'round.start', 'round_id': new_round.id,
+                               'fairness': await self.round_proof(new_round.id)})
+
+    async def process_bidding_end(self):
+        round_obj = await self.get_round(self.state.round_id)
+        dice1, dice2 = (await self.round_outcome(round_obj.id))['dice']
+        total = dice1 + dice2
+
+        round_obj.dice1 = dice1
+        round_obj.dice2 = dice2
+        round_obj.total = total
+
+        # Saves the dice and the RESULTS status together with the payouts.
+        player_results = await settlement_db(settle_dice_round)(
+            round_obj, total, self.get_winning_side(total, True)
+        )
+        if round_obj.result_start is None:
+            # Already settled by another leader: show the round as it was stored.
+            round_obj = await self.get_round(round_obj.id)
+        self.history.append(round_obj.id, self.history_entry(round_obj.id, dice1, dice2))
+        self.state.advance('results', self.RESULT_DURATION, round_obj.result_start)
+
+        await self.group_send({
+            'type': 'results',
+            'round_id': round_obj.id,
+            'dice1': dice1,
+            'dice2': dice2,
+            'total': total,
+            'winning_side': self.get_winning_side(total),
+            'player_results': player_results,
+            'multiplier_info': self.state.details
+        })
+
+    def get_winning_side(self, total, for_db=False):
+        if 2 <= total <= 6:
+            return 'DOWN' if for_db else 'down'
+        if total == 7:
+            return 'MIDDLE' if for_db else 'middle'
+        if 8 <= total <= 12:
+            return 'UP' if for_db else 'up'
+        return None
+
+    def load_history(self, limit):
+        rounds = Dice_GameRound.objects.filter(total__isnull=False).order_by('-id').values_list(
+            'id', 'dice1', 'dice2'
+        )[:limit]
+        return [(round_id, self.history_entry(round_id, dice1, dice2)) for round_id, dice1, dice2 in rounds]
+
+    def history_entry(self, round_id, dice1, dice2):
+        total = dice1 + dice2
+        return {'round_id': round_id, 'dice1': dice1, 'dice2': dice2, 'total': total,
+                'winning_side': self.get_winning_side(total)}
+
+    def load_snapshot(self):
+        game = Dice_Game.objects.get_or_create(name="Live Dice Battle")[0]
+        round_obj = Dice_GameRound.objects.filter(
+            game=game,
+            status__in=[Dice_GameRound.RoundStatus_dice.ACTIVE, Dice_GameRound.RoundStatus_dice.RESULTS]
+        ).first()
+        if not round_obj:
+            return Snapshot('waiting', {}, game=game)
+
+        totals = {'DOWN': 0, 'MIDDLE': 0, 'UP': 0, 'EXACT': {}}
+        participants = []
+        bids = Dice_PlayerBid.objects.filter(round=round_obj).exclude(
+            side__isnull=True, exact_number__isnull=True
+        ).select_related('player__user')
+        for bid in bids:
+            user = bid.player.user
+            if bid.side:
+                totals[bid.side] = totals.get(bid.side, 0) + bid.amount_bet_side
+                participants.append({'type': 'side', 'auth_token': user.auth_token, 'fullname': user.db_fullname,
+                                     'position': bid.side, 'amount': bid.amount_bet_side})
+            if bid.exact_number:
+                exact = str(bid.exact_number)
+                totals['EXACT'][exact] = totals['EXACT'].get(exact, 0) + bid.amount_bet_exact
+                participants.append({'type': 'exact', 'auth_token': user.auth_token, 'fullname': user.db_fullname,
+                                     'position': bid.exact_number, 'amount': bid.amount_bet_exact})
+
+        phase = 'bidding' if round_obj.status == Dice_GameRound.RoundStatus_dice.ACTIVE else 'results'
+        return Snapshot(phase, {
+            'round_id': round_obj.id,
+            'totals': totals,
+            'participants': participants,
+            'multiplier_info': self.multiplier_info(round_obj),
+            'fairness': outcomes.proof(self.name, round_obj.id)
+        }, game=game, round=round_obj)
+
+    def multiplier_info(self, round_obj):
+        return {
+            'exact_jackpots': round_obj.exact_number_on_multiplyer,
+            'multipliers': round_obj.multiplyer_number
+        }
+
+    async def broadcast_timer(self, remaining, phase):
+        await self.group_send({
+            'type': 'timer_update',
+            'timer': remaining,
+            'phase': phase,
+            'multiplier_info': self.state.details
+        })
+
+
+# ******************************   Color Trading **************************
+
+class ColorTable(LiveTable):
+    name = 'color'
+    GAME_GROUP = "live_colorTrade_game"
+    ROUND_DURATION = 50
+    RESULT_DURATION = 10
+
+    @settlement_db
+    def get_or_create_game(self):
+        return ColorGame.objects.get_or_create(name="Live Color Trading")[0]
+
+    @settlement_db
+    def get_current_round(self, game):
+        return ColorGameRound.objects.filter(
+            game=game,
+            status__in=[
+                ColorGameRound.RoundStatus_color.WAITING,
+                ColorGameRound.RoundStatus_color.ACTIVE,
+                ColorGameRound.RoundStatus_color.RESULTS
+            ]
+        ).order_by('-id').first()
+
+    @settlement_db
+    def create_new_round(self, game):
+        outcome = outcomes.draw('color')
+        with transaction.atomic():
+            existing_round = ColorGameRound.objects.filter(
+                game=game,
+                status=ColorGameRound.RoundStatus_color.WAITING
+            ).first()
+            if existing_round:
+                return existing_round
+
+            new_round = ColorGameRound.objects.create(
+                game=game,
+                status=ColorGameRound.RoundStatus_color.WAITING
+            )
+            outcome.commit(new_round.id)
+            self.drawn = (new_round.id, outcome)
+            game.current_round = new_round
+            game.current_bid_total = {"COLOR": 0, "EXACT": 0, "SIZE": 0}
+            game.save()
+            return new_round
+
+    @settlement_db
+    def update_round_status(self, round_obj, status, **kwargs):
+        round_obj.status = status
+        for key, value in kwargs.items():
+            setattr(round_obj, key, value)
+        round_obj.save()
+
+    @settlement_db
+    def update_game_timer(self, game, timer):
+        ColorGame.objects.filter(pk=game.pk).update(timer=timer)
+
+    @settlement_db
+    def get_round(self, round_id):
+        return ColorGameRound.objects.get(pk=round_id)
+
+    @settlement_db
+    def load_bids(self, state):
+        bids = ColorPlayerBid.objects.filter(round_id=state.round_id).values('player_id', 'player_detail')
+        for bid in bids:
+            detail = bid['player_detail'] or {}
+            for key, field in (('COLOR', 'amount_Bet_Color'), ('SIZE', 'amount_Bet_Size'), ('EXACT', 'amount_Bet_Exact_number')):
+                if detail.get(field):
+                    state.record_bid(bid['player_id'], key, detail[field])
+
+    async def recover(self):
+        self.game = await self.get_or_create_game()
+        round_obj = await self.get_current_round(self.game)
+
+        if not round_obj:
+            await self.start_new_round()
+            return
+
+        if round_obj.status == ColorGameRound.RoundStatus_color.WAITING:
+            state = RoundState(round_obj.id, 'waiting', details={'game_id': round_obj._game_id})
+        elif round_obj.status == ColorGameRound.RoundStatus_color.ACTIVE:
+            state = RoundState.starting(round_obj.id, 'bidding', round_obj.start_time, self.ROUND_DURATION,
+                                        details={'game_id': round_obj._game_id})
+        else:
+            state = RoundState.starting(round_obj.id, 'results', round_obj.result_start, self.RESULT_DURATION,
+                                        details={'game_id': round_obj._game_id})
+        await self.load_bids(state)
+        self.state = state
+
+    async def tick(self):
+        remaining = self.state.remaining()
+
+        if self.state.phase == 'waiting':
+            round_obj = await self.get_round(self.state.round_id)
+            await self.update_round_status(
+                round_obj,
+                ColorGameRound.RoundStatus_color.ACTIVE,
+                start_time=timezone.now()
+            )
+            self.state.advance('bidding', self.ROUND_DURATION, round_obj.start_time)
+            await self.update_game_timer(self.game, self.ROUND_DURATION)
+            await self.broadcast_new_round()
+
+        elif self.state.phase == 'bidding':
+            await self.broadcast_timer(remaining, 'bidding')
+            if remaining <= 0:
+                await self.process_bidding_end()
+
+        elif self.state.phase == 'results':
+            await self.broadcast_timer(remaining, 'results')
+            if remaining <= 0:
+                round_obj = await self.get_round(self.state.round_id)
+                await self.update_round_status(
+                    round_obj,
+                    ColorGameRound.RoundStatus_color.COMPLETED,
+                    end_time=timezone.now()
+                )
+                await self.start_new_round()
+
+    async def start_new_round(self):
+        new_round = await self.create_new_round(self.game)
+        self.state = RoundState(new_round.id, 'waiting', details={'game_id': new_round._game_id})
+        await self.broadcast_new_round()
+
+    async def process_bidding_end(self):
+        round_obj = await self.get_round(self.state.round_id)
+        random_num = await self.round_outcome(round_obj.id)
+        # Saves the number and the RESULTS status together with the payouts.
+        player_results = await settlement_db(settle_color_round)(round_obj, random_num)
+        if round_obj.result_start is None:
+            # Already settled by another leader: show the round as it was stored.
+            round_obj = await self.get_round(round_obj.id)
+        self.state.advance('results', self.RESULT_DURATION, round_obj.result_start)
+        await self.update_game_timer(self.game, self.RESULT_DURATION)
+
+        await self.history.ensure()
+        # Keyed by the public round id, which is what the results broadcast carries to other processes.
+        self.history.append(round_obj._game_id, self.history_entry(round_obj._game_id, random_num))
+        await self.broadcast_results(round_obj, random_num, player_results)
+
+    def get_color_from_number(self, number):
+        return COLOR_BY_NUMBER.get(number, "Unknown")
+
+    def load_history(self, limit):
+        rounds = ColorGameRound.objects.filter(random_number__isnull=False).order_by('-id').values_list(
+            '_game_id', 'random_number'
+        )[:limit]
+        return [(game_id, self.history_entry(game_id, number)) for game_id, number in rounds]
+
+    def history_entry(self, game_id, number):
+        return {
+            'game_id': game_id,
+            'number': number,
+            'size': size_for_number(number),
+            'color': self.get_color_from_number(number)
+        }
+
+    def load_snapshot(self):
+        game = ColorGame.objects.get_or_create(name="Live Color Trading")[0]
+        round_obj = ColorGameRound.objects.filter(
+            game=game,
+            status__in=[ColorGameRound.RoundStatus_color.ACTIVE, ColorGameRound.RoundStatus_color.RESULTS]
+        ).first()
+        if not round_obj:
+            return Snapshot('waiting', {}, game=game)
+
+        phase = 'bidding' if round_obj.status == ColorGameRound.RoundStatus_color.ACTIVE else 'results'
+        return Snapshot(phase, {
+            'phase': round_obj.status.lower(),
+            'totals': game.current_bid_total,
+            'round_id': round_obj._game_id,
+            'fairness': outcomes.proof(self.name, round_obj.id)
+        }, game=game, round=round_obj)
+
+    async def broadcast_timer(self, remaining, phase):
+        await self.group_send({
+            'type': 'timer_update',
+            'timer': remaining,
+            'phase': phase
+        })
+
+    async def broadcast_new_round(self):
+        await self.group_send({
+            'type': 'round_start',
+            'round_id': self.state.details['game_id'],
+            'phase': self.state.phase,
+            'fairness': await self.round_proof(self.state.round_id)
+        })
+
+    async def broadcast_results(self, round_obj, random_number, player_results):
+        await self.group_send({
+            'round_id': round_obj._game_id,
+            'type': 'results',
+            'random_number': random_number,
+            'winning_color': self.get_color_from_number(random_number),
+            'winning_size': size_for_number(random_number),
+            'player_results': player_results,
+            'history': self.history.items()
+        })
+
+
+# ******************************   Rocket Crash **************************
+
+class RocketTable(LiveTable):
+    name = 'rocket'
+    GAME_GROUP = "live_rocket_game"
+    ROUND_DURATION = 25
+    RESULT_DURATION = 5
+    KEYFRAME_RATE = getattr(settings, 'ROCKET_KEYFRAME_RATE', 10)
+    # A cashout at target t pays stake + stake * t * CASHOUT_FEE.
+    CASHOUT_FEE = 0.90
+
+    _flight_task = None
+    cashouts = None
+
+    @settlement_db
+    def get_or_create_game(self):
+        return RocketGame.objects.get_or_create(name="Live Rokcet Crash")[0]
+
+    @settlement_db
+    def get_latest_round(self, game):
+        return RocketGameRound.objects.filter(game=game).order_by('-start_time').first()
+
+    @settlement_db
+    def create_new_round(self, game):
+        outcome = outcomes.draw('rocket')
+        with transaction.atomic():
+            RocketGameRound.objects.filter(
+                game=game,
+                status__in=[
+                    RocketGameRound.RoundStatus_Rocket.WAITING,
+                    RocketGameRound.RoundStatus_Rocket.FLY
+                ]
+            ).update(
+                status=RocketGameRound.RoundStatus_Rocket.COMPLETED,
+                end_time=timezone.now()
+            )
+
+            new_round = RocketGameRound.objects.create(
+                game=game,
+                status=RocketGameRound.RoundStatus_Rocket.WAITING,
+                start_time=timezone.now(),
+                random_number_flee=outcome.value,
+                state_Rocket={
+                    "current_multiplier": 0.01,
+                    "position_coordinate": {"x": 0, "y": 0},
+                }
+            )
+
+            outcome.commit(new_round.id)
+            self.drawn = (new_round.id, outcome)
+            game.current_round = new_round
+            game.current_bid = 0
+            game.save()
+            return new_round
+
+    @settlement_db
+    def get_round(self, round_id):
+        return RocketGameRound.objects.get(pk=round_id)
+
+    @settlement_db
+    def load_bids(self, state):
+        bids = RocketPlayerBid.objects.filter(round_id=state.round_id).values(
+            'player_id', 'amount_bet', 'actual_user_guess', 'mind_Change_user_guess',
+            'player__user__auth_token', 'player__user__db_fullname'
+        )
+        for bid in bids:
+            state.record_bid(bid['player_id'], 'BET', float(bid['amount_bet']))
+            state.roster.load(
+                bid['player__user__auth_token'], float(bid['amount_bet']),
+                auth_token=bid['player__user__auth_token'],
+                fullname=bid['player__user__db_fullname'],
+                actual_guess=float(bid['actual_user_guess']) if bid['actual_user_guess'] else None,
+                mind_change_guess=float(bid['mind_Change_user_guess']) if bid['mind_Change_user_guess'] else None
+            )
+
+    async def recover(self):
+        self.game = await self.get_or_create_game()
+        round_obj = await self.get_latest_round(self.game)
+
+        if not round_obj:
+            await self.start_new_round()
+            return
+
+        if round_obj.status == RocketGameRound.RoundStatus_Rocket.WAITING:
+            state = RoundState.starting(round_obj.id, 'waiting', round_obj.start_time, self.ROUND_DURATION)
+        elif round_obj.status == RocketGameRound.RoundStatus_Rocket.FLY:
+            state = RoundState(round_obj.id, 'fly')
+        else:
+            state = RoundState.starting(round_obj.id, 'results', round_obj.end_time, self.RESULT_DURATION)
+        await self.load_bids(state)
+        self.state = state
+
+    async def tick(self):
+        remaining = self.state.remaining()
+
+        if self.state.phase == 'waiting':
+            await self.broadcast_timer(remaining, 'waiting')
+            if remaining <= 0:
+                await self.start_flight_phase()
+
+        elif self.state.phase == 'fly':
+            # A new leader picks up a flight the previous one left mid-air.
+            if not self.is_flying():
+                self.launch_flight(await self.get_round(self.state.round_id))
+            await self.broadcast_timer(0, 'fly')
+
+        elif self.state.phase == 'results':
+            await self.broadcast_timer(remaining, 'results')
+            if remaining <= 0:
+                await self.start_new_round()
+
+    async def stop(self):
+        if self._flight_task and not self._flight_task.done():
+            self._flight_task.cancel()
+        self._flight_task = None
+        self.state = None
+
+    async def start_new_round(self):
+        new_round = await self.create_new_round(self.game)
+        self.state = RoundState.starting(new_round.id, 'waiting', new_round.start_time, self.ROUND_DURATION)
+        await self.group_send({'type': 'round.start', 'round_id': new_round.id,
+                               'fairness': await self.round_proof(new_round.id)})
+
+    async def start_flight_phase(self):
+        round_obj = await self.get_round(self.state.round_id)
+        engine = FlightEngine(round_obj.random_number_flee, timezone.now())
+        round_obj.status = RocketGameRound.RoundStatus_Rocket.FLY
+        round_obj.state_Rocket = engine.state(FlightEngine.START_MULTIPLIER)
+        await settlement_db(
+            RocketGameRound.objects.filter(pk=round_obj.pk).update
+        )(status=round_obj.status, state_Rocket=round_obj.state_Rocket)
+        self.state.advance('fly')
+        self.launch_flight(round_obj)
+
+    def is_flying(self):
+        return self._flight_task is not None and not self._flight_task.done()
+
+    def launch_flight(self, round_obj):
+        self._flight_task = asyncio.create_task(self.simulate_flight(round_obj))
+
+    async def on_control(self, message):
+        await super().on_control(message)
+        if message.get('type') == 'cashout.changed':
+            if self.cashouts and self.cashouts.round_id == message.get('round_id'):
+                self.cashouts.add(message['bid_id'], message['target'])
+            if self.state and self.state.round_id == message.get('round_id') and message.get('participant'):
+                self.state.roster.update(message['participant']['auth_token'], mind_change_guess=message['target'])
+                await self.publish_participants()
+
+    def update_participant(self, key, amount, participant):
+        self.state.roster.update(participant['auth_token'], amount, **participant)
+
+    @settlement_db
+    def load_cashouts(self, round_id):
+        cashouts = CashoutIndex(round_id)
+        bids = RocketPlayerBid.objects.filter(round_id=round_id).values(
+            'id', 'actual_user_guess', 'mind_Change_user_guess'
+        )
+        for bid in bids:
+            target = bid['mind_Change_user_guess'] if bid['mind_Change_user_guess'] is not None else bid['actual_user_guess']
+            if target:
+                cashouts.add(bid['id'], target)
+        return cashouts
+
+    async def simulate_flight(self, round_obj):
+        try:
+            self.cashouts = await self.load_cashouts(round_obj.pk)
+            engine = FlightEngine.for_round(round_obj)
+            interval = 1 / max(1, self.KEYFRAME_RATE)
+
+            # The index is rebuilt from every bid, so a resumed flight also settles targets crossed before the restart.
+            while not engine.has_crashed(timezone.now()):
+                frame = engine.keyframe(timezone.now())
+                await self.group_send({
+                    "type": "game.update",
+                    "event": "flight",
+                    "multiplier": frame["multiplier"],
+                    "position": frame["position"]
+                })
+                await self.handle_falling_value(round_obj, frame["multiplier"])
+                await asyncio.sleep(interval)
+
+            await self.handle_falling_value(round_obj, engine.crash_point)
+            await self.handle_rocket_crash(round_obj, engine)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"rocket flight error in round {round_obj.pk}: {e}")
+
+    async def handle_falling_value(self, round_obj, multiplier):
+        """Cash out every pending bid whose target the rocket has reached."""
+        bid_ids = self.cashouts.pop_crossed(multiplier) if self.cashouts else []
+        if not bid_ids:
+            return
+
+        falling_players = await self.settle_cashouts(round_obj.pk, bid_ids)
+        for player in falling_players:
+            await self.group_send({
+                "type": "player.cashout",
+                "player_token": player["auth_token"],
+                "multiplier": player["multiplier"]
+            })
+
+        if falling_players:
+            await self.group_send({
+                "type": "falling_values",
+                "players": [
+                    {"fullname": player["fullname"], "guess_used": player["guess_used"]}
+                    for player in falling_players
+                ]
+            })
+
+    @settlement_db
+    def settle_cashouts(self, round_id, bid_ids):
+        with transaction.atomic():
+            bids = list(RocketPlayerBid.objects.filter(pk__in=bid_ids).select_related('player__user'))
+            settled = set(RocketPlayerResult.objects.filter(
+                round_id=round_id, player_id__in=[bid.player_id for bid in bids]
+            ).values_list('player_id', flat=True))
+
+            winners = []
+            for bid in bids:
+                if bid.player_id in settled:
+                    continue
+                settled.add(bid.player_id)
+                cashout_multiplier = float(self.cashout_target(bid))
+                winnings = float(bid.amount_bet) + ((float(bid.amount_bet) * cashout_multiplier) * self.CASHOUT_FEE)
+                winners.append((bid, cashout_multiplier, int(winnings)))
+
+            if not winners:
+                return []
+
+            RocketPlayerResult.objects.bulk_create([
+                RocketPlayerResult(player_id=bid.player_id, round_id=round_id, amount_bet=winnings, result_type="win")
+                for bid, _, winnings in winners
+            ])
+            credit_many({bid.player_id: winnings for bid, _, winnings in winners}, 'rocket_win')
+
+            return [{
+                "fullname": bid.player.user.db_fullname,
+                "auth_token": bid.player.user.auth_token,
+                "guess_used": str(cashout_multiplier),
+                "multiplier": cashout_multiplier
+            } for bid, cashout_multiplier, _ in winners]
+
+    def cashout_target(self, bid):
+        return (
+            bid.mind_Change_user_guess
+            if bid.mind_Change_user_guess is not None
+            else bid.actual_user_guess
+        )
+
+    @settlement_db
+    def create_player_result(self, round_obj, player, result_type, amount):
+        result, created = RocketPlayerResult.objects.get_or_create(
+            player=player,
+            round=round_obj,
+            defaults={
+                'amount_bet': amount,
+                'result_type': result_type
+            }
+        )
+        return created
+
+    async def handle_rocket_crash(self, round_obj, engine):
+        now = timezone.now()
+        crash_point = engine.crash_point
+        # The only write of the flight: the multiplier the rocket actually reached.
+        await settlement_db(
+            lambda: RocketGameRound.objects.filter(pk=round_obj.pk).update(
+                status=RocketGameRound.RoundStatus_Rocket.COMPLETED,
+                end_time=now,
+                state_Rocket=engine.state(crash_point)
+            )
+        )()
+
+        if self.state and self.state.round_id == round_obj.pk:
+            self.state.advance('results', self.RESULT_DURATION, now)
+        self.cashouts = None
+        self.history.append(round_obj.pk, self.history_entry(round_obj.pk, crash_point))
+
+        await self.process_remaining_players(round_obj, crash_point)
+        await self.group_send({
+            "type": "game.update",
+            "event": "crash",
+            "crash_point": crash_point
+        })
+
+    def load_history(self, limit):
+        rounds = RocketGameRound.objects.filter(
+            status=RocketGameRound.RoundStatus_Rocket.COMPLETED
+        ).order_by('-start_time').values_list('id', 'random_number_flee')[:limit]
+        return [(round_id, self.history_entry(round_id, crash)) for round_id, crash in rounds]
+
+    def history_entry(self, round_id, crash_point):
+        return {'round_id': round_id, 'crash_point': float(crash_point)}
+
+    def load_snapshot(self):
+        game = RocketGame.objects.get_or_create(name="Live Rokcet Crash")[0]
+        rounds = RocketGameRound.objects.filter(game=game).order_by('-start_time')
+        round_obj = rounds.filter(
+            status__in=[RocketGameRound.RoundStatus_Rocket.WAITING, RocketGameRound.RoundStatus_Rocket.FLY]
+        ).first() or rounds.first()
+        if not round_obj:
+            return Snapshot('waiting', {}, game=game)
+
+        completed = round_obj.status == RocketGameRound.RoundStatus_Rocket.COMPLETED
+        phase = {
+            RocketGameRound.RoundStatus_Rocket.WAITING: 'waiting',
+            RocketGameRound.RoundStatus_Rocket.FLY: 'fly',
+        }.get(round_obj.status, 'results')
+        return Snapshot(phase, {
+            'phase': round_obj.status.lower(),
+            'crash_point': float(round_obj.random_number_flee) if completed else None,
+            'total_bet': game.current_bid,
+            'fairness': outcomes.proof(self.name, round_obj.id)
+        }, game=game, round=round_obj)
+
+    async def process_remaining_players(self, round_obj, crash_point):
+        bids = await self.get_remaining_bids(round_obj)
+        for bid in bids:
+            win_condition = float(self.cashout_target(bid))
+            if win_condition and win_condition > crash_point:
+                await self.create_player_result(round_obj, bid.player, "lose", bid.amount_bet)
+
+    @settlement_db
+    def get_remaining_bids(self, round_obj):
+        return list(RocketPlayerBid.objects.filter(
+            round=round_obj,
+            mind_Change_user_guess__isnull=True
+        ).select_related('player'))
+
+    async def broadcast_timer(self, remaining, phase):
+        await self.group_send({
+            'type': 'timer_update',
+            'timer': remaining,
+            'phase': phase
+        })
@@ -0,0 +1,264 @@
+#matchmaking.py
+from GameApp.services_file.db_executors import settlement_db
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from AccountApp.models import Player
+from GameApp.models import ConnectDotGame, FootballGame
+from GameApp.services_file.deadlines import DeadlineScheduler
+from GameApp.services_file.wallet import BATCH_SIZE, credit_many
+import asyncio, bisect, logging
+logger = logging.getLogger(__name__)
+
+# How far apart two stakes may be and still be paired (0 pairs equal stakes only),
+# and how long a waiting game may be matched before it expires.
+MATCH_AMOUNT_TOLERANCE = getattr(settings, 'MATCH_AMOUNT_TOLERANCE', 300)
+MATCH_MAX_WAIT = timedelta(seconds=getattr(settings, 'MATCH_MAX_WAIT_SECONDS', 180))
+
+
+class Ticket:
+    """One player's waiting game: the `waiting` row holding their stake."""
+    __slots__ = ('game_id', 'player_id', 'amount', 'channel', 'created_at', 'cancelled')
+
+    def __init__(self, game_id, player_id, amount, channel, created_at):
+        self.game_id = game_id
+        self.player_id = player_id
+        self.amount = amount
+        self.channel = channel
+        self.created_at = created_at
+        self.cancelled = False
+
+
+class MatchQueue:
+    """
+    Waiting tickets in FIFO buckets per bet amount, plus the sorted list of
+    amounts that have a bucket. An equal-stake match is the head of one
+    bucket; with a tolerance the heads of the buckets in range are compared
+    and the oldest wins, as the old `created_at` ordering did. Cancelled and
+    stale tickets are dropped lazily when they reach a head.
+    """
+
+    def __init__(self, tolerance=MATCH_AMOUNT_TOLERANCE, max_wait=MATCH_MAX_WAIT):
+        self.tolerance = tolerance
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.amounts = []
+        self.tickets = {}
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def add(self, ticket, front=False):
+        if ticket.game_id in self.tickets:
+            return
+        self.tickets[ticket.game_id] = ticket
+        bucket = self.buckets.get(ticket.amount)
+        if bucket is None:
+            bucket = self.buckets[ticket.amount] = deque()
+            bisect.insort(self.amounts, ticket.amount)
+        if front:
+            bucket.appendleft(ticket)
+        else:
+            bucket.append(ticket)
+
+    def cancel(self, game_id):
+        ticket = self.tickets.pop(game_id, None)
+        if ticket is not None:
+            ticket.cancelled = True
+
+    def claim(self, ticket, now=None):
+        """Take the oldest live ticket another player has waiting within the tolerance, or None."""
+        oldest = (now or timezone.now()) - self.max_wait
+        low = bisect.bisect_left(self.amounts, ticket.amount - self.tolerance)
+        high = bisect.bisect_right(self.amounts, ticket.amount + self.tolerance)
+        best = None
+        for amount in list(self.amounts[low:high]):
+            candidate = self.head(amount, ticket.player_id, oldest)
+            if candidate is not None and (best is None or candidate.created_at < best.created_at):
+                best = candidate
+        if best is not None:
+            self.remove(best)
+        return best
+
+    def head(self, amount, player_id, oldest):
+        bucket = self.buckets[amount]
+        while bucket and (bucket[0].cancelled or bucket[0].created_at < oldest):
+            self.tickets.pop(bucket.popleft().game_id, None)
+        if not bucket:
+            self.drop_bucket(amount)
+            return None
+        # A player never meets their own ticket; those stay queued for someone else.
+        return next((ticket for ticket in bucket if ticket.player_id != player_id and not ticket.cancelled), None)
+
+    def remove(self, ticket):
+        bucket = self.buckets[ticket.amount]
+        if bucket[0] is ticket:
+            bucket.popleft()
+        else:
+            bucket.remove(ticket)
+        self.tickets.pop(ticket.game_id, None)
+        if not bucket:
+            self.drop_bucket(ticket.amount)
+
+    def drop_bucket(self, amount):
+        del self.buckets[amount]
+        del self.amounts[bisect.bisect_left(self.amounts, amount)]
+
+
+class Matchmaker:
+    """
+    Pairs the players of a head-to-head game. It runs on the round scheduler's
+    leader beside the live tables, so every worker's bets meet in one queue,
+    and requests are handled one at a time off the control group: a ticket is
+    claimed in memory before anything is awaited, so it can't be paired twice.
+
+    The consumer still writes the `waiting` row before asking for a match; it
+    holds the stake, survives a leader change (`run()` requeues it) and is
+    what the expiry refunds. Matching never reads it: a pair is persisted with
+    one conditional update of the older row, and the newer one is deleted.
+
+    Every queued game also has a deadline in `expiries`; games left unpaired
+    past MATCH_MAX_WAIT are refunded in batches, and a new leader reschedules
+    all waiting rows, so games whose deadline passed meanwhile are refunded
+    in its first batch.
+    """
+    name = None
+    model = None
+    REFUND_TYPE = None
+    RETRY_INTERVAL = 1
+
+    channel_layer = None
+
+    def __init__(self):
+        self.queue = MatchQueue()
+        self.expiries = DeadlineScheduler(self.expire_games, f"{self.name} expiry")
+
+    async def run(self, channel_layer):
+        self.channel_layer = channel_layer
+        while True:
+            try:
+                self.queue = MatchQueue()
+                self.expiries.clear()
+                for ticket in await self.load_waiting():
+                    self.queue.add(ticket)
+                    self.expiries.schedule(ticket.game_id, ticket.created_at + MATCH_MAX_WAIT)
+                await self.expiries.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Like a live table's failed tick: start over from the waiting rows rather than stop pairing.
+                logger.exception(f"{self.name} matchmaker error: {e}")
+            await asyncio.sleep(self.RETRY_INTERVAL)
+
+    async def stop(self):
+        self.queue = MatchQueue()
+        self.expiries.clear()
+
+    @settlement_db
+    def load_waiting(self):
+        games = self.model.objects.filter(status='waiting', player_b__isnull=True).order_by('created_at').values_list(
+            'id', 'player_a_id', 'player_a_bet_amount', 'player_a_channel', 'created_at'
+        )
+        return [Ticket(*game) for game in games]
+
+    async def on_control(self, message):
+        try:
+            if message.get('type') == 'match.request':
+                await self.on_match_request(message)
+            elif message.get('type') == 'match.cancel':
+                self.queue.cancel(message['game_id'])
+                self.expiries.cancel(message['game_id'])
+        except Exception as e:
+            # The control listener serves every table; a failed pairing must not stop it.
+            logger.exception(f"{self.name} matchmaking error: {e}")
+
+    async def on_match_request(self, message):
+        ticket = Ticket(message['game_id'], message['player_id'], message['amount'], message['channel'], timezone.now())
+        while True:
+            partner = self.queue.claim(ticket)
+            if partner is None:
+                self.queue.add(ticket)
+                self.expiries.schedule(ticket.game_id, ticket.created_at + MATCH_MAX_WAIT)
+                await self.channel_layer.send(ticket.channel, {'type': 'match.waiting', 'game_id': ticket.game_id})
+                return
+            try:
+                paired = await self.persist_pair(partner, ticket)
+            except Exception:
+                self.queue.add(partner, front=True)
+                raise
+            if paired is None:
+                # The requester's own game is gone (expired and refunded meanwhile); the partner keeps their place.
+                self.queue.add(partner, front=True)
+                return
+            if paired:
+                self.expiries.cancel(partner.game_id)
+                await self.start_game(partner, ticket)
+                return
+            # The partner's game expired under us; try the next one.
+
+    @settlement_db
+    def persist_pair(self, partner, ticket):
+        """True when paired, False if the partner's game is gone, None if the requester's is."""
+        with transaction.atomic():
+            if not self.model.objects.filter(pk=ticket.game_id, status='waiting', player_b__isnull=True).delete()[0]:
+                return None
+            paired = self.model.objects.filter(pk=partner.game_id, status='waiting', player_b__isnull=True).update(
+                player_b_id=ticket.player_id,
+                player_b_bet_amount=ticket.amount,
+                player_b_channel=ticket.channel,
+                status='active'
+            )
+            if not paired:
+                transaction.set_rollback(True)
+            return bool(paired)
+
+    async def start_game(self, partner, ticket):
+        group = f"game_{partner.game_id}"
+        await self.channel_layer.group_add(group, partner.channel)
+        await self.channel_layer.group_add(group, ticket.channel)
+        await self.channel_layer.group_send(group, {'type': 'game.start', 'game_id': str(partner.game_id), 'redirect': True})
+
+    async def expire_games(self, game_ids):
+        for game_id in game_ids:
+            self.queue.cancel(game_id)
+        for start in range(0, len(game_ids), BATCH_SIZE):
+            for game_id in await self.refund_expired(game_ids[start:start + BATCH_SIZE]):
+                await self.channel_layer.group_send(f"game_{game_id}", {
+                    'type': 'game.expired',
+                    'message': 'Game expired. Amount refunded.'
+                })
+
+    @settlement_db
+    def refund_expired(self, game_ids):
+        """Delete the games still waiting and refund their stakes in one batch; returns the ids expired."""
+        with transaction.atomic():
+            games = list(self.model.objects.select_for_update().filter(
+                pk__in=game_ids, status='waiting', player_b__isnull=True
+            ).values_list('id', 'player_a_id', 'player_a_bet_amount'))
+            if not games:
+                return []
+            self.model.objects.filter(pk__in=[game_id for game_id, _, _ in games]).delete()
+            players = dict(Player.objects.filter(
+                user_id__in={profile_id for _, profile_id, _ in games}
+            ).values_list('user_id', 'id'))
+            refunds = {}
+            for _, profile_id, amount in games:
+                if profile_id in players:
+                    refunds[players[profile_id]] = refunds.get(players[profile_id], 0) + amount
+            credit_many(refunds, self.REFUND_TYPE)
+        logger.info(f"Expired {len(games)} waiting {self.name} games")
+        return [game_id for game_id, _, _ in games]
+
+
+class FootballMatchmaker(Matchmaker):
+    name = 'football'
+    model = FootballGame
+    REFUND_TYPE = 'football_refund'
+
+
+class DotsMatchmaker(Matchmaker):
+    name = 'dots'
+    model = ConnectDotGame
+    REFUND_TYPE = 'dots_refund'
@@ -0,0 +1,279 @@
+#outcomes.py
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max, Q
+from django.utils import timezone
+from GameApp.models import OutcomeSeed, RoundOutcome
+import hashlib, hmac, logging, secrets, threading
+logger = logging.getLogger(__name__)
+
+# Outcomes computed ahead per refill, outcomes drawn from one seed before it is revealed and
+# replaced, and how long a seed may sit unused before it is retired (revealed) as well.
+OUTCOME_BATCH = getattr(settings, 'OUTCOME_BATCH', 256)
+OUTCOME_SEED_ROUNDS = getattr(settings, 'OUTCOME_SEED_ROUNDS', 10000)
+OUTCOME_SEED_IDLE = timedelta(hours=getattr(settings, 'OUTCOME_SEED_IDLE_HOURS', 24))
+
+
+class Draws:
+    """
+    The random numbers behind one outcome. Draw i is HMAC-SHA256(server_seed,
+    "game:nonce:i"), so anyone holding a revealed seed can recompute the
+    outcome of every nonce, and nobody can predict one from the seed hash.
+    """
+
+    def __init__(self, server_seed, game, nonce):
+        self.key = server_seed.encode()
+        self.prefix = f"{game}:{nonce}:"
+        self.index = 0
+
+    def next_int(self):
+        digest = hmac.new(self.key, (self.prefix + str(self.index)).encode(), hashlib.sha256).digest()
+        self.index += 1
+        return int.from_bytes(digest[:8], 'big')
+
+    def random(self):
+        return (self.next_int() >> 11) / float(1 << 53)
+
+    def randint(self, a, b):
+        # Bias from the modulo is below (b - a) / 2**64.
+        return a + self.next_int() % (b - a + 1)
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def choice(self, seq):
+        return seq[self.next_int() % len(seq)]
+
+    def sample(self, population, k):
+        pool = list(population)
+        for i in range(k):
+            j = i + self.next_int() % (len(pool) - i)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+    def weighted(self, choices):
+        """Pick from [(value, weight), ...] like random.choices(values, weights)."""
+        point = self.random() * sum(weight for _, weight in choices)
+        for value, weight in choices:
+            point -= weight
+            if point < 0:
+                return value
+        return choices[-1][0]
+
+
+# ******************************   Generators **************************
+
+def card_outcome(draws):
+    from GameApp.views import get_deck
+    return draws.choice(get_deck())
+
+
+def dice_outcome(draws):
+    return {
+        'dice': [draws.randint(1, 6), draws.randint(1, 6)],
+        'multiplyer_number': draws.sample(range(2, 13), 2),
+        'exact_number_on_multiplyer': draws.sample(range(2, 13), 2),
+    }
+
+
+def color_outcome(draws):
+    return draws.randint(0, 9)
+
+
+ROCKET_RANGES = [
+    ((0.01, 0.99), 64),
+    ((1.00, 2.00), 18),
+    ((2.01, 5.00), 9),
+    ((5.01, 8.00), 5),
+    ((8.01, 15.00), 2.5),
+    ((15.01, 20.00), 1),
+    ((20.01, 50.00), 0.4),
+    ((50.01, 100.00), 0.1),
+]
+
+
+def rocket_outcome(draws):
+    low, high = draws.weighted(ROCKET_RANGES)
+    return round(draws.uniform(low, high), 2)
+
+
+SPIN_PRIZES = [("0", 50), ("50", 25), ("100", 13), ("250", 6), ("Gold", 3), ("Platinum", 1), ("Diamond", 0.5), ("Mystery", 1.5)]
+# Each tier is a coin range; Mystery pays fixed amounts.
+SPIN_BOXES = {
+    "Gold": [((250, 275), 60), ((276, 300), 22), ((301, 350), 10), ((351, 400), 5), ((401, 450), 2), ((451, 500), 1)],
+    "Platinum": [((400, 425), 60), ((426, 450), 22), ((451, 500), 11), ((501, 525), 6), ((536, 550), 2), ((551, 600), 1)],
+    "Diamond": [((600, 625), 75), ((626, 650), 13), ((651, 700), 6), ((701, 725), 3), ((736, 750), 2), ((751, 800), 1)],
+    "Mystery": [((coins, coins), weight) for coins, weight in [
+        (0, 25), (1, 25), (10, 12), (20, 8), (50, 7), (70, 6), (100, 5), (150, 4),
+        (200, 3), (300, 2), (500, 1), (750, 1), (850, 0.5), (1000, 0.5)
+    ]],
+}
+
+
+def spin_outcome(draws):
+    # The box contents are drawn with the wheel so the whole spin is fixed by one nonce.
+    return {
+        'prize': draws.weighted(SPIN_PRIZES),
+        'boxes': {box: draws.randint(*draws.weighted(tiers)) for box, tiers in SPIN_BOXES.items()},
+    }
+
+
+def guess_outcome(draws):
+    return draws.randint(0, 1000)
+
+
+GENERATORS = {
+    'card': card_outcome,
+    'dice': dice_outcome,
+    'color': color_outcome,
+    'rocket': rocket_outcome,
+    'spin': spin_outcome,
+    'guess': guess_outcome,
+}
+
+
+def replay(game, server_seed, nonce):
+    """The outcome a seed gives for a nonce; used to audit revealed seeds and to replay rounds."""
+    return GENERATORS[game](Draws(server_seed, game, nonce))
+
+
+# ******************************   Streams **************************
+
+class Outcome:
+    def __init__(self, game, seed_id, seed_hash, nonce, value):
+        self.game = game
+        self.seed_id = seed_id
+        self.seed_hash = seed_hash
+        self.nonce = nonce
+        self.value = value
+
+    def proof(self):
+        """What players are shown when the round starts: the hash of the seed it came from and its nonce."""
+        return {'seed_hash': self.seed_hash, 'nonce': self.nonce}
+
+    def commit(self, round_ref):
+        """Record which round used this outcome; call it in the transaction that creates the round."""
+        return RoundOutcome.objects.create(
+            seed_id=self.seed_id, nonce=self.nonce, game=self.game,
+            round_ref=str(round_ref), value=self.value
+        )
+
+
+class OutcomeStream:
+    """
+    Outcomes of one game, computed a batch at a time from the current seed.
+    Each process draws from a seed of its own, so nonces never collide between
+    workers; a seed is revealed when it is used up or has been idle too long.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.generate = GENERATORS[game]
+        self.lock = threading.Lock()
+        self.seed = None
+        self.next_nonce = 0
+        self.last_draw = None
+        self.buffer = deque()
+
+    def take(self):
+        with self.lock:
+            now = timezone.now()
+            if (self.seed is None or now - self.last_draw > OUTCOME_SEED_IDLE
+                    or (not self.buffer and self.next_nonce >= OUTCOME_SEED_ROUNDS)):
+                self.rotate(now)
+            if not self.buffer:
+                self.refill()
+            self.last_draw = now
+            return self.buffer.popleft()
+
+    def refill(self):
+        end = min(self.next_nonce + OUTCOME_BATCH, OUTCOME_SEED_ROUNDS)
+        for nonce in range(self.next_nonce, end):
+            value = self.generate(Draws(self.seed.server_seed, self.game, nonce))
+            self.buffer.append(Outcome(self.game, self.seed.id, self.seed.seed_hash, nonce, value))
+        self.next_nonce = end
+
+    def rotate(self, now):
+        retire = Q(revealed_at__isnull=True) & (
+            Q(last_outcome__lt=now - OUTCOME_SEED_IDLE) |
+            Q(last_outcome__isnull=True, created_at__lt=now - OUTCOME_SEED_IDLE)
+        )
+        if self.seed is not None:
+            retire |= Q(pk=self.seed.pk)
+        retired = OutcomeSeed.objects.filter(game=self.game).annotate(
+            last_outcome=Max('outcomes__created_at')
+        ).filter(retire).values_list('pk', flat=True)
+        OutcomeSeed.objects.filter(pk__in=list(retired)).update(revealed_at=now)
+
+        server_seed = secrets.token_hex(32)
+        self.seed = OutcomeSeed.objects.create(
+            game=self.game, server_seed=server_seed,
+            seed_hash=hashlib.sha256(server_seed.encode()).hexdigest()
+        )
+        self.next_nonce = 0
+        self.buffer.clear()
+        logger.info(f"Outcome seed for {self.game}: {self.seed.seed_hash}")
+
+
+streams = {game: OutcomeStream(game) for game in GENERATORS}
+
+
+def draw(game):
+    """
+    Next precomputed outcome of a game (sync; run it on a DB thread). Draw
+    before opening the round's transaction: a seed rotation writes rows that
+    must not be rolled back with it.
+    """
+    return streams[game].take()
+
+
+def for_round(game, round_ref):
+    """The committed outcome value of a round, or None."""
+    return RoundOutcome.objects.filter(game=game, round_ref=str(round_ref)).values_list('value', flat=True).first()
+
+
+def committed(game, round_ref):
+    """Like for_round, but a round created before outcome streams existed gets one drawn and committed now."""
+    value = for_round(game, round_ref)
+    if value is None:
+        outcome = draw(game)
+        outcome.commit(round_ref)
+        value = outcome.value
+    return value
+
+
+def proof(game, round_ref):
+    """Outcome.proof() of a committed round, or None."""
+    row = RoundOutcome.objects.filter(game=game, round_ref=str(round_ref)).values_list('seed__seed_hash', 'nonce').first()
+    return None if row is None else {'seed_hash': row[0], 'nonce': row[1]}
+
+
+def published_seeds(game=None, seed_hash=None, limit=50):
+    """
+    Newest seeds first, as players may see them: the hash always, the seed
+    itself only once revealed, so any round drawn from it can be replayed.
+    """
+    seeds = OutcomeSeed.objects.order_by('-created_at')
+    if game:
+        seeds = seeds.filter(game=game)
+    if seed_hash:
+        seeds = seeds.filter(seed_hash=seed_hash)
+    return [
+        {
+            'game': seed.game,
+            'seed_hash': seed.seed_hash,
+            'server_seed': seed.server_seed if seed.revealed_at else None,
+            'created_at': seed.created_at.isoformat(),
+            'revealed_at': seed.revealed_at.isoformat() if seed.revealed_at else None,
+        }
+        for seed in seeds[:limit]
+    ]
+
+
+def verify(seed):
+    """Nonces whose recorded value differs from a replay of the revealed seed."""
+    return [
+        outcome.nonce for outcome in seed.outcomes.all()
+        if replay(seed.game, seed.server_seed, outcome.nonce) != outcome.value
+    ]
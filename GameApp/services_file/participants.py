@@ -0,0 +1,69 @@
+#participants.py
+import uuid
+
+
+def display_name(username, phone_number, email, user_id):
+    if username:
+        return username
+    if phone_number:
+        return phone_number
+    if email:
+        return email.split('@')[0]
+    return f"User-{user_id}"
+
+
+class ParticipantRegistry:
+    """
+    The leader's participant list for one round. Bids update single entries
+    and mark them changed; `take_delta()` hands out only the changed entries
+    under the next sequence number, and `snapshot()` gives a late joiner the
+    whole list with the sequence it is current up to.
+    """
+
+    def __init__(self, round_id):
+        self.round_id = round_id
+        self.roster_id = uuid.uuid4().hex[:8]   # a rebuilt registry restarts seq, so clients key on this too
+        self.seq = 0
+        self.entries = {}
+        self._changed = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update(self, key, amount=0, **fields):
+        self._apply(key, amount, fields)
+        self._changed.add(key)
+
+    def load(self, key, amount=0, **fields):
+        # Same as update() without queueing a delta; used when rebuilding from the database.
+        # Loaded entries count as seq 1, so clients only start from an empty list on a fresh round.
+        self._apply(key, amount, fields)
+        self.seq = self.seq or 1
+
+    def _apply(self, key, amount, fields):
+        entry = self.entries.setdefault(key, {'key': key, 'amount': 0})
+        entry.update(fields)
+        entry['amount'] += amount
+
+    def take_delta(self):
+        if not self._changed:
+            return None
+        self.seq += 1
+        participants = [self.entries[key] for key in self._changed]
+        self._changed = set()
+        return {
+            'type': 'participants.delta',
+            'round_id': self.round_id,
+            'roster_id': self.roster_id,
+            'seq': self.seq,
+            'participants': participants
+        }
+
+    def snapshot(self):
+        return {
+            'type': 'participants.snapshot',
+            'round_id': self.round_id,
+            'roster_id': self.roster_id,
+            'seq': self.seq,
+            'participants': list(self.entries.values())
+        }
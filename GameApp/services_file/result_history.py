@@ -0,0 +1,84 @@
+#result_history.py
+from collections import deque
+from django.conf import settings
+from GameApp.services_file.db_executors import read_db
+import asyncio, json, logging, threading
+logger = logging.getLogger(__name__)
+
+# Results kept per live table (the history strip shows the last 10).
+RESULT_HISTORY_SIZE = getattr(settings, 'RESULT_HISTORY_SIZE', 10)
+
+
+class ResultHistory:
+    """
+    The last few results of a live table, newest first. It is loaded from the
+    database once, appended to at settlement, and its JSON is encoded once per
+    change, so joining sockets share one string instead of each querying.
+
+    Every process keeps its own copy. The leader's table appends as it settles;
+    elsewhere consumers append what they see in the `results` broadcast, and
+    while a process has no watching sockets the copy is dropped and reloaded
+    on the next connect, so it cannot go stale unseen.
+    """
+
+    def __init__(self, name, load, size=RESULT_HISTORY_SIZE):
+        self.name = name
+        self.load = load        # load(limit) -> [(round_id, entry), ...], newest first
+        self.size = size
+        self.entries = deque(maxlen=size)
+        self.loaded = False
+        self.watchers = 0
+        self._encoded = None
+        self._loading = None
+        self._lock = threading.Lock()
+
+    def reload(self):
+        rows = self.load(self.size)
+        with self._lock:
+            self.entries = deque(rows, maxlen=self.size)
+            self._encoded = None
+            self.loaded = True
+
+    async def ensure(self):
+        """Load once; concurrent callers (a reconnect storm) wait on the same query."""
+        if self.loaded:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(read_db(self.reload)())
+            self._loading.add_done_callback(lambda _: setattr(self, '_loading', None))
+        await asyncio.shield(self._loading)
+
+    def append(self, round_id, entry):
+        with self._lock:
+            if any(seen == round_id for seen, _ in self.entries):
+                return
+            self.entries.appendleft((round_id, entry))
+            self._encoded = None
+
+    def items(self):
+        with self._lock:
+            return [entry for _, entry in self.entries]
+
+    def encoded(self):
+        with self._lock:
+            if self._encoded is None:
+                self._encoded = json.dumps([entry for _, entry in self.entries])
+            return self._encoded
+
+    async def watch(self):
+        self.watchers += 1
+        await self.ensure()
+
+    def unwatch(self):
+        self.watchers = max(0, self.watchers - 1)
+        if self.watchers == 0:
+            self.loaded = False
+
+
+def dumps_with(payload, **encoded):
+    """json.dumps(payload) with already encoded JSON values added as extra keys."""
+    text = json.dumps(payload)
+    extra = ", ".join(f"{json.dumps(key)}: {value}" for key, value in encoded.items())
+    if not extra:
+        return text
+    return text[:-1] + (", " if len(text) > 2 else "") + extra + "}"
@@ -0,0 +1,188 @@
+#round_scheduler.py
+from GameApp.services_file.db_executors import settlement_db
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from GameApp.models import SchedulerLease
+from GameApp.services_file.live_tables import CardTable, DiceTable, ColorTable, RocketTable
+from GameApp.services_file.matchmaking import DotsMatchmaker, FootballMatchmaker
+import asyncio, logging, os, socket, uuid
+logger = logging.getLogger(__name__)
+
+
+class RoundScheduler:
+    """
+    Drives every live table from a single process. Whoever holds the
+    `SchedulerLease` row runs the table loops; everyone else only renews its
+    claim attempt and waits, so a crashed leader is replaced once the lease expires.
+    The head-to-head matchmakers run the same way, so there is one queue per game.
+    """
+    LEASE_NAME = "live_tables"
+    CONTROL_GROUP = "round_scheduler"
+    LEASE_SECONDS = 10
+    RENEW_INTERVAL = 3
+
+    def __init__(self, tables):
+        self.tables = {table.name: table for table in tables}
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._task = None
+        self._table_tasks = {}
+        self._lock = asyncio.Lock()
+
+    def table(self, name):
+        return self.tables[name]
+
+    async def ensure_started(self):
+        if not getattr(settings, 'ROUND_SCHEDULER_AUTOSTART', True):
+            return
+        await self.start()
+
+    async def start(self):
+        async with self._lock:
+            if self._task and not self._task.done():
+                return
+            self._task = asyncio.create_task(self.run())
+
+    async def run(self):
+        channel_layer = get_channel_layer()
+        try:
+            while True:
+                try:
+                    leader = await self.acquire_lease()
+                except Exception as e:
+                    logger.exception(f"Scheduler lease error: {e}")
+                    leader = False
+
+                if leader and not self.is_leader:
+                    logger.info(f"Round scheduler leader: {self.holder}")
+                    self.start_tables(channel_layer)
+                elif not leader and self.is_leader:
+                    logger.warning(f"Round scheduler lost lease: {self.holder}")
+                    await self.stop_tables()
+
+                await asyncio.sleep(self.RENEW_INTERVAL)
+        finally:
+            was_leader = self.is_leader
+            await self.stop_tables()
+            if was_leader:
+                await self.release_lease()
+
+    def start_tables(self, channel_layer):
+        self.is_leader = True
+        for name, table in self.tables.items():
+            self._table_tasks[name] = asyncio.create_task(table.run(channel_layer))
+        self._table_tasks['control'] = asyncio.create_task(self.listen(channel_layer))
+
+    async def listen(self, channel_layer):
+        # Consumers report accepted bids and cash-out changes here so the tables' in-memory state stays current.
+        channel = await channel_layer.new_channel()
+        await channel_layer.group_add(self.CONTROL_GROUP, channel)
+        try:
+            while True:
+                message = await channel_layer.receive(channel)
+                table = self.tables.get(message.get('table'))
+                if table:
+                    await table.on_control(message)
+        finally:
+            await channel_layer.group_discard(self.CONTROL_GROUP, channel)
+
+    async def stop_tables(self):
+        self.is_leader = False
+        tasks = list(self._table_tasks.values())
+        self._table_tasks = {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for table in self.tables.values():
+            await table.stop()
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @settlement_db
+    def acquire_lease(self):
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.LEASE_SECONDS)
+
+        renewed = SchedulerLease.objects.filter(name=self.LEASE_NAME).filter(
+            Q(holder=self.holder) | Q(expires_at__lt=now)
+        ).update(holder=self.holder, expires_at=expires_at, updated_at=now)
+        if renewed:
+            return True
+
+        if SchedulerLease.objects.filter(name=self.LEASE_NAME).exists():
+            return False
+
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(
+                    name=self.LEASE_NAME,
+                    holder=self.holder,
+                    expires_at=expires_at
+                )
+            return True
+        except IntegrityError:
+            return False
+
+    @settlement_db
+    def release_lease(self):
+        SchedulerLease.objects.filter(name=self.LEASE_NAME, holder=self.holder).update(
+            expires_at=timezone.now()
+        )
+
+    async def notify_bid(self, channel_layer, table, round_id, player_id, key, amount, participant=None):
+        await channel_layer.group_send(self.CONTROL_GROUP, {
+            'type': 'bid.placed',
+            'table': table,
+            'round_id': round_id,
+            'player_id': player_id,
+            'key': key,
+            'amount': amount,
+            'participant': participant
+        })
+
+    async def notify_cashout(self, channel_layer, round_id, bid_id, target, participant=None):
+        await channel_layer.group_send(self.CONTROL_GROUP, {
+            'type': 'cashout.changed',
+            'table': 'rocket',
+            'round_id': round_id,
+            'bid_id': bid_id,
+            'target': float(target),
+            'participant': participant
+        })
+
+    async def request_match(self, channel_layer, table, game_id, player_id, amount, reply_channel):
+        # The leader pairs the waiting game or answers on reply_channel with `match.waiting`.
+        await channel_layer.group_send(self.CONTROL_GROUP, {
+            'type': 'match.request',
+            'table': table,
+            'game_id': game_id,
+            'player_id': player_id,
+            'amount': amount,
+            'channel': reply_channel
+        })
+
+    async def cancel_match(self, channel_layer, table, game_id):
+        await channel_layer.group_send(self.CONTROL_GROUP, {
+            'type': 'match.cancel',
+            'table': table,
+            'game_id': game_id
+        })
+
+    async def request_participants(self, channel_layer, table, reply_channel):
+        # The leader answers on reply_channel with a `participants.snapshot` message.
+        await channel_layer.group_send(self.CONTROL_GROUP, {
+            'type': 'participants.request',
+            'table': table,
+            'reply_channel': reply_channel
+        })
+
+
+round_scheduler = RoundScheduler([CardTable(), DiceTable(), ColorTable(), RocketTable(),
+                                  FootballMatchmaker(), DotsMatchmaker()])
@@ -0,0 +1,58 @@
+#round_state.py
+from django.utils import timezone
+from datetime import timedelta
+from GameApp.services_file.participants import ParticipantRegistry
+import math
+
+
+class RoundState:
+    """
+    The leader's copy of a live round. Ticks read phase and deadline from here
+    instead of the database; the round row is only written when the phase changes,
+    which is also what `LiveTable.recover()` rebuilds this object from after a restart.
+    """
+
+    def __init__(self, round_id, phase, deadline=None, details=None):
+        self.round_id = round_id
+        self.phase = phase
+        self.deadline = deadline
+        self.details = details or {}
+        self.totals = {}
+        self.participants = {}
+        self.roster = ParticipantRegistry(round_id)
+
+    @classmethod
+    def starting(cls, round_id, phase, started_at, duration, **kwargs):
+        return cls(round_id, phase, deadline_from(started_at, duration), **kwargs)
+
+    def remaining(self):
+        if self.deadline is None:
+            return 0
+        seconds = (self.deadline - timezone.now()).total_seconds()
+        return max(0, math.ceil(seconds))
+
+    def advance(self, phase, duration=None, started_at=None):
+        self.phase = phase
+        self.deadline = deadline_from(started_at or timezone.now(), duration) if duration is not None else None
+
+    def record_bid(self, player_id, key, amount):
+        self.totals[key] = self.totals.get(key, 0) + amount
+        player_totals = self.participants.setdefault(player_id, {})
+        player_totals[key] = player_totals.get(key, 0) + amount
+
+    def snapshot(self):
+        return {
+            'round_id': self.round_id,
+            'phase': self.phase,
+            'deadline': self.deadline.isoformat() if self.deadline else None,
+            'remaining': self.remaining(),
+            'totals': dict(self.totals),
+            'participants': len(self.participants)
+        }
+
+
+def deadline_from(started_at, duration):
+    if started_at is None:
+        started_at = timezone.now()
+    return started_at + timedelta(seconds=duration)
+
@@ -0,0 +1,241 @@
+#settlement.py
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from GameApp.models import (GameRound, PlayerBid, PlayerResult, ColorGameRound, ColorPlayerBid, ColorPlayerResult,
+                            Dice_GameRound, Dice_PlayerBid, Dice_PlayerResult)
+from GameApp.services_file.bulk_rows import insert_rows
+from GameApp.services_file.wallet import credit_many
+
+
+# ******************************   Card Battle **************************
+
+CARD_DEVELOPER_FEE = 0.10
+CARD_MAX_MULTIPLIER = 1.95
+PICTURE_CARDS = ('jack', 'queen', 'king', 'ace')
+
+
+def settle_card_round(round_obj):
+    """
+    Settle a whole card round at once: side pools from one aggregate query,
+    every payout computed in memory, results and balances written in bulk.
+    The round row is locked and must still be ACTIVE with no results, so a
+    second call returns nothing and pays nothing.
+    """
+    with transaction.atomic():
+        round_obj = GameRound.objects.select_for_update().filter(
+            pk=round_obj.pk, status=GameRound.RoundStatus.ACTIVE
+        ).first()
+        if round_obj is None or PlayerResult.objects.filter(round=round_obj).exists():
+            return [], 'None'
+
+        card_value = round_obj.card.split('_')[0].lower()
+        win_side = 'PIC' if card_value in PICTURE_CARDS else 'NUM'
+
+        pools = dict(
+            PlayerBid.objects.filter(round=round_obj).values('side').annotate(total=Sum('amount')).values_list('side', 'total')
+        )
+        total_pool = sum(pools.values())
+
+        bids = list(
+            PlayerBid.objects.filter(round=round_obj).values_list(
+                'player_id', 'side', 'amount', 'player__user_id', 'player__user__username',
+                'player__user__db_phone_number', 'player__user__email'
+            )
+        )
+
+        # Winners are paid up to 1.95x their stake, scaled down together when the prize pool can't cover it.
+        max_wins = {player_id: round(amount * CARD_MAX_MULTIPLIER)
+                    for player_id, side, amount, *_ in bids if side == win_side}
+        prize_pool = total_pool - round(total_pool * CARD_DEVELOPER_FEE)
+        total_desired_payout = sum(max_wins.values())
+        scaling_factor = 1.0 if total_desired_payout <= prize_pool else prize_pool / total_desired_payout
+
+        results, credits, player_results = [], {}, []
+        for player_id, side, amount, user_id, username, phone, email in bids:
+            won = player_id in max_wins
+            payout = round(max_wins[player_id] * scaling_factor) + amount if won else 0
+
+            results.append((player_id, round_obj.pk, amount, int(payout if won else amount), "WIN" if won else "LOSS"))
+            if won:
+                credits[player_id] = credits.get(player_id, 0) + payout
+
+            player_results.append({
+                "username": username or phone or email or str(user_id),
+                "side": 'Picture' if side == 'PIC' else 'Number',
+                "amount": amount,
+                "won": won,
+                "payout": payout
+            })
+
+        insert_rows(PlayerResult, ('player_id', 'round_id', 'amount_bet', 'amount_won_loss', 'result_type'), results)
+        credit_many(credits, 'card_win')
+
+        round_obj.status = GameRound.RoundStatus.COMPLETED
+        round_obj.save(update_fields=['status'])
+
+    player_results.sort(key=lambda x: (-x['payout'], x['username']))
+    return player_results, 'Picture' if win_side == 'PIC' else 'Number'
+
+
+# ******************************   Dice Roll **************************
+
+DICE_DEVELOPER_FEE = 0.90
+
+
+def settle_dice_round(round_obj, total, winning_side):
+    """
+    Settle a dice round and move it to RESULTS (with its dice and
+    result_start) in the same transaction. As with card rounds, the round
+    row is locked and must still be ACTIVE with no results, so a second
+    call - a new leader, or a concurrent settle - returns nothing and pays
+    nothing.
+    """
+    with transaction.atomic():
+        if not Dice_GameRound.objects.select_for_update().filter(
+            pk=round_obj.pk, status=Dice_GameRound.RoundStatus_dice.ACTIVE
+        ).exists() or Dice_PlayerResult.objects.filter(round=round_obj).exists():
+            return []
+
+        bids = list(
+            Dice_PlayerBid.objects.filter(round=round_obj).values_list(
+                'player_id', 'side', 'amount_bet_side', 'exact_number', 'amount_bet_exact',
+                'player__user__db_fullname', 'player__user__auth_token'
+            )
+        )
+
+        # exact number -> jackpot multiplier for this round (number1 wins if both draw the same number)
+        jackpots = {
+            round_obj.exact_number_on_multiplyer['number2']: round_obj.multiplyer_number['number2'],
+            round_obj.exact_number_on_multiplyer['number1']: round_obj.multiplyer_number['number1'],
+        }
+
+        results, credits, player_results = [], {}, []
+        for player_id, side, side_bet, exact_number, exact_bet, fullname, auth_token in bids:
+            side_bet = side_bet or 0
+            exact_bet = exact_bet or 0
+            total_return = 0
+            result_types = []
+
+            if side and side == winning_side:
+                total_return += side_bet * DICE_DEVELOPER_FEE
+                result_types.append('win')
+
+            if exact_number:
+                if exact_number in jackpots:
+                    total_return += exact_bet * jackpots[exact_number] * DICE_DEVELOPER_FEE
+                    result_types.append('win')
+                elif exact_number == total:
+                    total_return += exact_bet * DICE_DEVELOPER_FEE
+                    result_types.append('win')
+
+            won = bool(result_types)
+            result_type = ", ".join(result_types) if won else 'lose'
+            total_bet = side_bet + exact_bet
+            amount_won_loss = total_return + total_bet if won else total_bet
+
+            results.append((player_id, round_obj.pk, side_bet, exact_bet, int(amount_won_loss), result_type))
+            if won:
+                credits[player_id] = credits.get(player_id, 0) + amount_won_loss
+
+            player_results.append({
+                'fullname': fullname,
+                'auth_token': auth_token,
+                'amount_bet_side': side_bet,
+                'amount_bet_exact': exact_bet,
+                'result_type': result_type,
+                'amount_won_loss': amount_won_loss,
+                'won': won
+            })
+
+        insert_rows(Dice_PlayerResult, ('player_id', 'round_id', 'amount_bet_side', 'amount_bet_exact', 'amount_won_loss', 'result_type'), results)
+        credit_many(credits, 'dice_win')
+
+        round_obj.status = Dice_GameRound.RoundStatus_dice.RESULTS
+        round_obj.result_start = timezone.now()
+        round_obj.save(update_fields=['dice1', 'dice2', 'total', 'status', 'result_start'])
+        return player_results
+
+
+# ******************************   Color Trading **************************
+
+COLOR_FEE = 0.70
+SIZE_FEE = 0.40
+EXACT_FEE = 0.90
+COLOR_BY_NUMBER = {0: "Violet", 1: "Green", 2: "Red", 3: "Green", 4: "Red",
+                   5: "Violet", 6: "Red", 7: "Green", 8: "Red", 9: "Green"}
+
+
+def size_for_number(number):
+    return "Small" if number < 5 else "Big"
+
+
+def color_payout(bet_amount, multiplier, fee):
+    if multiplier == 1:
+        return (bet_amount * 2 * fee) + bet_amount
+    return (bet_amount * multiplier * fee) + bet_amount
+
+
+def settle_color_round(round_obj, random_number):
+    """
+    Settle a color round and move it to RESULTS (with its number and
+    result_start) in the same transaction; the round row is locked and must
+    still be ACTIVE with no results, as for dice.
+    """
+    with transaction.atomic():
+        if not ColorGameRound.objects.select_for_update().filter(
+            pk=round_obj.pk, status=ColorGameRound.RoundStatus_color.ACTIVE
+        ).exists() or ColorPlayerResult.objects.filter(round=round_obj).exists():
+            return []
+
+        rows = list(
+            ColorPlayerBid.objects.filter(round=round_obj)
+            .values_list('player_id', 'player__user__auth_token', 'player_detail')
+        )
+
+        # Decode every player_detail once into parallel columns.
+        player_ids, tokens, details = zip(*rows) if rows else ((), (), ())
+        color_bets = [d.get('amount_Bet_Color') or 0 for d in details]
+        size_bets = [d.get('amount_Bet_Size') or 0 for d in details]
+        exact_bets = [d.get('amount_Bet_Exact_number') or 0 for d in details]
+        color_wins = [d.get('user_Select_Color') == COLOR_BY_NUMBER.get(random_number) for d in details]
+        size_wins = [d.get('user_Select_Size') == size_for_number(random_number) for d in details]
+        exact_wins = [str(d.get('user_Select_Exact_number')) == str(random_number) for d in details]
+        color_multis = [d.get('multiplyer_number_Color', 1) for d in details]
+        size_multis = [d.get('multiplyer_number_Size', 1) for d in details]
+        exact_multis = [d.get('multiplyer_number_Exact_number', 1) for d in details]
+
+        results, credits, player_results = [], {}, []
+        for i, player_id in enumerate(player_ids):
+            win_amount = 0
+            if color_wins[i] and color_bets[i] > 0:
+                win_amount += color_payout(color_bets[i], color_multis[i], COLOR_FEE)
+            if size_wins[i] and size_bets[i] > 0:
+                win_amount += color_payout(size_bets[i], size_multis[i], SIZE_FEE)
+            if exact_wins[i] and exact_bets[i] > 0:
+                win_amount += color_payout(exact_bets[i], exact_multis[i], EXACT_FEE)
+
+            is_win = win_amount > 0
+            net_amount = win_amount if is_win else color_bets[i] + size_bets[i] + exact_bets[i]
+            result_type = "WIN" if is_win else "LOSE"
+
+            results.append((player_id, round_obj.pk, int(color_bets[i]), int(size_bets[i]), int(exact_bets[i]),
+                            int(net_amount), result_type))
+            if is_win:
+                credits[player_id] = credits.get(player_id, 0) + win_amount
+
+            player_results.append({
+                'player': str(tokens[i]),
+                'result_type': result_type,
+                'net_amount': net_amount
+            })
+
+        insert_rows(ColorPlayerResult, ('player_id', 'round_id', 'amount_bet_Color', 'amount_bet_Size',
+                                        'amount_bet_Exact_Number', 'amount_won_loss', 'result_type'), results)
+        credit_many(credits, 'color_win')
+
+        round_obj.status = ColorGameRound.RoundStatus_color.RESULTS
+        round_obj.random_number = random_number
+        round_obj.result_start = timezone.now()
+        round_obj.save(update_fields=['status', 'random_number', 'result_start'])
+        return player_results
@@ -0,0 +1,113 @@
+#snapshots.py
+from collections import deque
+from GameApp.services_file.db_executors import read_db
+import asyncio, copy, json, logging, threading
+logger = logging.getLogger(__name__)
+
+# Expiry tags remembered, so the same broadcast handled by every socket of a process expires the snapshot once.
+RECENT_TAGS = 32
+
+
+class Snapshot:
+    """
+    One build of a table's shared initial state: `fields` as sent to every
+    socket (pre-encoded in `encoded`), `phase` in the table's timer_update
+    vocabulary, and the model instances it was read from.
+    """
+
+    def __init__(self, phase, fields, **objects):
+        self.phase = phase
+        self.fields = fields
+        self.encoded = {key: json.dumps(value) for key, value in fields.items()}
+        self.objects = objects
+
+    def get(self, name):
+        """A copy of one of the instances, so a consumer may refresh or modify its own."""
+        obj = self.objects.get(name)
+        return copy.copy(obj) if obj is not None else None
+
+    def patched(self, **fields):
+        snapshot = copy.copy(self)
+        snapshot.fields = {**self.fields, **fields}
+        snapshot.encoded = {**self.encoded, **{key: json.dumps(value) for key, value in fields.items()}}
+        return snapshot
+
+
+class SnapshotCache:
+    """
+    The part of a live table's initial state that is the same for every
+    socket, built by one set of read-pool queries and kept until the state
+    changes. A reconnect storm then costs one build plus each socket's own
+    overlay (its bet, its balance, the timer) instead of the full queries
+    per socket.
+
+    Consumers keep it current from the broadcasts they already receive:
+    round starts, results and participant deltas expire it, a timer_update
+    in another phase expires it, and totals broadcasts patch it in place.
+    Like ResultHistory, a process with no watching sockets receives none of
+    those, so the snapshot is dropped when the last one leaves.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build      # build() -> Snapshot (sync, on the read pool)
+        self.current = None
+        self.version = 0
+        self.watchers = 0
+        self._building = None
+        self._tags = deque(maxlen=RECENT_TAGS)
+        self._lock = threading.Lock()
+
+    async def get(self):
+        with self._lock:
+            current, building = self.current, self._building
+            if current is None and building is None:
+                building = self._building = asyncio.ensure_future(read_db(self._build)(self.version))
+                building.add_done_callback(self._built)
+        if current is not None:
+            return current
+        return await asyncio.shield(building)
+
+    def _build(self, version):
+        snapshot = self.build()
+        with self._lock:
+            # Expired while building: the callers already waiting get it, later ones build again.
+            if version == self.version:
+                self.current = snapshot
+        return snapshot
+
+    def _built(self, task):
+        with self._lock:
+            if self._building is task:
+                self._building = None
+
+    def expire(self, tag=None):
+        with self._lock:
+            if tag is not None:
+                if tag in self._tags:
+                    return
+                self._tags.append(tag)
+            self.version += 1
+            self.current = None
+            self._building = None
+
+    def check_phase(self, phase):
+        """Expire a snapshot built in another phase; timer updates carry the phase every tick."""
+        current = self.current
+        if current is not None and current.phase != phase:
+            self.expire()
+
+    def patch(self, **fields):
+        with self._lock:
+            current = self.current
+            if current is None or all(current.fields.get(key) == value for key, value in fields.items()):
+                return
+            self.current = current.patched(**fields)
+
+    def watch(self):
+        self.watchers += 1
+
+    def unwatch(self):
+        self.watchers = max(0, self.watchers - 1)
+        if self.watchers == 0:
+            self.expire()
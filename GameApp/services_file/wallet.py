@@ -0,0 +1,69 @@
+#wallet.py
+from django.db import transaction
+from django.db.models import F
+from AccountApp.models import Player, Transaction
+from GameApp.services_file import balances
+from GameApp.services_file.bulk_rows import add_to_rows, insert_rows
+from functools import partial
+
+BATCH_SIZE = 1000
+
+
+class InsufficientFunds(ValueError):
+    pass
+
+
+def debit(player_id, amount, transaction_type):
+    """
+    Take `amount` coins from a player with one conditional UPDATE (no row lock,
+    no read first) and record it in the ledger. Raises InsufficientFunds and
+    changes nothing if the balance is too low.
+    """
+    amount = int(amount)
+    if amount <= 0:
+        raise ValueError("Invalid amount")
+    with transaction.atomic():
+        updated = Player.objects.filter(pk=player_id, coins__gte=amount).update(coins=F('coins') - amount)
+        if not updated:
+            raise InsufficientFunds("Insufficient funds")
+        Transaction.objects.create(player_id=player_id, amount=-amount, transaction_type=transaction_type)
+        publish_after_commit([player_id])
+
+
+def credit(player_id, amount, transaction_type):
+    amount = int(amount)
+    if amount <= 0:
+        return
+    with transaction.atomic():
+        Player.objects.filter(pk=player_id).update(coins=F('coins') + amount)
+        Transaction.objects.create(player_id=player_id, amount=amount, transaction_type=transaction_type)
+        publish_after_commit([player_id])
+
+
+def credit_many(credits, transaction_type):
+    """
+    Pay many players at once: `coins += amount` for every player in one
+    statement per BATCH_SIZE players however varied the amounts are (see
+    bulk_rows.add_to_rows), and the ledger rows in bulk. Amounts are
+    truncated to whole coins the way `player.coins += x; player.save()` did.
+    """
+    credits = {player_id: int(amount) for player_id, amount in credits.items() if int(amount) > 0}
+    player_ids = list(credits)
+    with transaction.atomic():
+        add_to_rows(Player, 'coins', credits, BATCH_SIZE)
+        insert_rows(Transaction, ('player_id', 'amount', 'transaction_type'),
+                    [(player_id, amount, transaction_type) for player_id, amount in credits.items()])
+        publish_after_commit(player_ids)
+    return credits
+
+
+def balance(player_id):
+    return balances.get(player_id)
+
+
+def publish_after_commit(player_ids):
+    # Read the new balances inside the write transaction, hand them out once it commits.
+    new_balances = {}
+    for start in range(0, len(player_ids), BATCH_SIZE):
+        new_balances.update(Player.objects.filter(pk__in=player_ids[start:start + BATCH_SIZE]).values_list('id', 'coins'))
+    transaction.on_commit(partial(balances.publish, new_balances))
@@ -1,3 +1,197 @@
-from django.test import TestCase
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from AccountApp.models import Player, Transaction, db_Profile
+from GameApp.services_file import deadlines
+from GameApp.services_file.cashout_index import CashoutIndex
+from GameApp.services_file.deadlines import DeadlineScheduler
+from GameApp.services_file.dots_board import DotsBoard
+from GameApp.services_file.matchmaking import MatchQueue, Ticket
+from GameApp.services_file.wallet import InsufficientFunds, credit_many, debit
+import asyncio
 
-# Create your tests here.
+
+def button(row, col):
+    return row * 7 + col + 1
+
+
+class DotsBoardTests(SimpleTestCase):
+
+    def play(self, buttons, is_player_a=True):
+        board = DotsBoard()
+        for b in buttons:
+            self.assertTrue(board.place(b, is_player_a))
+        return board
+
+    def test_five_in_a_row_wins_on_every_line(self):
+        lines = {
+            'row': [button(3, col) for col in range(1, 6)],
+            'column': [button(row, 4) for row in range(2, 7)],
+            'diagonal': [button(i, i) for i in range(5)],
+            'anti-diagonal': [button(i, 6 - i) for i in range(2, 7)],
+        }
+        for name, buttons in lines.items():
+            with self.subTest(name):
+                board = self.play(buttons)
+                self.assertTrue(board.wins(buttons[-1], True))
+                self.assertFalse(board.wins(buttons[-1], False))
+
+    def test_four_in_a_row_does_not_win(self):
+        buttons = [button(0, col) for col in range(4)]
+        self.assertFalse(self.play(buttons).wins(buttons[-1], True))
+
+    def test_line_does_not_wrap_to_the_next_row(self):
+        # 5, 6, 7 end row 0 and 8, 9 start row 1: consecutive buttons, not a line.
+        self.assertFalse(self.play([5, 6, 7, 8, 9]).wins(9, True))
+
+    def test_occupied_and_out_of_range_buttons_are_refused(self):
+        board = DotsBoard()
+        self.assertTrue(board.place(25, True))
+        self.assertFalse(board.place(25, False))
+        self.assertFalse(board.place(0, True))
+        self.assertFalse(board.place(50, True))
+        self.assertEqual(board.moves, 1)
+
+    def test_bits_round_trip_through_a_round(self):
+        board = self.play([1, 49], True)
+        board.place(7, False)
+        self.assertEqual((board.a, board.b), (1 | 1 << 48, 1 << 6))
+        grid = board.grid()
+        self.assertEqual((grid[0], grid[6], grid[48], grid[1]), (1, 2, 1, 0))
+
+        stored = SimpleNamespace(player_a_board=board.a, player_b_board=board.b, move_count=3)
+        loaded = DotsBoard.from_round(stored)
+        self.assertEqual((loaded.a, loaded.b, loaded.moves), (board.a, board.b, 3))
+
+        stale = DotsBoard()
+        stale.sync(stored)
+        self.assertEqual((stale.a, stale.b, stale.moves), (board.a, board.b, 3))
+
+
+class CashoutIndexTests(SimpleTestCase):
+
+    def test_pop_crossed_takes_targets_up_to_the_multiplier(self):
+        index = CashoutIndex(round_id=1)
+        index.add(1, 1.5)
+        index.add(2, 2.0)
+        index.add(3, 1.2)
+        self.assertEqual(index.pop_crossed(1.1), [])
+        self.assertEqual(index.pop_crossed(1.5), [3, 1])
+        self.assertEqual(index.pop_crossed(1.99), [])
+        self.assertEqual(index.pop_crossed(2.0), [2])
+        self.assertEqual(len(index), 0)
+
+    def test_changed_and_discarded_targets(self):
+        index = CashoutIndex(round_id=1)
+        index.add(1, 1.5)
+        index.add(1, 3.0)
+        index.add(2, 1.5)
+        index.discard(2)
+        self.assertEqual(index.pop_crossed(2.0), [])
+        self.assertEqual(index.pop_crossed(3.0), [1])
+
+
+class MatchQueueTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def ticket(self, game_id, player_id, amount, seconds_ago=0):
+        return Ticket(game_id, player_id, amount, f"channel-{game_id}", self.now - timedelta(seconds=seconds_ago))
+
+    def test_equal_stakes_only_without_tolerance(self):
+        queue = MatchQueue(tolerance=0, max_wait=timedelta(minutes=3))
+        queue.add(self.ticket(1, 'a', 100))
+        self.assertIsNone(queue.claim(self.ticket(2, 'b', 110), self.now))
+        self.assertEqual(queue.claim(self.ticket(3, 'c', 100), self.now).game_id, 1)
+        self.assertEqual(len(queue), 0)
+
+    def test_oldest_ticket_within_tolerance_wins(self):
+        queue = MatchQueue(tolerance=50, max_wait=timedelta(minutes=3))
+        queue.add(self.ticket(1, 'a', 100, seconds_ago=10))
+        queue.add(self.ticket(2, 'b', 140, seconds_ago=30))
+        queue.add(self.ticket(3, 'c', 300, seconds_ago=60))
+        self.assertEqual(queue.claim(self.ticket(4, 'd', 120), self.now).game_id, 2)
+        self.assertEqual(queue.claim(self.ticket(5, 'e', 120), self.now).game_id, 1)
+        self.assertIsNone(queue.claim(self.ticket(6, 'f', 120), self.now))
+
+    def test_own_cancelled_and_stale_tickets_are_skipped(self):
+        queue = MatchQueue(tolerance=0, max_wait=timedelta(minutes=3))
+        queue.add(self.ticket(1, 'a', 100, seconds_ago=600))
+        queue.add(self.ticket(2, 'b', 100, seconds_ago=20))
+        queue.add(self.ticket(3, 'c', 100, seconds_ago=10))
+        queue.cancel(3)
+        self.assertIsNone(queue.claim(self.ticket(4, 'b', 100), self.now))
+        self.assertEqual(queue.claim(self.ticket(5, 'd', 100), self.now).game_id, 2)
+        self.assertEqual(len(queue), 0)
+
+
+class DeadlineSchedulerTests(SimpleTestCase):
+
+    def test_due_keys_come_out_in_deadline_order(self):
+        scheduler = DeadlineScheduler(None)
+        now = timezone.now()
+        scheduler.schedule('late', now - timedelta(seconds=1))
+        scheduler.schedule('early', now - timedelta(seconds=3))
+        scheduler.schedule('moved', now - timedelta(seconds=5))
+        scheduler.schedule('moved', now + timedelta(seconds=60))
+        scheduler.schedule('cancelled', now - timedelta(seconds=2))
+        scheduler.cancel('cancelled')
+        self.assertEqual(scheduler.pop_due(now), ['early', 'late'])
+        self.assertEqual(scheduler.next_deadline(), now + timedelta(seconds=60))
+        self.assertEqual(list(scheduler.deadlines), ['moved'])
+
+    async def test_failed_batch_is_retried(self):
+        batches = []
+
+        async def callback(keys):
+            batches.append(keys)
+            if len(batches) == 1:
+                raise RuntimeError("database unavailable")
+
+        scheduler = DeadlineScheduler(callback, 'test')
+        scheduler.schedule('game', timezone.now())
+        with mock.patch.object(deadlines, 'RETRY_DELAY', timedelta(milliseconds=20)), \
+                self.assertLogs('GameApp.services_file.deadlines', 'ERROR'):
+            task = asyncio.ensure_future(scheduler.run())
+            try:
+                for _ in range(100):
+                    if len(batches) == 2:
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                task.cancel()
+        self.assertEqual(batches, [['game'], ['game']])
+        self.assertEqual(len(scheduler), 0)
+
+
+class WalletTests(TestCase):
+
+    def player(self, name, coins):
+        user = db_Profile.objects.create(email=f"{name}@example.com", username=name, auth_token=name)
+        Player.objects.filter(user=user).update(coins=coins)
+        return Player.objects.get(user=user)
+
+    def test_debit_refuses_an_overdraft(self):
+        player = self.player('debtor', 50)
+        with self.assertRaises(InsufficientFunds):
+            debit(player.id, 80, 'test_bet')
+        player.refresh_from_db()
+        self.assertEqual(player.coins, 50)
+        self.assertFalse(Transaction.objects.filter(player=player).exists())
+
+        debit(player.id, 50, 'test_bet')
+        player.refresh_from_db()
+        self.assertEqual(player.coins, 0)
+        self.assertEqual(list(Transaction.objects.filter(player=player).values_list('amount', flat=True)), [-50])
+
+    def test_credit_many_pays_each_amount_and_writes_the_ledger(self):
+        players = [self.player(f"winner{i}", 10) for i in range(3)]
+        credits = {players[0].id: 5, players[1].id: 12.9, players[2].id: 0}
+        credit_many(credits, 'test_win')
+        coins = dict(Player.objects.filter(pk__in=credits).values_list('id', 'coins'))
+        self.assertEqual(coins, {players[0].id: 15, players[1].id: 22, players[2].id: 10})
+        ledger = dict(Transaction.objects.filter(transaction_type='test_win').values_list('player_id', 'amount'))
+        self.assertEqual(ledger, {players[0].id: 5, players[1].id: 12})
@@ -33,6 +33,8 @@ urlpatterns = [
     path('api/leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
     path('api/all_players/', AllPlayersWithDetailsView.as_view(), name='all_players'),
     path('api/my_profile/', AuthenticatedPlayerDetailsView.as_view(), name='my_profile'), 
+    path('api/outcome_seeds/', views.outcome_seeds, name='outcome_seeds'),
+    path('api/metrics/', views.consumer_metrics, name='consumer_metrics'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) 
@@ -6,11 +6,13 @@ from AccountApp.models import db_Profile ,Player, Transaction
 from rest_framework.decorators import authentication_classes
 from django.contrib.auth import authenticate, login, logout
 from Earn9Game.utils_file.api_response import Api_Response   
+from GameApp.services_file.settlement import settle_card_round
+from GameApp.services_file import balances, instrumentation, outcomes, wallet
 from django.http import HttpResponse, HttpResponseRedirect  
 from django.contrib.auth.decorators import login_required 
 from rest_framework_simplejwt.tokens import RefreshToken   
 from rest_framework.permissions import IsAuthenticated 
-from django.views.decorators.http import require_POST   
+from django.views.decorators.http import require_GET, require_POST   
 from django.views.decorators.csrf import csrf_exempt    
 from django.utils.decorators import method_decorator 
 from rest_framework.response import Response 
@@ -19,7 +21,7 @@ from django.conf.urls.static import static
 from rest_framework.views import APIView 
 from django.core.mail import send_mail
 from django.http import JsonResponse 
-import json, uuid, random, datetime 
+import json, uuid, random, datetime, hmac 
 from django.contrib import messages   
 from django.template import loader  
 from django.db import transaction 
@@ -36,9 +38,14 @@ from random import shuffle
 from  Earn9Game.helper_func  import ( anyNumber , DateTimeExpired , long_token , validate_password_strength ,
                                     send_mail_after_registration, get_authenticated_user )
  
-from GameApp.models import Game, PlayerResult , GameRound,  ConnectDotGame, FootballGame, Game, PlayerBid
-from .serializers import GameRoundSerializer, PlayerBidSerializer, PlayerSerializer, GameSerializer, PlayerResultSerializer  
- 
+from GameApp.models import Game, GameRound,  ConnectDotGame, FootballGame, Game
+from .serializers import GameRoundSerializer, PlayerBidSerializer, PlayerSerializer, GameSerializer, PlayerResultSerializer
+
+
+def player_context(user):
+    # Game pages only need the token and the balance, both served without a Player query.
+    return {'user': user, 'coins': balances.get_for_user(user.id)}
+
 @login_required(login_url='login_page')
 def home_page(request):
     if request.user.is_authenticated:
@@ -73,8 +80,8 @@ def GuessNumber_page(request):
 @login_required(login_url='login_page')
 def colorTrade_game_page(request):
     if request.user.is_authenticated:
-        obj_player = Player.objects.filter(user =  request.user).first()
-        print("obj_player :", obj_player.user.auth_token)
+        obj_player = player_context(request.user)
+        print("obj_player :", request.user.auth_token)
         template = loader.get_template('Earn9/colorTrade_game.html') 
         context = { 
             'obj_player' : obj_player
@@ -88,8 +95,8 @@ def colorTrade_game_page(request):
 @login_required(login_url='login_page')
 def crashRocket_game_page(request):
     if request.user.is_authenticated:
-        obj_player = Player.objects.filter(user =  request.user).first()
-        print("obj_player :", obj_player.user.auth_token)
+        obj_player = player_context(request.user)
+        print("obj_player :", request.user.auth_token)
         template = loader.get_template('Earn9/crashRocket_game.html') 
         context = { 
             'obj_player' : obj_player
@@ -103,8 +110,8 @@ def crashRocket_game_page(request):
 @login_required(login_url='login_page')
 def spinWheel_game_page(request):
     if request.user.is_authenticated:
-        obj_player = Player.objects.filter(user =  request.user).first()
-        print("obj_player :", obj_player.user.auth_token)
+        obj_player = player_context(request.user)
+        print("obj_player :", request.user.auth_token)
         template = loader.get_template('Earn9/spinWheel_game.html') 
         context = { 
             'obj_player' : obj_player
@@ -199,8 +206,8 @@ def diceRoll_game_page(request):
     if not request.user.is_authenticated:
         return redirect('login_page')
     else:
-        obj_player = Player.objects.filter(user =  request.user).first()
-        print("obj_player :", obj_player.user.auth_token)
+        obj_player = player_context(request.user)
+        print("obj_player :", request.user.auth_token)
         template = loader.get_template('Earn9/dice_roll_game.html') 
         context = { 
             'obj_player' : obj_player
@@ -216,14 +223,13 @@ def deduct_coins(request):
         player = request.user.player
         amount = request.data.get('amount')
         
-        if player.coins < amount:
+        try:
+            wallet.debit(player.id, amount, 'api_deduct')
+        except wallet.InsufficientFunds:
             return Response({"error": "Insufficient balance"}, status=400)
-            
-        player.coins -= amount
-        player.save()
         
         return Response({
-            "new_balance": player.coins,
+            "new_balance": wallet.balance(player.id),
             "transaction_id": uuid.uuid4()
         })
         
@@ -242,109 +248,8 @@ def get_deck():
     values = ['2', '4', '6', '8', '10', 'jack', 'queen', 'king', 'ace']
     return [f"{value}_of_{suit}" for suit in suits for value in values]
 
-@transaction.atomic 
 def calculate_winners(round_obj):
-    if round_obj.status != GameRound.RoundStatus.ACTIVE:
-        return [], 'None'
-    
-    if PlayerResult.objects.filter(round=round_obj).exists():
-        print("⚠️ Already processed round.")
-        return [], 'None'
-
-    card_value = round_obj.card.split('_')[0].lower()
-    is_picture = card_value in ['jack', 'queen', 'king', 'ace']
-    win_side = 'PIC' if is_picture else 'NUM'
-
-    bids = PlayerBid.objects.filter(round=round_obj).select_related('player')
-    total_pool = sum(b.amount for b in bids)
-    winners = bids.filter(side=win_side)
-
-    results = []
-    existing_users = set()
-    # processed_bids = set()
-
-    if winners.exists(): 
-        developer_fee = round(total_pool * 0.10)
-        prize_pool = total_pool - developer_fee
- 
-        max_payouts = []
-        total_desired_payout = 0
-        for w in winners:
-            max_win = round(w.amount * 1.95)
-            max_payouts.append((w, max_win))
-            total_desired_payout += max_win
- 
-        if total_desired_payout <= prize_pool:
-            scaling_factor = 1.0
-        else:
-            scaling_factor = prize_pool / total_desired_payout
- 
-        for bid, max_win in max_payouts:
-            try:
-                actual_payout = round(max_win * scaling_factor)
-                actual_payout += bid.amount
-                
-                with transaction.atomic():
-                    bid.player.coins += actual_payout
-                    bid.player.save() 
-
-                    PlayerResult.objects.update_or_create(
-                        player=bid.player,
-                        round=round_obj,
-                        result_type = "WIN",
-                        defaults={
-                            'amount_won_loss': actual_payout,
-                            'amount_bet': bid.amount
-                        }
-                    ) 
-                    
-                username = bid.player.user.username or bid.player.user.db_phone_number or bid.player.user.email or str(bid.player.user.id)
-                results.append({
-                    "username": username,
-                    "side": 'Picture' if bid.side == 'PIC' else 'Number',
-                    "amount": bid.amount,
-                    "won": True,
-                    "payout": actual_payout
-                })
-                existing_users.add(username)
-
-            except Exception as e:
-                print(f"Error processing winner {bid.player}: {str(e)}")
- 
-    all_bids = PlayerBid.objects.filter(round=round_obj)
-    for bid in all_bids:
-        username = bid.player.user.username or bid.player.user.db_phone_number or bid.player.user.email or str(bid.player.user.id)
-        if username not in existing_users: 
-            with transaction.atomic():
-                PlayerResult.objects.update_or_create(
-                        player=bid.player,
-                        round=round_obj,
-                        result_type = "LOSS",
-                        defaults={
-                            'amount_won_loss': bid.amount,
-                            'amount_bet': bid.amount
-                        }
-                )
-            # processed_bids.add(bid.id)
-
-            results.append({
-                "username": username,
-                "side": 'Picture' if bid.side == 'PIC' else 'Number',
-                "amount": bid.amount,
-                "won": False,
-                "payout": 0
-            })
-            existing_users.add(username)
-
-    round_obj.status = GameRound.RoundStatus.COMPLETED
-    round_obj.save()
-
-    sorted_results = sorted(
-        results,
-        key=lambda x: (-x['payout'], x['username'])
-    )
-
-    return sorted_results, 'Picture' if win_side == 'PIC' else 'Number'
+    return settle_card_round(round_obj)
 
 class AuthenticatedPlayerDetailsView(APIView):
     permission_classes = [IsAuthenticated]
@@ -382,8 +287,10 @@ class PlayerBalanceView(APIView):
 
     def get(self, request):
         try:
-            player = Player.objects.get(user=request.user)
-            return Api_Response.success_response("Player balance fetched.", {"coins": player.coins})
+            coins = balances.get_for_user(request.user.id)
+            if coins is None:
+                raise Player.DoesNotExist
+            return Api_Response.success_response("Player balance fetched.", {"coins": coins})
         except Player.DoesNotExist:
             return Api_Response.error_response("Player not found.")
  
@@ -473,4 +380,33 @@ def place_bid(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
- 
\ No newline at end of file
+ 
+
+@require_GET
+def outcome_seeds(request):
+    # Public: a seed is listed by its hash until revealed, then with the seed so players can replay their rounds.
+    # ?seed_hash= looks up the seed a round's `fairness` names.
+    game = request.GET.get('game')
+    if game and game not in outcomes.GENERATORS:
+        return JsonResponse({'error': 'Unknown game'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    return JsonResponse({'seeds': outcomes.published_seeds(game, request.GET.get('seed_hash'), limit)})
+
+
+def metrics_token_valid(request):
+    # REMOTE_ADDR is the proxy's behind nginx, so scrapers prove themselves with the configured token instead.
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    scheme, _, supplied = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def consumer_metrics(request):
+    # Served to staff and to scrapers holding METRICS_TOKEN; ?format=text gives the table dump.
+    if not getattr(request.user, 'is_staff', False) and not metrics_token_valid(request):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    if request.GET.get('format') == 'text':
+        return HttpResponse(instrumentation.dump(), content_type='text/plain; charset=utf-8')
+    return JsonResponse(instrumentation.snapshot())